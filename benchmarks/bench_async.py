@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+bench_async.py -- Fetching many secrets at service start-up with AsyncVault
+
+Builds a synthetic vault in a throwaway HOME and times, through
+vault_async.AsyncVault: one get, 200 gets awaited one after another, 200
+concurrent gets (asyncio.gather, merged into one lookup) and get_many of
+200 IDs. One `vaultpass -f` process -- what services shelled out to per
+secret before -- is timed for reference. Exits 1 if the 200 concurrent
+gets cost more than that single process.
+
+Usage: python3 benchmarks/bench_async.py [--entries N] [--fetch N] [--encrypted]
+"""
+
+import os
+import sys
+import time
+import random
+import shutil
+import asyncio
+import argparse
+import tempfile
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO = os.path.abspath(os.path.join(BENCH_DIR, ".."))
+RUNS = 5
+
+async def timed(make):
+    best = None
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        await make()
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+async def bench(ids, fetch):
+    from vault_async import AsyncVault
+    rnd = random.Random(3)
+    picks = rnd.sample(ids, fetch)
+    async with AsyncVault() as av:
+        await av.get(picks[0])    # unlock and warm the index outside the timings
+
+        async def sequential():
+            for entry_id in picks:
+                await av.get(entry_id)
+
+        return {
+            "one get": await timed(lambda: av.get(picks[0])),
+            f"{fetch} gets, one by one": await timed(sequential),
+            f"{fetch} gets, gathered": await timed(lambda: asyncio.gather(*(av.get(i) for i in picks))),
+            f"get_many({fetch})": await timed(lambda: av.get_many(picks)),
+        }
+
+def cli_lookup_ms(home, entry_id):
+    import bench_startup
+    env = dict(os.environ, HOME=home)
+    cmd = [sys.executable, os.path.join(REPO, "core", "vaultpass.py"), "-f", entry_id]
+    return bench_startup.median_ms(cmd, env, RUNS)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--entries", type=int, default=100_000)
+    parser.add_argument("--fetch", type=int, default=200)
+    parser.add_argument("--encrypted", action="store_true", help="encrypt the vault (needs cryptography)")
+    opts = parser.parse_args()
+
+    home = tempfile.mkdtemp(prefix="vaultpass-bench-")
+    os.environ["HOME"] = home
+    sys.path.insert(0, os.path.join(REPO, "core"))
+    sys.path.insert(0, BENCH_DIR)
+    try:
+        import vault
+        import vault_crypto
+        from bench_suite import build_vault, reset_home
+        if opts.encrypted:
+            key = os.urandom(32)
+            vault_crypto.use_key(key)
+            vault._session_key = key    # skip the passphrase prompt
+        else:
+            vault._session_key = False
+        reset_home(home, opts.encrypted)
+        ids = build_vault(opts.entries)
+        results = asyncio.run(bench(ids, opts.fetch))
+        reference = None if opts.encrypted else cli_lookup_ms(home, ids[0])
+    finally:
+        shutil.rmtree(home, ignore_errors=True)
+
+    print(f"{'AsyncVault':<28} {'ms':>9}")
+    for name, ms in results.items():
+        print(f"{name:<28} {ms:>9.2f}")
+    gathered = results[f"{opts.fetch} gets, gathered"]
+    if reference is None:
+        print("[*] Encrypted vault: the CLI reference needs a passphrase, skipped.")
+        return
+    print(f"{'one `vaultpass -f` process':<28} {reference:>9.2f}")
+    ok = gathered <= reference
+    print(f"[{'✓' if ok else 'X'}] {opts.fetch} concurrent gets took {gathered:.1f} ms, "
+          f"one CLI lookup {reference:.1f} ms.")
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
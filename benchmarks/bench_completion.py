@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+bench_completion.py -- Prefix lookups behind shell completion
+
+Builds a synthetic vault in a throwaway HOME, creates the ID index and
+times vault_ids.complete() for short and long prefixes, a single add with
+and without the index kept, and one `vaultpass __complete` process (what
+a Tab press costs, Python start-up included). Exits 1 if a lookup takes
+more than --budget ms.
+
+Usage: python3 benchmarks/bench_completion.py [--entries N] [--budget MS] [--encrypted]
+"""
+
+import io
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import contextlib
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO = os.path.abspath(os.path.join(BENCH_DIR, ".."))
+RUNS = 20
+
+def best_ms(fn):
+    best = None
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        fn()
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def add_ms(vault, tag):
+    counter = iter(range(RUNS))
+
+    def add():
+        with contextlib.redirect_stdout(io.StringIO()):
+            vault.add_entries([(f"bench-{tag}-{next(counter)}", "user", "pw", "")])
+    return best_ms(add)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--entries", type=int, default=100_000)
+    parser.add_argument("--budget", type=float, default=5.0, help="per-lookup budget in ms")
+    parser.add_argument("--encrypted", action="store_true", help="encrypt the vault (needs cryptography)")
+    opts = parser.parse_args()
+
+    home = tempfile.mkdtemp(prefix="vaultpass-bench-")
+    os.environ["HOME"] = home
+    sys.path.insert(0, os.path.join(REPO, "core"))
+    sys.path.insert(0, BENCH_DIR)
+    try:
+        import vault
+        import vault_crypto
+        import vault_ids
+        import vault_lock
+        from bench_suite import build_vault, reset_home
+        if opts.encrypted:
+            key = os.urandom(32)
+            vault_crypto.use_key(key)
+            vault._session_key = key    # skip the passphrase prompt
+        else:
+            vault._session_key = False
+        reset_home(home, opts.encrypted)
+        ids = build_vault(opts.entries)
+        sample = ids[len(ids) // 2]
+        results = {"add, no ID index": add_ms(vault, "plain")}
+        start = time.perf_counter()
+        with vault_lock.shared():
+            vault_ids.rebuild()
+        results["build ID index"] = (time.perf_counter() - start) * 1000
+        results["add, ID index kept"] = add_ms(vault, "kept")
+        lookups = {f"complete({prefix!r})": prefix for prefix in ("", sample[:1], sample[:4], sample)}
+        for name, prefix in lookups.items():
+            results[name] = best_ms(lambda: vault_ids.complete(prefix))
+        process = None
+        if not opts.encrypted:
+            import bench_startup
+            cmd = [sys.executable, os.path.join(REPO, "core", "vaultpass.py"), "__complete", "bash",
+                   f"vaultpass -f {sample[:4]}", ""]
+            process = bench_startup.median_ms(cmd, dict(os.environ, HOME=home), 5)
+    finally:
+        shutil.rmtree(home, ignore_errors=True)
+
+    print(f"{'ID completion, ' + str(opts.entries) + ' entries':<32} {'ms':>9}")
+    for name, ms in results.items():
+        print(f"{name:<32} {ms:>9.2f}")
+    if process is not None:
+        print(f"{'`vaultpass __complete` process':<32} {process:>9.2f}")
+    slowest = max(results[name] for name in lookups)
+    ok = slowest <= opts.budget
+    print(f"[{'✓' if ok else 'X'}] Slowest prefix lookup {slowest:.2f} ms (budget {opts.budget:.0f} ms).")
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
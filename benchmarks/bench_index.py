@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+bench_index.py -- Lookup latency of the vault ID index vs. a full line scan
+
+Builds synthetic vaults of 1k, 10k and 100k entries in a throwaway HOME
+and reports the mean time of one lookup through vault_index.find()
+against a scan that decodes every record of the file.
+
+Usage: python3 benchmarks/bench_index.py [sizes...]
+"""
+
+import os
+import sys
+import time
+import random
+import tempfile
+
+SIZES = [1_000, 10_000, 100_000]
+LOOKUPS = 200
+
+def build_vault(pass_file, n):
+    import vault_journal
+    from vault_entry import Entry
+    entries = (Entry(f"entry{i}", f"user{i}@example.com", f"pw{i:08d}", f"synthetic entry {i}") for i in range(n))
+    with open(pass_file, "wb") as f:
+        f.write(vault_journal.MAGIC)
+        f.writelines(vault_journal.batch(entries))
+
+def linear_find(pass_file, entry_id):
+    import vault_journal
+    found = []
+    with open(pass_file, "rb") as f:
+        next(f)
+        for raw in f:
+            op, payload = vault_journal.decode(raw)
+            if op == vault_journal.PUT and payload.id == entry_id:
+                found.append(payload)
+    return found
+
+def time_lookups(fn, ids):
+    start = time.perf_counter()
+    for entry_id in ids:
+        fn(entry_id)
+    return (time.perf_counter() - start) / len(ids)
+
+def main():
+    sizes = [int(a) for a in sys.argv[1:]] or SIZES
+    home = tempfile.mkdtemp(prefix="vaultpass-bench-")
+    os.environ["HOME"] = home
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "core"))
+    import vault_index
+
+    os.makedirs(vault_index.SYSTEM_DIR, exist_ok=True)
+    print(f"{'entries':>10} {'index build':>12} {'indexed':>12} {'full scan':>12}")
+    for n in sizes:
+        build_vault(vault_index.PASS_FILE, n)
+        start = time.perf_counter()
+        vault_index.rebuild()
+        build = time.perf_counter() - start
+        ids = [f"entry{random.randrange(n)}" for _ in range(LOOKUPS)]
+        indexed = time_lookups(vault_index.find, ids)
+        scan = time_lookups(lambda i: linear_find(vault_index.PASS_FILE, i), ids[:20])
+        print(f"{n:>10} {build * 1e3:>10.1f}ms {indexed * 1e6:>10.1f}us {scan * 1e6:>10.1f}us")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+bench_passgen.py -- Password generation throughput
+
+Compares password_gen.generate_passwords() against the previous
+per-character SystemRandom generator with whole-password retries, in
+passwords per second for a few lengths, then times opening the bundled
+diceware wordlist and generating 6-word passphrases. Last, it checks that
+8-character passwords are uniform over every allowed string: how many
+lowercase letters they hold must follow the exact distribution (chi-square
+test); a generator that plants one character of each class at a random
+spot fails it. Exits 1 if it does.
+
+Usage: python3 benchmarks/bench_passgen.py [count]
+"""
+
+import os
+import sys
+import math
+import time
+import random
+import string
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "core"))
+import password_gen
+
+LENGTHS = [8, 16, 32, 64]
+UNIFORMITY_LENGTH = 8
+UNIFORMITY_SAMPLES = 200_000
+CHI2_LIMIT = 20.5    # p < 0.001 for up to 5 degrees of freedom
+
+def old_generate_password(length):
+    chars = string.ascii_letters + string.digits + '!@#$%^&*_+-='
+    while True:
+        password = ''.join(random.SystemRandom().choice(chars) for _ in range(length))
+        if (any(c.islower() for c in password) and
+            any(c.isupper() for c in password) and
+            any(c.isdigit() for c in password) and
+            any(c in '!@#$%^&*_+-=' for c in password)):
+            return password
+
+def rate(fn, count):
+    start = time.perf_counter()
+    fn(count)
+    return count / (time.perf_counter() - start)
+
+def allowed(length, classes):
+    """Return how many strings of length characters hold every class at
+    least once (inclusion-exclusion over the classes left out)."""
+    total = 0
+    for mask in range(1 << len(classes)):
+        left_out = [chars for k, chars in enumerate(classes) if mask >> k & 1]
+        size = sum(len(chars) for chars in classes) - sum(len(chars) for chars in left_out)
+        total += (-1) ** len(left_out) * size ** length
+    return total
+
+def lowercase_counts(length):
+    """Return {k: probability that a uniform allowed password holds k lowercase letters}."""
+    lower, others = password_gen.DEFAULT_POLICY[0], password_gen.DEFAULT_POLICY[1:]
+    total = allowed(length, password_gen.DEFAULT_POLICY)
+    return {k: math.comb(length, k) * len(lower) ** k * allowed(length - k, others) / total
+            for k in range(1, length - len(others) + 1)}
+
+def uniformity_chi2(length, samples):
+    expected = lowercase_counts(length)
+    seen = dict.fromkeys(expected, 0)
+    lower = set(password_gen.DEFAULT_POLICY[0])
+    for password in password_gen.generate_passwords(samples, length):
+        seen[sum(c in lower for c in password)] += 1
+    # Bins expected to hold fewer than 5 draws are pooled into their neighbour
+    chi2, pooled_seen, pooled_expected = 0.0, 0, 0.0
+    for k in sorted(expected):
+        pooled_seen += seen[k]
+        pooled_expected += expected[k] * samples
+        if pooled_expected >= 5:
+            chi2 += (pooled_seen - pooled_expected) ** 2 / pooled_expected
+            pooled_seen, pooled_expected = 0, 0.0
+    return chi2
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    print(f"{'length':>7} {'bulk pw/s':>12} {'old pw/s':>12} {'speedup':>8}")
+    for length in LENGTHS:
+        bulk = rate(lambda n: sum(1 for _ in password_gen.generate_passwords(n, length)), count)
+        old = rate(lambda n: [old_generate_password(length) for _ in range(n)], max(count // 50, 100))
+        print(f"{length:>7} {bulk:>12,.0f} {old:>12,.0f} {bulk / old:>7.1f}x")
+    start = time.perf_counter()
+    policy = password_gen.DicewarePolicy("diceware", 6)
+    opened = (time.perf_counter() - start) * 1000
+    phrases = rate(lambda n: sum(1 for _ in policy.generate(n)), count)
+    print(f"[*] Diceware: wordlist opened in {opened:.2f} ms, {phrases:,.0f} passphrases/s "
+          f"({policy.entropy_bits():.2f} bits each).")
+    chi2 = uniformity_chi2(UNIFORMITY_LENGTH, UNIFORMITY_SAMPLES)
+    ok = chi2 <= CHI2_LIMIT
+    print(f"[{'✓' if ok else 'X'}] Lowercase-count distribution of {UNIFORMITY_SAMPLES:,} "
+          f"{UNIFORMITY_LENGTH}-character passwords: chi-square {chi2:.1f} (limit {CHI2_LIMIT}).")
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+bench_search.py -- Fuzzy search latency over the trigram index
+
+Builds synthetic vaults (service-style IDs, e-mail usernames, short info
+text) in a throwaway HOME, indexes them once, then reports the mean and
+worst time of a fuzzy query -- exact words, prefixes and typos -- and of
+the incremental index update behind one add, edit and delete.
+
+Usage: python3 benchmarks/bench_search.py [sizes...]
+"""
+
+import os
+import sys
+import time
+import random
+import tempfile
+
+SIZES = [1_000, 10_000, 100_000]
+BUDGET_MS = 10
+SERVICES = ["github", "gitlab", "bitbucket", "aws", "azure", "gmail", "outlook", "paypal", "stripe",
+            "netflix", "spotify", "slack", "discord", "jira", "notion", "dropbox", "heroku", "docker",
+            "npm", "pypi", "vpn", "router", "bank", "steam", "twitter", "linkedin", "reddit"]
+KINDS = ["token", "login", "admin", "api", "deploy", "backup", "personal", "work", "prod", "staging"]
+NAMES = ["alice", "bob", "carol", "dave", "erin", "frank", "grace", "heidi", "ivan", "judy"]
+DOMAINS = ["example.com", "mail.org", "corp.net", "proton.me"]
+WORDS = ["ci", "runner", "read", "only", "scope", "rotated", "2fa", "recovery", "shared", "team",
+         "old", "new", "key", "laptop", "phone", "home", "office", "billing", "root", "main"]
+QUERIES = ["gitlab token", "gitlab", "gtilab", "paypl", "deploy", "alice", "recovery codes", "strip"]
+
+def synthetic_entries(n, seed=1):
+    from vault_entry import Entry
+    rnd = random.Random(seed)
+    for i in range(n):
+        entry_id = f"{rnd.choice(SERVICES)}-{rnd.choice(KINDS)}-{i}"
+        user = f"{rnd.choice(NAMES)}{rnd.randrange(100)}@{rnd.choice(DOMAINS)}"
+        info = " ".join(rnd.sample(WORDS, 3))
+        yield Entry(entry_id, user, f"pw{i:08d}", info)
+
+def main():
+    sizes = [int(a) for a in sys.argv[1:]] or SIZES
+    os.environ["HOME"] = tempfile.mkdtemp(prefix="vaultpass-bench-")
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "core"))
+    import vault_index
+    import vault_journal
+    import vault_search
+    from vault_entry import Entry
+
+    os.makedirs(vault_index.SYSTEM_DIR, exist_ok=True)
+    print(f"{'entries':>10} {'index build':>12} {'query mean':>11} {'query max':>10} {'add':>8} {'edit':>8} {'delete':>8}")
+    over = False
+    for n in sizes:
+        with open(vault_index.PASS_FILE, "wb") as f:
+            f.write(vault_journal.MAGIC)
+            f.writelines(vault_journal.batch(synthetic_entries(n)))
+        vault_index.rebuild()
+        start = time.perf_counter()
+        vault_search.rebuild()
+        build = time.perf_counter() - start
+
+        timings = []
+        for _ in range(5):
+            for query in QUERIES:
+                start = time.perf_counter()
+                vault_search.search(query)
+                timings.append(time.perf_counter() - start)
+        mean, worst = sum(timings) / len(timings), max(timings)
+
+        def timed(entries, deleted=()):
+            start = time.perf_counter()
+            vault_search.update(*vault_index.append_entries(entries, deleted))
+            return time.perf_counter() - start
+        add = timed([Entry("gitlab-ci-new", "carol1@example.com", "pw", "ci runner")])
+        edit = timed([Entry("gitlab-ci-new", "dave2@example.com", "pw", "ci runner")], ["gitlab-ci-new"])
+        delete = timed([], ["gitlab-ci-new"])
+        over |= mean * 1e3 > BUDGET_MS
+        print(f"{n:>10} {build * 1e3:>10.0f}ms {mean * 1e3:>9.2f}ms {worst * 1e3:>8.2f}ms "
+              f"{add * 1e3:>6.2f}ms {edit * 1e3:>6.2f}ms {delete * 1e3:>6.2f}ms")
+    print(f"[{'!' if over else '✓'}] Mean query time {'over' if over else 'within'} the {BUDGET_MS} ms budget.")
+    sys.exit(1 if over else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+bench_server.py -- Lookups per second through `vaultpass serve`
+
+Starts a vault server on a synthetic vault in a throwaway HOME and times
+single gets, batched gets (get_many) and puts from one client connection,
+then a burst of gets while another process writes to the vault, so every
+lookup pays for picking up the change. Exits 1 if single gets fall below
+the target rate.
+
+Usage: python3 benchmarks/bench_server.py [--entries N] [--calls N] [--min-rate R]
+"""
+
+import os
+import sys
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import subprocess
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+CORE = os.path.abspath(os.path.join(BENCH_DIR, "..", "core"))
+EXTERNAL = 200    # entries another process adds while the server is answering
+WRITER = ("import sys; sys.path.insert(0, {core!r}); import vault; vault._session_key = False\n"
+          "for i in range({n}): vault.add_entry('ext%d' % i, 'u', 'p')")
+
+def start_server(home, socket_path):
+    env = dict(os.environ, HOME=home)
+    code = f"import sys; sys.path.insert(0, {CORE!r}); import vault_server; vault_server.serve({socket_path!r})"
+    proc = subprocess.Popen([sys.executable, "-c", code], env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 30
+    while not os.path.exists(socket_path):
+        if proc.poll() is not None or time.time() > deadline:
+            raise RuntimeError("vault server did not start")
+        time.sleep(0.02)
+    return proc
+
+def rate(fn, calls):
+    start = time.perf_counter()
+    for i in range(calls):
+        fn(i)
+    return calls / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--entries", type=int, default=100_000)
+    parser.add_argument("--calls", type=int, default=20_000)
+    parser.add_argument("--min-rate", type=float, default=2000.0, help="single gets per second required")
+    opts = parser.parse_args()
+
+    home = tempfile.mkdtemp(prefix="vaultpass-bench-")
+    os.environ["HOME"] = home
+    sys.path.insert(0, CORE)
+    sys.path.insert(0, BENCH_DIR)
+    import config
+    from bench_suite import build_vault
+    from vault_client import VaultClient
+    config.set_config_value("encryption", False)
+    config.set_config_value("passphrase_set", False)
+    ids = build_vault(opts.entries)
+    socket_path = os.path.join(home, "vault.sock")
+    rnd = random.Random(1)
+    server = start_server(home, socket_path)
+    try:
+        with VaultClient(socket_path) as client:
+            picks = [rnd.choice(ids) for _ in range(opts.calls)]
+            gets = rate(lambda i: client.get(picks[i]), opts.calls)
+            batches = rate(lambda i: client.get_many(picks[i * 100:(i + 1) * 100]), opts.calls // 100) * 100
+            puts = rate(lambda i: client.put(f"bench{i}", "user", "pw"), min(opts.calls, 1000))
+
+            writer = subprocess.Popen([sys.executable, "-c", WRITER.format(core=CORE, n=EXTERNAL)],
+                                      env=dict(os.environ, HOME=home), stdout=subprocess.DEVNULL)
+            contended = rate(lambda i: client.get(picks[i]), opts.calls // 4)
+            writer.wait()
+            picked_up = sum(1 for entries in client.get_many([f"ext{i}" for i in range(EXTERNAL)]).values() if entries)
+            client.stop()
+        server.wait(timeout=10)
+    finally:
+        if server.poll() is None:
+            server.terminate()
+        shutil.rmtree(home, ignore_errors=True)
+
+    print(f"{'operation':<28} {'per second':>12}")
+    for name, value in (("get", gets), ("get_many (per ID)", batches), ("put", puts),
+                        ("get during external writes", contended)):
+        print(f"{name:<28} {value:>12,.0f}")
+    ok = gets >= opts.min_rate and picked_up == EXTERNAL
+    print(f"[{'✓' if picked_up == EXTERNAL else 'X'}] Server saw {picked_up} of {EXTERNAL} entries written by another process.")
+    print(f"[{'✓' if gets >= opts.min_rate else 'X'}] {gets:,.0f} gets/s (target {opts.min_rate:,.0f}).")
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
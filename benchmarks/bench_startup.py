@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+bench_startup.py -- Cold start of the vaultpass launcher against a budget
+
+Runs core/vaultpass.py in a throwaway HOME (whose ~/.vaultpass/core points
+at this checkout, with an unencrypted vault) for a few commands, takes the
+median of several runs and fails if any exceeds the budget. The interpreter's
+own start-up (python -c pass) is reported alongside for reference.
+
+Usage: python3 benchmarks/bench_startup.py [--budget MS] [--runs N]
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+REPO = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+COMMANDS = [["-h"], ["gen", "--count", "1"], ["-f", "entry1"]]
+
+def make_home():
+    home = tempfile.mkdtemp(prefix="vaultpass-bench-")
+    install = os.path.join(home, ".vaultpass")
+    os.makedirs(os.path.join(install, "system"))
+    os.symlink(os.path.join(REPO, "core"), os.path.join(install, "core"))
+    with open(os.path.join(install, ".config"), "w") as f:
+        f.write("encryption=off\npassphrase_set=no\ntheme=light\n")
+    with open(os.path.join(install, "system", "passwords.gpg"), "w") as f:
+        for i in range(1000):
+            f.write(f"entry{i}:|user{i}|pw{i}\n")
+    return home
+
+def median_ms(cmd, env, runs):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(cmd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=False)
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--budget", type=float, default=50.0, help="per-command budget in ms")
+    parser.add_argument("--runs", type=int, default=15)
+    opts = parser.parse_args()
+
+    env = dict(os.environ, HOME=make_home())
+    launcher = os.path.join(REPO, "core", "vaultpass.py")
+    # Warm the bytecode cache so we time start-up, not compilation
+    subprocess.run([sys.executable, launcher, "-f", "entry1"], env=env, stdout=subprocess.DEVNULL)
+
+    base = median_ms([sys.executable, "-c", "pass"], env, opts.runs)
+    print(f"{'python -c pass':<28} {base:>7.1f} ms")
+    over = []
+    for args in COMMANDS:
+        ms = median_ms([sys.executable, launcher] + args, env, opts.runs)
+        flag = "" if ms <= opts.budget else "  OVER BUDGET"
+        print(f"{'vaultpass ' + ' '.join(args):<28} {ms:>7.1f} ms{flag}")
+        if flag:
+            over.append(args)
+    if over:
+        print(f"[X] {len(over)} command(s) exceeded the {opts.budget:.0f} ms budget.")
+        sys.exit(1)
+    print(f"[✓] All commands within the {opts.budget:.0f} ms budget.")
+
+if __name__ == "__main__":
+    main()
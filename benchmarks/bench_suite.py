@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+bench_suite.py -- Vault operations, generation and start-up at scale
+
+Builds synthetic vaults of each size in a throwaway HOME and times the
+vault API the CLI uses: add, search, edit and delete (mean per call),
+listing the whole vault, a full and an incremental backup, and a restore.
+Password generation throughput and launcher cold start are measured once.
+
+Results go to a JSON file and are compared against a stored baseline;
+any metric worse than the baseline by more than the threshold is a
+regression and the suite exits 1. Run it before and after every storage
+change, with --save-baseline on the "before" run. Timings only compare on
+the machine that made them, so no baseline is committed: without one the
+suite exits 1 before running, and says how to save one.
+
+Usage: python3 benchmarks/bench_suite.py [--sizes N ...] [--encrypted]
+           [--output FILE] [--baseline FILE] [--save-baseline] [--threshold X]
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import tempfile
+import contextlib
+import subprocess
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO = os.path.abspath(os.path.join(BENCH_DIR, ".."))
+SIZES = [1_000, 10_000, 100_000, 1_000_000]
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, "baseline.json")
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+OPS = 20              # calls averaged per add/search/edit/delete
+GEN_COUNT = 100_000
+THRESHOLD = 1.25      # worse than baseline by more than 25% is a regression
+NOISE_MS = 0.2        # differences below this are timer noise
+
+def _quiet():
+    return contextlib.redirect_stdout(io.StringIO())
+
+def _timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    with _quiet():
+        fn(*args, **kwargs)
+    return (time.perf_counter() - start) * 1000
+
+def build_vault(n):
+    """
+    Writes an n-entry journal straight to the vault file (encrypting it if
+    a key is set) and indexes it; returns the entry IDs.
+    """
+    import vault_crypto
+    import vault_index
+    import vault_journal
+    from bench_search import synthetic_entries
+
+    ids = []
+    def records():
+        yield vault_journal.MAGIC
+        def entries():
+            for entry in synthetic_entries(n):
+                ids.append(entry.id)
+                yield entry
+        yield from vault_journal.batch(entries())
+    vault_crypto.rewrite(vault_index.PASS_FILE, records())
+    vault_index.rebuild()
+    return ids
+
+def reset_home(home, encrypted):
+    import config
+    for sub in ("system", "backup"):
+        shutil.rmtree(os.path.join(home, ".vaultpass", sub), ignore_errors=True)
+    config.set_config_value("encryption", encrypted)
+    config.set_config_value("passphrase_set", encrypted)
+
+def bench_size(n, home, encrypted):
+    import vault
+    import vault_backup
+
+    reset_home(home, encrypted)
+
+    start = time.perf_counter()
+    ids = build_vault(n)
+    result = {"build_s": time.perf_counter() - start}
+    rnd = random.Random(n)
+    picks = rnd.sample(ids, OPS * 3)
+
+    result["add_entry_ms"] = sum(_timed(vault.add_entry, f"bench-new-{i}", "bench@example.com", "pw", "bench")
+                                 for i in range(OPS)) / OPS
+    result["search_entry_ms"] = sum(_timed(vault.search_entry, entry_id) for entry_id in picks[:OPS]) / OPS
+    result["edit_entry_ms"] = sum(_timed(vault.edit_entry, entry_id, "edited@example.com")
+                                  for entry_id in picks[OPS:2 * OPS]) / OPS
+    result["delete_entry_ms"] = sum(_timed(vault.delete_entry, entry_id) for entry_id in picks[2 * OPS:]) / OPS
+    result["list_entries_ms"] = _timed(vault.list_entries)
+    result["list_sorted_page_ms"] = _timed(vault.list_entries, sort="id", limit=50)
+    result["list_sorted_deep_page_ms"] = _timed(vault.list_entries, sort="id", offset=n // 2, limit=50)
+
+    result["backup_full_ms"] = _timed(vault.backup_vault)
+    with _quiet():
+        vault.add_entry("bench-after-backup", "bench@example.com", "pw", "")
+    result["backup_incremental_ms"] = _timed(vault.backup_vault)
+    result["restore_ms"] = _timed(vault.restore_vault, vault_backup.list_snapshots()[-1])
+    return result
+
+def bench_generation():
+    import password_gen
+    start = time.perf_counter()
+    for _ in password_gen.generate_passwords(GEN_COUNT, 16):
+        pass
+    batch = GEN_COUNT / (time.perf_counter() - start)
+    start = time.perf_counter()
+    for _ in range(GEN_COUNT // 10):
+        password_gen.generate_password(16)
+    single = (GEN_COUNT // 10) / (time.perf_counter() - start)
+    return {"generate_passwords_per_s": batch, "generate_password_per_s": single}
+
+def bench_cold_start(runs=9):
+    import bench_startup
+    env = dict(os.environ, HOME=bench_startup.make_home())
+    launcher = os.path.join(REPO, "core", "vaultpass.py")
+    subprocess.run([sys.executable, launcher, "-f", "entry1"], env=env, stdout=subprocess.DEVNULL)
+    return {f"cold_start_{args[0].lstrip('-')}_ms": bench_startup.median_ms([sys.executable, launcher] + args, env, runs)
+            for args in bench_startup.COMMANDS}
+
+def compare(results, baseline, threshold):
+    """
+    Returns [(metric, baseline, current, ratio)] for metrics worse than
+    baseline by more than threshold. *_per_s metrics are higher-is-better.
+    """
+    worse = []
+    for metric, old in baseline.get("metrics", {}).items():
+        new = results["metrics"].get(metric)
+        if new is None or not old:
+            continue
+        higher_better = metric.endswith("_per_s")
+        ratio = old / new if higher_better else new / old
+        noise = not higher_better and metric.endswith("_ms") and new - old < NOISE_MS
+        if ratio > threshold and not noise:
+            worse.append((metric, old, new, ratio))
+    return worse
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    parser.add_argument("--encrypted", action="store_true", help="encrypt the synthetic vaults (needs cryptography)")
+    parser.add_argument("--output", help="results file (default: benchmarks/results/<time>.json)")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD)
+    opts = parser.parse_args()
+    if not opts.save_baseline and not os.path.isfile(opts.baseline):
+        print(f"[X] No baseline at {opts.baseline}. Baselines are per machine; save one from the")
+        print("    code before your change, then run the suite again after it:")
+        print("    python3 benchmarks/bench_suite.py --save-baseline")
+        sys.exit(1)
+
+    home = tempfile.mkdtemp(prefix="vaultpass-bench-")
+    os.environ["HOME"] = home
+    sys.path.insert(0, os.path.join(REPO, "core"))
+    sys.path.insert(0, BENCH_DIR)
+    import vault
+    import vault_crypto
+    if opts.encrypted:
+        key = os.urandom(32)
+        vault_crypto.use_key(key)
+        vault._session_key = key    # skip the passphrase prompt
+    else:
+        vault._session_key = False
+
+    metrics = {}
+    try:
+        for n in opts.sizes:
+            print(f"[*] {n} entries...")
+            for name, value in bench_size(n, home, opts.encrypted).items():
+                metrics[f"{n}.{name}"] = value
+        metrics.update(bench_generation())
+        metrics.update(bench_cold_start())
+    finally:
+        shutil.rmtree(home, ignore_errors=True)
+
+    results = {
+        "meta": {"time": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": platform.python_version(),
+                 "platform": platform.platform(), "encrypted": opts.encrypted, "sizes": opts.sizes},
+        "metrics": metrics,
+    }
+    for metric, value in metrics.items():
+        print(f"  {metric:<40} {value:>14.2f}")
+
+    output = opts.output or os.path.join(RESULTS_DIR, time.strftime("%Y%m%d_%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"[✓] Results written to {output}")
+
+    if opts.save_baseline:
+        with open(opts.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"[✓] Baseline saved to {opts.baseline}")
+        return
+    with open(opts.baseline) as f:
+        baseline = json.load(f)
+    worse = compare(results, baseline, opts.threshold)
+    for metric, old, new, ratio in worse:
+        print(f"[X] {metric}: {old:.2f} -> {new:.2f} ({ratio:.2f}x worse)")
+    if worse:
+        print(f"[X] {len(worse)} regression(s) beyond {opts.threshold:.2f}x of the baseline.")
+        sys.exit(1)
+    print(f"[✓] No regressions beyond {opts.threshold:.2f}x of the baseline.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+check_agent.py -- The unlock agent against malformed requests
+
+Starts `agent.py serve` in a throwaway HOME and sends it requests a real
+client never would: JSON that isn't an object ([], "x", 42, null), a
+request without a known op, bytes that aren't JSON, and a client that hangs
+up without sending anything. Then:
+
+- every JSON request must get an error reply, not a dropped connection
+- after each one the agent must still answer status
+- put/get must still round-trip a key and stop must shut the agent down
+
+Exits 1 if any of these fails.
+
+Usage: python3 benchmarks/check_agent.py
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import socket
+import tempfile
+import subprocess
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO = os.path.abspath(os.path.join(BENCH_DIR, ".."))
+START_WAIT = 5.0     # seconds for the agent to create its socket
+
+NON_OBJECTS = [b"[]", b'"x"', b"42", b"null"]
+
+def raw_request(path, payload):
+    """
+    Sends one line as-is and returns the parsed reply, or None if the agent
+    closed the connection without one (or is gone).
+    """
+    buf = b""
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+            conn.settimeout(2.0)
+            conn.connect(path)
+            if payload is not None:
+                conn.sendall(payload + b"\n")
+            conn.shutdown(socket.SHUT_WR)
+            while True:
+                chunk = conn.recv(4096)
+                if not chunk:
+                    break
+                buf += chunk
+    except OSError:
+        return None
+    return json.loads(buf) if buf.strip() else None
+
+def main():
+    if not hasattr(socket, "AF_UNIX"):
+        print("[!] No Unix sockets on this platform, nothing to check")
+        return
+
+    home = tempfile.mkdtemp(prefix="vaultpass-agent-")
+    env = dict(os.environ, HOME=home)
+    proc = subprocess.Popen([sys.executable, os.path.join(REPO, "core", "agent.py"), "serve", "60"],
+                            env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    failures = []
+
+    def expect(ok, message):
+        print(f"[{'✓' if ok else 'X'}] {message}")
+        if not ok:
+            failures.append(message)
+
+    try:
+        os.environ["HOME"] = home
+        sys.path.insert(0, os.path.join(REPO, "core"))
+        import agent
+
+        deadline = time.monotonic() + START_WAIT
+        while agent.status() is None and time.monotonic() < deadline:
+            time.sleep(0.05)
+        expect(agent.status() is not None, "agent answers status")
+
+        for payload in NON_OBJECTS:
+            reply = raw_request(agent.SOCKET_PATH, payload)
+            expect(isinstance(reply, dict) and "error" in reply,
+                   f"{payload.decode()} -> {reply}")
+            expect(agent.status() is not None, f"agent still up after {payload.decode()}")
+
+        reply = raw_request(agent.SOCKET_PATH, b'{"op": "nope"}')
+        expect(isinstance(reply, dict) and "error" in reply, f'{{"op": "nope"}} -> {reply}')
+        raw_request(agent.SOCKET_PATH, b"not json")
+        expect(agent.status() is not None, "agent still up after a line that isn't JSON")
+        raw_request(agent.SOCKET_PATH, None)
+        expect(agent.status() is not None, "agent still up after a client hung up")
+
+        expect(agent.put_key("k3y") and agent.get_key() == "k3y", "put/get round-trips a key")
+        expect(agent.stop(), "stop acknowledged")
+        try:
+            proc.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            pass
+        expect(proc.returncode == 0, f"agent exited cleanly (code {proc.returncode})")
+        if proc.returncode:
+            print(proc.stderr.read().decode(), file=sys.stderr)
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+        shutil.rmtree(home, ignore_errors=True)
+
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+check_update.py -- The background update check against a local server
+
+Serves a version file from a stand-in HTTP server (http.server on
+127.0.0.1, answering after --delay seconds) and points vaultpass at it with
+VAULTPASS_UPDATE_URL, in a throwaway HOME. Then:
+
+- update.check_in_background() must return well before the server answers
+- the detached checker must write update_cache with the served version
+- a check that is no longer due must not spawn another checker
+- the next `vaultpass -h` must print the update notice to stderr, and
+  nothing about it to stdout
+
+Exits 1 if any of these fails.
+
+Usage: python3 benchmarks/check_update.py [--delay SECONDS] [--budget MS]
+"""
+
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import threading
+import subprocess
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO = os.path.abspath(os.path.join(BENCH_DIR, ".."))
+SERVED_VERSION = "99.0.0"
+CACHE_WAIT = 15.0    # seconds for the detached checker to write its result
+
+def serve(delay):
+    hits = []
+
+    class VersionFile(BaseHTTPRequestHandler):
+        def do_GET(self):
+            hits.append(self.path)
+            time.sleep(delay)
+            body = f"{SERVED_VERSION}\n".encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), VersionFile)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/version.txt", hits
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--delay", type=float, default=1.0, help="seconds the server waits before answering")
+    parser.add_argument("--budget", type=float, default=200.0, help="ms check_in_background may take")
+    opts = parser.parse_args()
+
+    home = tempfile.mkdtemp(prefix="vaultpass-update-")
+    server, url, hits = serve(opts.delay)
+    failures = []
+
+    def expect(ok, message):
+        print(f"[{'✓' if ok else 'X'}] {message}")
+        if not ok:
+            failures.append(message)
+
+    try:
+        os.environ["HOME"] = home
+        os.environ["VAULTPASS_UPDATE_URL"] = url
+        sys.path.insert(0, os.path.join(REPO, "core"))
+        import update
+        install_dir = os.path.join(home, ".vaultpass")
+        last_update_file = os.path.join(install_dir, "system", ".last_update_check")
+        cache_file = os.path.join(install_dir, "system", update.CACHE_NAME)
+
+        start = time.perf_counter()
+        spawned = update.check_in_background(url, install_dir, last_update_file, 7)
+        elapsed = (time.perf_counter() - start) * 1000
+        expect(spawned and elapsed <= opts.budget,
+               f"check_in_background returned in {elapsed:.1f} ms (budget {opts.budget:.0f} ms, "
+               f"server answers after {opts.delay * 1000:.0f} ms)")
+
+        deadline = time.monotonic() + CACHE_WAIT
+        while not os.path.exists(cache_file) and time.monotonic() < deadline:
+            time.sleep(0.05)
+        cache = update.read_cache(last_update_file)
+        expect(cache.get("remote_version") == SERVED_VERSION and not cache.get("error"),
+               f"update_cache written by the detached checker: {cache or 'missing'}")
+        expect(len(hits) == 1, f"version file fetched {len(hits)} time(s)")
+
+        expect(not update.check_in_background(url, install_dir, last_update_file, 7),
+               "no second checker while the last one is recent")
+
+        run = subprocess.run([sys.executable, os.path.join(REPO, "core", "vaultpass.py"), "-h"],
+                             env=dict(os.environ), capture_output=True, text=True, timeout=60)
+        notice = f"Vaultpass v{SERVED_VERSION} is available"
+        expect(notice in run.stderr and notice not in run.stdout,
+               f"next run printed the notice to stderr: {run.stderr.strip() or '(nothing)'}")
+        time.sleep(0.2)
+        expect(len(hits) == 1, "the next run did not fetch again")
+    finally:
+        server.shutdown()
+        shutil.rmtree(home, ignore_errors=True)
+
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+stress_writers.py -- Concurrent vaultpass writers must not lose updates
+
+Seeds a vault in a throwaway HOME, then starts N writer processes at the
+same instant. Writer i adds w<i>, changes the username of s<i> and deletes
+d<i>, each as its own locked read-modify-write, so every command races all
+the others. Afterwards every one of the 3N mutations must be in the vault
+and the journal must replay cleanly.
+
+Then, while this process holds the vault's shared lock, readers must still
+get through (readers don't block each other) and a writer given a short
+lock_timeout must give up with a LockTimeout rather than hang.
+
+Exits 1 if anything was lost or a lock misbehaved.
+
+Usage: python3 benchmarks/stress_writers.py [--writers N] [--encrypted]
+"""
+
+import io
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import contextlib
+import subprocess
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO = os.path.abspath(os.path.join(BENCH_DIR, ".."))
+WRITERS = 50
+READERS = 8
+START_DELAY = 1.0    # seconds for every worker to import before the start time
+TIMED_OUT = 3        # worker exit code for a LockTimeout
+
+def _open_vault(key_hex):
+    sys.path.insert(0, os.path.join(REPO, "core"))
+    import vault
+    import vault_crypto
+    if key_hex:
+        key = bytes.fromhex(key_hex)
+        vault_crypto.use_key(key)
+        vault._session_key = key    # skip the passphrase prompt
+    return vault
+
+def worker(role, i, start_at, key_hex):
+    """
+    Runs one writer or reader inside a child process.
+    """
+    vault = _open_vault(key_hex)
+    import vault_lock
+    time.sleep(max(0.0, start_at - time.time()))
+    try:
+        if role == "writer":
+            vault.add_entry(f"w{i}", f"user{i}", f"pw{i}", "added")
+            vault.edit_entry(f"s{i}", f"edited{i}")
+            vault.delete_entry(f"d{i}")
+        else:
+            vault.search_entries([f"s{i}"])
+    except vault_lock.LockTimeout as e:
+        print(f"[X] {e}")
+        sys.exit(TIMED_OUT)
+
+def spawn(role, count, home, key_hex):
+    env = dict(os.environ, HOME=home)
+    start_at = time.time() + START_DELAY
+    return [subprocess.Popen([sys.executable, os.path.abspath(__file__), "--worker", role, str(i),
+                              repr(start_at), key_hex],
+                             env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+            for i in range(count)]
+
+def finish(procs):
+    outputs = []
+    for proc in procs:
+        out, _ = proc.communicate()
+        outputs.append((proc.returncode, out))
+    return outputs
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--writers", type=int, default=WRITERS)
+    parser.add_argument("--encrypted", action="store_true", help="encrypt the vault (needs cryptography)")
+    parser.add_argument("--worker", nargs=4, help=argparse.SUPPRESS)
+    opts = parser.parse_args()
+    if opts.worker:
+        role, i, start_at, key_hex = opts.worker
+        worker(role, int(i), float(start_at), key_hex)
+        return
+
+    home = tempfile.mkdtemp(prefix="vaultpass-stress-")
+    os.environ["HOME"] = home
+    key_hex = os.urandom(32).hex() if opts.encrypted else ""
+    n = opts.writers
+    failures = []
+    try:
+        vault = _open_vault(key_hex)
+        import config
+        import vault_index
+        import vault_journal
+        import vault_lock
+        config.set_config_value("encryption", opts.encrypted)
+        config.set_config_value("passphrase_set", opts.encrypted)
+        if not opts.encrypted:
+            vault._session_key = False
+        with contextlib.redirect_stdout(io.StringIO()):
+            vault.add_entries([(f"{prefix}{i}", "seed", "pw", "") for prefix in "sd" for i in range(n)])
+
+        print(f"[*] {n} writers, each adding, editing and deleting one entry...")
+        start = time.perf_counter()
+        results = finish(spawn("writer", n, home, key_hex))
+        elapsed = time.perf_counter() - start - START_DELAY
+        for i, (code, out) in enumerate(results):
+            if code:
+                failures.append(f"writer {i} exited {code}: {out.strip().splitlines()[-1:]}")
+
+        found = vault_index.find_many([f"{prefix}{i}" for prefix in "wsd" for i in range(n)])
+        for i in range(n):
+            if [(e.user, e.password) for e in found[f"w{i}"]] != [(f"user{i}", f"pw{i}")]:
+                failures.append(f"add of w{i} lost")
+            if [e.user for e in found[f"s{i}"]] != [f"edited{i}"]:
+                failures.append(f"edit of s{i} lost")
+            if found[f"d{i}"]:
+                failures.append(f"delete of d{i} lost")
+        vault_index.rebuild()
+        try:
+            records = sum(1 for _ in vault_journal.iter_records(vault.PASS_FILE))
+            print(f"[*] Journal replays cleanly ({records} records).")
+        except ValueError as e:
+            failures.append(f"journal: {e}")
+        print(f"[*] Writers finished in {elapsed:.2f}s.")
+
+        print(f"[*] {READERS} readers while the vault is held shared...")
+        config.set_config_value("lock_timeout", 0.5)
+        with vault_lock.shared():
+            readers = spawn("reader", READERS, home, key_hex)
+            writer = spawn("writer", 1, home, key_hex)
+            results = finish(readers)
+            blocked = finish(writer)[0]
+        for i, (code, out) in enumerate(results):
+            if code or "[✓]" not in out:
+                failures.append(f"reader {i} failed under a shared lock: {out.strip().splitlines()[-1:]}")
+        if blocked[0] != TIMED_OUT:
+            failures.append(f"a writer did not time out on a held shared lock: {blocked[1].strip().splitlines()[-1:]}")
+    finally:
+        shutil.rmtree(home, ignore_errors=True)
+
+    for failure in failures:
+        print(f"[X] {failure}")
+    if failures:
+        sys.exit(1)
+    print(f"[✓] All {3 * n} mutations landed; readers ran side by side and a blocked writer timed out.")
+
+if __name__ == "__main__":
+    main()
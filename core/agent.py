@@ -0,0 +1,184 @@
+"""
+agent.py -- Vaultpass unlock agent (ssh-agent style)
+
+- Runs as a small background process listening on a Unix socket (0600);
+  on Linux it also checks each client's uid (SO_PEERCRED), elsewhere the
+  socket's mode is the only protection
+- Holds the unlocked vault key so later vaultpass runs skip the prompt
+- Forgets the key and exits after `ttl` seconds without any request
+- Speaks newline-delimited JSON: get, put, lock, status, stop
+
+If the agent isn't running (or the platform has no Unix sockets), every
+client call quietly returns None and vaultpass prompts as usual.
+"""
+
+import os
+import sys
+import time
+
+HOME = os.path.expanduser("~")
+SYSTEM_DIR = os.path.join(HOME, ".vaultpass", "system")
+SOCKET_PATH = os.path.join(SYSTEM_DIR, "agent.sock")
+DEFAULT_TTL = 900
+
+# socket/subprocess/json are imported on use: most runs never talk to an agent,
+# and the launcher keeps cold start lean.
+
+def _supported():
+    import socket
+    return hasattr(socket, "AF_UNIX")
+
+def _send(conn, msg):
+    import json
+    conn.sendall(json.dumps(msg).encode() + b"\n")
+
+def _recv(conn):
+    import json
+    buf = b""
+    while not buf.endswith(b"\n"):
+        chunk = conn.recv(4096)
+        if not chunk:
+            break
+        buf += chunk
+    return json.loads(buf) if buf.strip() else {}
+
+def _request(msg):
+    if not os.path.exists(SOCKET_PATH) or not _supported():
+        return None
+    import socket
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+            conn.settimeout(0.5)
+            conn.connect(SOCKET_PATH)
+            _send(conn, msg)
+            return _recv(conn)
+    except (OSError, ValueError):
+        return None
+
+def get_key():
+    """
+    Returns the key held by a running agent, or None.
+    """
+    reply = _request({"op": "get"})
+    return reply.get("key") if reply else None
+
+def put_key(key):
+    """
+    Hands an unlocked key to the agent, if one is running.
+    """
+    return _request({"op": "put", "key": key}) is not None
+
+def lock():
+    return _request({"op": "lock"}) is not None
+
+def stop():
+    return _request({"op": "stop"}) is not None
+
+def status():
+    return _request({"op": "status"})
+
+def start(ttl=DEFAULT_TTL):
+    """
+    Spawns a detached agent unless one is already answering. Returns True if
+    an agent is available afterwards.
+    """
+    if not _supported():
+        return False
+    if status() is not None:
+        return True
+    import subprocess
+    subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), "serve", str(ttl)],
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True
+    )
+    deadline = time.time() + 2
+    while time.time() < deadline:
+        if status() is not None:
+            return True
+        time.sleep(0.02)
+    return False
+
+def peer_is_owner(conn):
+    """
+    True if the process at the other end of a Unix socket runs as this
+    user. Linux reports its uid (SO_PEERCRED); elsewhere this is always
+    True and the socket's 0600 mode is the only protection.
+    """
+    import socket
+    if not hasattr(socket, "SO_PEERCRED"):
+        return True
+    import struct
+    creds = conn.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i"))
+    return struct.unpack("3i", creds)[1] == os.getuid()
+
+def serve(ttl=DEFAULT_TTL):
+    import socket
+    os.makedirs(SYSTEM_DIR, exist_ok=True)
+    if os.path.exists(SOCKET_PATH):
+        os.remove(SOCKET_PATH)
+    old_umask = os.umask(0o177)
+    srv = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        srv.bind(SOCKET_PATH)
+    finally:
+        os.umask(old_umask)
+    os.chmod(SOCKET_PATH, 0o600)
+    srv.listen(8)
+    srv.settimeout(1.0)
+    key = None
+    last_used = time.time()
+    try:
+        while time.time() - last_used < ttl:
+            try:
+                conn, _ = srv.accept()
+            except socket.timeout:
+                continue
+            stopping = False
+            with conn:
+                # A client that gave up (0.5s timeout) or vanished mid-reply
+                # costs only its own connection
+                try:
+                    if not peer_is_owner(conn):
+                        continue
+                    conn.settimeout(1.0)
+                    try:
+                        req = _recv(conn)
+                    except ValueError:
+                        continue
+                    if not isinstance(req, dict):
+                        _send(conn, {"error": "request must be a JSON object"})
+                        continue
+                    op = req.get("op")
+                    if op == "get":
+                        _send(conn, {"key": key})
+                        if key is not None:
+                            last_used = time.time()
+                    elif op == "put":
+                        key = req.get("key")
+                        last_used = time.time()
+                        _send(conn, {"ok": True})
+                    elif op == "lock":
+                        key = None
+                        _send(conn, {"ok": True})
+                    elif op == "status":
+                        _send(conn, {"unlocked": key is not None, "idle": int(time.time() - last_used), "ttl": ttl})
+                    elif op == "stop":
+                        stopping = True
+                        _send(conn, {"ok": True})
+                    else:
+                        _send(conn, {"error": f"unknown op {op!r}"})
+                except OSError:
+                    pass
+            if stopping:
+                break
+    finally:
+        srv.close()
+        if os.path.exists(SOCKET_PATH):
+            os.remove(SOCKET_PATH)
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "serve":
+        serve(int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_TTL)
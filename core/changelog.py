@@ -25,7 +25,9 @@ def get_latest_changelog(changelog_file, version):
             out.append(line.strip(" \n"))
     return out
 
-def show_changelog(changelog_file, version, truncate=20):
+def show_changelog(changelog_file, version, truncate=None):
+    import config
+    truncate = truncate or config.get("changelog_max")
     cli.show_banner(version)
     lines = get_latest_changelog(changelog_file, version)
     if not lines:
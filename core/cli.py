@@ -1,9 +1,26 @@
 import os
 import sys
-import vault
-import password_gen
 from banner_utils import show_banner
 
+def print_changelog_box(version, lines, width=55):
+    import textwrap
+    import config
+    max_lines = config.get("changelog_max")
+    print("   ┌" + "─" * width + "┐")
+    title = f"Vaultpass v{version}:"
+    print(f"   │ {title.ljust(width)}│")
+    for idx, line in enumerate(lines):
+        if idx >= max_lines:
+            print(f"   │ {'[...truncated. See full changelog.]'.ljust(width)}│")
+            break
+        msg = line.lstrip("- ").capitalize()
+        wrapped = textwrap.wrap(msg, width=width-2)
+        if wrapped:
+            print(f"   │ - {wrapped[0].ljust(width-2)}│")
+            for cont in wrapped[1:]:
+                print(f"   │   {cont.ljust(width-2)}│")
+    print("   └" + "─" * width + "┘")
+
 def show_help(version=None):
     show_banner()
     print("""Usage: vaultpass [OPTIONS]
@@ -11,81 +28,249 @@ Options:
   -l, --long [ID ...]        Generate long password(s)
   -s, --short [ID ...]       Generate short password(s)
   -c, --custom [ID ...]      Save custom password(s)
-  -L, --list                 List all saved passwords
+  -L, --list [--limit N] [--offset N] [--sort id|created|modified]
+             [--fields id,user,...] [--format text|ndjson] [--show-passwords]
+                             List saved entries (passwords hidden by default)
+  --policy NAME              With -l, -s or gen: generate with a named policy
+  gen [--count N] [--length L] [--policy NAME]
+                             Print N generated passwords (not saved)
+  policies                   List password policies and their exact entropy
   -f, --find [ID ...]        Search for passwords by ID
+  -f --fuzzy TERM            Ranked fuzzy search over ID, username and info
   -d, --delete [ID ...]      Delete password(s) by ID
   -e, --edit [ID]            Edit username/email
   -b, --backup               Backup passwords
-  -r, --restore [filename]   Restore from backup
+  -r, --restore [snapshot]   Restore from backup (no name lists them)
+  --verify-backups           Check every backup snapshot and its compression
+  import FILE [--format csv|json|ndjson] [--on-duplicate skip|overwrite|rename]
+                             Bulk-import entries from a file
+  --change-passphrase        Change the master passphrase
+  --calibrate [MS]           Tune passphrase cost to this device
+  agent [start|stop|lock|status]
+                             Keep the vault unlocked between runs
+  serve [SOCKET]             Serve the vault over JSON-RPC on a Unix socket
+  completion bash|zsh        Print a shell completion script (IDs for -f/-d/-e)
+  --startup-report [CMD ...] Show start-up time and slowest imports
+  --log [N]                  Show the last N logged actions (default: 50)
+  --profile CMD ...          Run CMD and print per-phase timings (JSON lines)
   -U, --uninstall            Uninstall Vaultpass
   -u, --update               Check for updates
   -h, --help                 Show this help
 """)
 
+# Commands that only read the help or the log itself, and completion
+# lookups run on every Tab, are not logged
+UNLOGGED = ("-h", "--help", "--log", "__complete")
+# Short options are logged and traced under their long name
+LONG_NAMES = {"-l": "long", "-s": "short", "-c": "custom", "-L": "list", "-f": "find", "-d": "delete",
+              "-e": "edit", "-b": "backup", "-r": "restore", "-U": "uninstall", "-u": "update"}
+# The other commands are logged without their dashes. Anything else is logged
+# as "unknown", so an ID or password typed as the first argument stays out of
+# the log
+COMMANDS = ("--long", "--short", "--custom", "gen", "--gen", "policies", "--list", "--find", "--delete",
+            "--edit", "--backup", "--restore", "import", "--import", "--verify-backups",
+            "--change-passphrase", "--calibrate", "agent", "serve", "completion", "--uninstall", "--update")
+
 def run_cli():
     args = sys.argv[1:]
+    if not args or args[0] in UNLOGGED:
+        _dispatch(args)
+        return
+    import time
+    import oplog
+    import tracing
+    import vault_lock
+    action = LONG_NAMES.get(args[0]) or (args[0].lstrip("-") if args[0] in COMMANDS else "unknown")
+    status = "error"
+    start = time.perf_counter()
+    try:
+        with tracing.phase(action):
+            _dispatch(args)
+        status = "ok"
+    except SystemExit as e:
+        status = "ok" if e.code in (None, 0) else f"exit {e.code}"
+        raise
+    except KeyboardInterrupt:
+        status = "interrupted"
+        raise
+    except vault_lock.LockTimeout as e:
+        status = "lock timeout"
+        print(f"[X] {e}")
+        sys.exit(1)
+    finally:
+        oplog.record(action, status, (time.perf_counter() - start) * 1000)
+
+def _policy_from_args(rest, default):
+    # Takes `--policy NAME` out of rest and loads that policy, or default;
+    # prints why and returns None if it can't be loaded
+    import password_gen
+    name = default
+    if "--policy" in rest:
+        at = rest.index("--policy")
+        if at + 1 >= len(rest):
+            print("[!] Please provide a policy name.")
+            return None
+        name = rest[at + 1]
+        del rest[at:at + 2]
+    try:
+        return password_gen.load_policy(name)
+    except ValueError as e:
+        print(f"[X] {e}")
+        return None
+
+def _dispatch(args):
     if not args or args[0] in ("-h", "--help"):
         show_help()
         return
 
+    elif args[0] == "--log":
+        import oplog
+        oplog.show(int(args[1]) if len(args) > 1 and args[1].isdigit() else 50)
+        return
+
+    elif args[0] == "__complete":
+        import completion
+        completion.run(args[1:])
+        return
+
     # Password Generation & Save
     elif args[0] in ("-l", "--long"):
-        if len(args) > 1:
-            for save_id in args[1:]:
-                new_id = vault.handle_duplicate_id(save_id) or save_id
+        import vault
+        rest = args[1:]
+        policy = _policy_from_args(rest, "long")
+        if policy is None:
+            return
+        if rest:
+            ids, replaced = vault.plan_ids(rest)
+            passwords = policy.generate(len(ids))
+            entries = []
+            for new_id in ids:
                 info = input(f"[*] Optional info/description for {new_id} (leave blank to skip): ").strip()
-                pwd = password_gen.generate_password(16)
-                vault.add_entry(new_id, pwd=pwd, info=info)
-                print(f"[✓] Generated & saved long password for {new_id}: {pwd}")
+                pwd = next(passwords)
+                entries.append((new_id, "", pwd, info))
+                print(f"[✓] Generated {policy.name} password for {new_id}: {pwd}")
+            vault.add_entries(entries, replaced)
         else:
             print("[!] Please provide an ID.")
         return
 
     elif args[0] in ("-s", "--short"):
-        if len(args) > 1:
-            for save_id in args[1:]:
-                new_id = vault.handle_duplicate_id(save_id) or save_id
+        import vault
+        rest = args[1:]
+        policy = _policy_from_args(rest, "short")
+        if policy is None:
+            return
+        if rest:
+            ids, replaced = vault.plan_ids(rest)
+            passwords = policy.generate(len(ids))
+            entries = []
+            for new_id in ids:
                 info = input(f"[*] Optional info/description for {new_id} (leave blank to skip): ").strip()
-                pwd = password_gen.generate_password(8)
-                vault.add_entry(new_id, pwd=pwd, info=info)
-                print(f"[✓] Generated & saved short password for {new_id}: {pwd}")
+                pwd = next(passwords)
+                entries.append((new_id, "", pwd, info))
+                print(f"[✓] Generated {policy.name} password for {new_id}: {pwd}")
+            vault.add_entries(entries, replaced)
         else:
             print("[!] Please provide an ID.")
         return
 
     elif args[0] in ("-c", "--custom"):
+        import vault
         if len(args) > 1:
-            for save_id in args[1:]:
-                new_id = vault.handle_duplicate_id(save_id) or save_id
+            ids, replaced = vault.plan_ids(args[1:])
+            entries = []
+            for new_id in ids:
                 user_pwd = input(f"[*] Enter custom password for {new_id}: ")
                 info = input(f"[*] Optional info/description for {new_id} (leave blank to skip): ").strip()
-                vault.add_entry(new_id, pwd=user_pwd, info=info)
-                print(f"[✓] Custom password saved for {new_id}.")
+                entries.append((new_id, "", user_pwd, info))
+            vault.add_entries(entries, replaced)
         else:
             print("[!] Please provide an ID.")
         return
 
+    elif args[0] in ("gen", "--gen"):
+        import password_gen
+        count, length, name = 1, None, "long"
+        rest = args[1:]
+        while rest:
+            opt = rest.pop(0)
+            if opt in ("-n", "--count") and rest and rest[0].isdigit():
+                count = int(rest.pop(0))
+            elif opt == "--length" and rest and rest[0].isdigit():
+                length = int(rest.pop(0))
+            elif opt == "--policy" and rest:
+                name = rest.pop(0)
+            else:
+                print(f"[!] Unknown gen option: {opt}")
+                return
+        try:
+            passwords = password_gen.load_policy(name, length).generate(count)
+            # Stream in batches so huge counts never sit in memory
+            batch = []
+            for pwd in passwords:
+                batch.append(pwd)
+                if len(batch) >= 4096:
+                    sys.stdout.write("\n".join(batch) + "\n")
+                    batch = []
+            if batch:
+                sys.stdout.write("\n".join(batch) + "\n")
+        except ValueError as e:
+            print(f"[X] {e}")
+        return
+
+    elif args[0] == "policies":
+        import password_gen
+        for name in password_gen.policy_names():
+            try:
+                policy = password_gen.load_policy(name)
+            except ValueError as e:
+                print(f"[X] {e}")
+                continue
+            print(f"[*] {name:<12} {policy.entropy_bits():7.2f} bits  {policy.describe()}")
+        return
+
     elif args[0] in ("-L", "--list"):
-        vault.list_entries()
+        import vault
+        opts = {}
+        rest = args[1:]
+        while rest:
+            opt = rest.pop(0)
+            if opt in ("--limit", "--offset") and rest and rest[0].isdigit():
+                opts[opt[2:]] = int(rest.pop(0))
+            elif opt == "--sort" and rest and rest[0] in vault.LIST_SORTS:
+                opts["sort"] = rest.pop(0)
+            elif opt == "--fields" and rest:
+                opts["fields"] = [field.strip() for field in rest.pop(0).split(",") if field.strip()]
+            elif opt == "--format" and rest and rest[0] in ("text", "ndjson"):
+                opts["fmt"] = rest.pop(0)
+            elif opt == "--show-passwords":
+                opts["show_passwords"] = True
+            else:
+                print(f"[!] Unknown list option: {opt}")
+                return
+        vault.list_entries(**opts)
         return
 
     elif args[0] in ("-f", "--find"):
-        if len(args) > 1:
-            for search_id in args[1:]:
-                vault.search_entry(search_id)
+        import vault
+        if len(args) > 2 and args[1] == "--fuzzy":
+            vault.fuzzy_search(" ".join(args[2:]))
+        elif len(args) > 1 and args[1] != "--fuzzy":
+            vault.search_entries(args[1:])
         else:
             print("[!] Please provide an ID to search.")
         return
 
     elif args[0] in ("-d", "--delete"):
+        import vault
         if len(args) > 1:
-            for del_id in args[1:]:
-                vault.delete_entry(del_id)
+            vault.delete_entries(args[1:])
         else:
             print("[!] Please provide an ID to delete.")
         return
 
     elif args[0] in ("-e", "--edit"):
+        import vault
         if len(args) > 1:
             new_user = input(f"[*] Enter new username/email for {args[1]}: ")
             vault.edit_entry(args[1], new_user)
@@ -94,14 +279,92 @@ def run_cli():
         return
 
     elif args[0] in ("-b", "--backup"):
+        import vault
         vault.backup_vault()
         return
 
     elif args[0] in ("-r", "--restore"):
+        import vault
         if len(args) > 1:
             vault.restore_vault(args[1])
         else:
-            print("[!] Please provide backup filename to restore.")
+            print("[!] Please provide a backup to restore:")
+            vault.list_backups()
+        return
+
+    elif args[0] in ("import", "--import"):
+        import vault
+        if len(args) < 2:
+            print("[!] Please provide a file to import.")
+            return
+        fmt, on_duplicate = None, "skip"
+        rest = args[2:]
+        while rest:
+            opt = rest.pop(0)
+            if opt == "--format" and rest:
+                fmt = rest.pop(0)
+            elif opt == "--on-duplicate" and rest and rest[0] in ("skip", "overwrite", "rename"):
+                on_duplicate = rest.pop(0)
+            else:
+                print(f"[!] Unknown import option: {opt}")
+                return
+        vault.import_entries(args[1], fmt=fmt, on_duplicate=on_duplicate)
+        return
+
+    elif args[0] == "--verify-backups":
+        import vault
+        if not vault.verify_backups():
+            sys.exit(1)
+        return
+
+    elif args[0] == "--change-passphrase":
+        import vault
+        vault.change_passphrase()
+        return
+
+    elif args[0] == "--calibrate":
+        import vault
+        target = int(args[1]) if len(args) > 1 and args[1].isdigit() else None
+        vault.recalibrate_kdf(target)
+        return
+
+    elif args[0] == "agent":
+        import vault
+        import agent
+        action = args[1] if len(args) > 1 else "status"
+        if action == "start":
+            import config
+            ttl = config.get("agent_ttl")
+            if not agent.start(ttl):
+                print("[X] Could not start the agent (Unix sockets unavailable?).")
+                return
+            if vault.require_passphrase_setup():
+                print(f"[✓] Agent running; vault stays unlocked for {ttl}s of inactivity.")
+            else:
+                print("[!] Agent running, but the vault is not encrypted.")
+        elif action == "stop":
+            print("[✓] Agent stopped." if agent.stop() else "[!] Agent is not running.")
+        elif action == "lock":
+            print("[✓] Agent locked." if agent.lock() else "[!] Agent is not running.")
+        elif action == "status":
+            state = agent.status()
+            if state is None:
+                print("[!] Agent is not running.")
+            else:
+                lock_state = "unlocked" if state["unlocked"] else "locked"
+                print(f"[✓] Agent running ({lock_state}, idle {state['idle']}s of {state['ttl']}s).")
+        else:
+            print("[!] Usage: vaultpass agent [start|stop|lock|status]")
+        return
+
+    elif args[0] == "serve":
+        import vault_server
+        vault_server.serve(args[1] if len(args) > 1 else vault_server.SOCKET_PATH)
+        return
+
+    elif args[0] == "completion":
+        import completion
+        completion.print_script(args[1] if len(args) > 1 else "")
         return
 
     elif args[0] in ("-U", "--uninstall"):
@@ -123,7 +386,9 @@ def run_cli():
         CORE_DIR = os.path.join(INSTALL_DIR, "core")
         BIN_PATH = os.path.join(HOME, ".local", "bin", "vaultpass")
         LAST_UPDATE_FILE = os.path.join(SYSTEM_DIR, ".last_update_check")
-        REMOTE_VERSION_URL = "https://raw.githubusercontent.com/looneytkp/vaultpass/main/version.txt"
+        REMOTE_VERSION_URL = os.environ.get(
+            "VAULTPASS_UPDATE_URL", "https://raw.githubusercontent.com/looneytkp/vaultpass/main/version.txt"
+        )
         check_for_updates(
             current_version=open(VERSION_FILE).read().strip() if os.path.exists(VERSION_FILE) else "0.0.0",
             version_file=VERSION_FILE,
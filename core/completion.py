@@ -0,0 +1,209 @@
+"""
+completion.py -- Shell completion for vaultpass
+
+- `vaultpass completion bash|zsh` prints a script for the shell to load and
+  creates the ID index (vault_ids) the first time
+- On Tab the script runs `vaultpass __complete`, which completes commands
+  and options and, after -f, -d and -e, entry IDs from the ID index; the
+  vault itself is never read
+- Encrypted vaults complete IDs only while an agent holds the key. Tab
+  never prompts, locks or writes anything
+"""
+
+import re
+import sys
+
+COMMANDS = [
+    "-l", "--long", "-s", "--short", "-c", "--custom", "-L", "--list", "gen", "policies", "-f", "--find",
+    "-d", "--delete", "-e", "--edit", "-b", "--backup", "-r", "--restore", "--verify-backups",
+    "import", "--change-passphrase", "--calibrate", "agent", "serve", "completion",
+    "--startup-report", "--log", "--profile", "-U", "--uninstall", "-u", "--update", "-h", "--help",
+]
+ID_COMMANDS = ("-f", "--find", "-d", "--delete", "-e", "--edit")
+OPTIONS = {
+    "-L": ["--limit", "--offset", "--sort", "--fields", "--format", "--show-passwords"],
+    "gen": ["--count", "--length", "--policy"],
+    "import": ["--format", "--on-duplicate"],
+}
+OPTIONS["--list"] = OPTIONS["-L"]
+OPTIONS.update(dict.fromkeys(("-l", "--long", "-s", "--short"), ["--policy"]))
+VALUES = {
+    ("-L", "--sort"): ["id", "created", "modified"],
+    ("-L", "--format"): ["text", "ndjson"],
+    ("import", "--format"): ["csv", "json", "ndjson"],
+    ("import", "--on-duplicate"): ["skip", "overwrite", "rename"],
+}
+SUBCOMMANDS = {
+    "agent": ["start", "stop", "lock", "status"],
+    "completion": ["bash", "zsh"],
+}
+FILES = "__files__"
+
+BASH_SCRIPT = r'''# vaultpass bash completion: eval "$(vaultpass completion bash)"
+_vaultpass() {
+    local IFS=$'\n'
+    COMPREPLY=($(vaultpass __complete bash "${COMP_LINE:0:COMP_POINT}" "$COMP_WORDBREAKS" 2>/dev/null))
+    if [[ ${COMPREPLY[0]} == __files__ ]]; then
+        COMPREPLY=()
+        compopt -o default
+    fi
+}
+complete -F _vaultpass vaultpass
+'''
+
+ZSH_SCRIPT = r'''#compdef vaultpass
+# vaultpass zsh completion: source <(vaultpass completion zsh)
+_vaultpass() {
+    local -a matches
+    matches=("${(@f)$(vaultpass __complete zsh -- "${(@Q)words[2,CURRENT-1]}" "${(Q)PREFIX}" 2>/dev/null)}")
+    if [[ $matches[1] == __files__ ]]; then
+        _files
+    elif [[ -n $matches[1] ]]; then
+        compadd -a matches
+    fi
+}
+compdef _vaultpass vaultpass
+'''
+
+def _ids(prefix):
+    import vault_crypto
+    import vault_ids
+    if vault_crypto.is_encrypted(vault_ids.PASS_FILE):
+        import agent
+        key = agent.get_key()
+        if not key:
+            return []
+        vault_crypto.use_key(key)
+    return [entry_id for entry_id in vault_ids.complete(prefix) if "\n" not in entry_id]
+
+def candidates(words, current):
+    """
+    Returns the completions of current given the words before it, command
+    first, or FILES when the shell should complete file names instead.
+    """
+    if not words:
+        return [c for c in COMMANDS if c.startswith(current)]
+    command, rest = words[0], words[1:]
+    if command in ID_COMMANDS:
+        if "--fuzzy" in rest or (command in ("-e", "--edit") and rest):
+            return []
+        if command in ("-f", "--find") and not rest and current.startswith("-"):
+            return ["--fuzzy"] if "--fuzzy".startswith(current) else []
+        return _ids(current)
+    if command in ("import", "--import"):
+        command = "import"
+        if not rest:
+            return FILES
+    if command == "serve" and not rest:
+        return FILES
+    if rest and rest[-1] == "--policy":
+        import password_gen
+        choices = password_gen.policy_names()
+    elif rest and (command, rest[-1]) in VALUES:
+        choices = VALUES[(command, rest[-1])]
+    elif command in SUBCOMMANDS:
+        choices = [] if rest else SUBCOMMANDS[command]
+    else:
+        choices = OPTIONS.get(command, [])
+    return [c for c in choices if c.startswith(current)]
+
+def _split_bash(line):
+    """
+    Splits a command line the way bash would, up to the cursor. Returns
+    (words before the current one, current word unquoted, open quote).
+    """
+    words, word, quote, started = [], "", "", False
+    i = 0
+    while i < len(line):
+        c = line[i]
+        if quote == "'":
+            if c == "'":
+                quote = ""
+            else:
+                word += c
+        elif quote == '"':
+            if c == '"':
+                quote = ""
+            elif c == "\\" and i + 1 < len(line) and line[i + 1] in '"\\$`':
+                i += 1
+                word += line[i]
+            else:
+                word += c
+        elif c in " \t\n":
+            if started:
+                words.append(word)
+                word, started = "", False
+        elif c in "'\"":
+            quote, started = c, True
+        elif c == "\\" and i + 1 < len(line):
+            i += 1
+            word += line[i]
+            started = True
+        else:
+            word += c
+            started = True
+        i += 1
+    return words, word, quote
+
+def _bash_quote(text, quote):
+    if quote == "'":
+        return text
+    if quote == '"':
+        return re.sub(r'(["\\$`])', r"\\\1", text)
+    return re.sub(r"([^\w@%+=:,./-])", r"\\\1", text)
+
+def complete_bash(line, wordbreaks):
+    words, current, quote = _split_bash(line)
+    found = candidates(words[1:], current)
+    if found == FILES:
+        print(FILES)
+        return
+    # bash only replaces the text after the last word-break character
+    cut = 0
+    if not quote:
+        breaks = set(wordbreaks) & set("@%+=:,./-")
+        cut = len(_bash_quote(current[:max((current.rfind(c) for c in breaks), default=-1) + 1], ""))
+    for match in found:
+        if quote == "'" and "'" in match:
+            continue
+        print(_bash_quote(match, quote)[cut:])
+
+def complete_zsh(words):
+    if words[:1] == ["--"]:
+        words = words[1:]
+    found = candidates(words[:-1], words[-1] if words else "")
+    print(FILES if found == FILES else "\n".join(found))
+
+def run(args):
+    """
+    `vaultpass __complete bash LINE WORDBREAKS` or `__complete zsh -- WORD...`.
+    """
+    try:
+        if args[:1] == ["bash"] and len(args) >= 2:
+            complete_bash(args[1], args[2] if len(args) > 2 else "")
+        elif args[:1] == ["zsh"]:
+            complete_zsh(args[1:])
+    except Exception:
+        pass    # a broken completion must never spill onto the prompt
+
+def print_script(shell):
+    """
+    Prints the completion script for shell and creates the ID index it
+    reads, unlocking the vault if needed. Messages go to stderr so that
+    `eval "$(vaultpass completion bash)"` only sees the script.
+    """
+    import contextlib
+    scripts = {"bash": BASH_SCRIPT, "zsh": ZSH_SCRIPT}
+    if shell not in scripts:
+        print("[!] Usage: vaultpass completion bash|zsh", file=sys.stderr)
+        sys.exit(1)
+    import vault_ids
+    if not vault_ids.is_kept():
+        import vault
+        import vault_lock
+        with contextlib.redirect_stdout(sys.stderr):
+            vault.require_passphrase_setup()
+            with vault_lock.shared():
+                vault_ids.rebuild()
+            print("[✓] ID index for completion created; it now follows every change.")
+    sys.stdout.write(scripts[shell])
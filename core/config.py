@@ -2,117 +2,206 @@
 """
 config.py -- Vaultpass configuration manager
 
-- Ensures config file exists in ~/.vaultpass/system/vaultpassconfig
-- Loads config settings into a dictionary
-- Writes config with comments if not present
-- Provides read/update/save functions for settings
+- One typed schema for every setting, kept in ~/.vaultpass/system/vaultpassconfig
+- Parsed once per process and cached until the file's mtime changes
+- Invalid or missing values fall back to the schema default
+- Writes go through a temp file and an atomic rename
+- Settings from the old ~/.vaultpass/.config (encryption state) are
+  merged in on first use and that file is retired
+- Lines outside the schema are kept; prefix.NAME.FIELD=value lines (such
+  as password policies) are read back grouped with get_sections()
 
 Config format: key=value, with comments for each setting.
 """
 
 import os
+import tracing
 
 HOME = os.path.expanduser("~")
 SYSTEM_DIR = os.path.join(HOME, ".vaultpass", "system")
 CONFIG_PATH = os.path.join(SYSTEM_DIR, "vaultpassconfig")
+LEGACY_CONFIG_PATH = os.path.join(HOME, ".vaultpass", ".config")
 
-# Default config with comments for clarity
-DEFAULT_CONFIG = """\
+HEADER = """\
 # Vaultpass Configuration File
 # This file controls optional features and output behavior.
 # To enable/disable a feature, change the value and save.
-
-# Enable colored output (true/false)
-color=true
-
-# Check for updates every N days (default: 3)
-update_days=3
-
-# Maximum lines to show in changelog box (default: 20)
-changelog_max=20
-
-# Reserved for future settings...
-
+# Password policies go at the end as policy.NAME.FIELD=value lines
+# (see 'vaultpass policies').
 """
 
+# key: (type, default, comment). Types: bool, int, float, "auto" (an int
+# or 'auto', read as None) or a tuple of allowed strings.
+SCHEMA = {
+    "color": (bool, True, "Enable colored output (true/false)"),
+    "update_days": (int, 3, "Check for updates every N days (default: 3)"),
+    "changelog_max": (int, 20, "Maximum lines to show in changelog box (default: 20)"),
+    "agent_ttl": (int, 900, "Seconds the unlock agent keeps the vault key without use (default: 900)"),
+    "kdf_target_ms": ("auto", None, "Target unlock time in ms for the passphrase KDF; 'auto' picks\n"
+                                    "# 250 on desktops and 500 on Termux (see 'vaultpass --calibrate')"),
+    "compact_ratio": (float, 0.5, "Share of dead (edited/deleted) vault records that triggers compaction (default: 0.5)"),
+    "lock_timeout": (float, 10.0, "Seconds to wait for another vaultpass process to release the vault (default: 10)"),
+    "backup_keep_daily":(int, 7, "Backups kept: the newest snapshot of each of the last N days (default: 7)"),
+    "backup_keep_weekly": (int, 4, "...and of each of the last N weeks (default: 4)"),
+    "backup_compression": (("lzma", "zlib", "none"), "lzma",
+                           "Compression for new backup chunks: lzma, zlib or none (default: lzma)"),
+    "encryption": (bool, True, "Vault encryption (managed by vaultpass)"),
+    "passphrase_set": (bool, False, "Whether a master passphrase is set (managed by vaultpass)"),
+    "theme": (str, "light", "Display theme (default: light)"),
+}
+
+TRUE = ("true", "on", "yes", "1")
+FALSE = ("false", "off", "no", "0")
+
+# (mtime_ns, size, raw {key: str}, typed {key: value}) of the last parse
+_cache = None
+
+def _parse(kind, raw):
+    # Raises ValueError for a value the schema doesn't allow
+    raw = raw.strip()
+    if kind is bool:
+        if raw.lower() in TRUE:
+            return True
+        if raw.lower() in FALSE:
+            return False
+        raise ValueError(f"expected true/false, got '{raw}'")
+    if kind == "auto":
+        return None if raw.lower() == "auto" else int(raw)
+    if isinstance(kind, tuple):
+        if raw not in kind:
+            raise ValueError(f"expected one of {', '.join(kind)}, got '{raw}'")
+        return raw
+    return kind(raw)
+
+def _format(kind, value):
+    if kind is bool:
+        return "true" if value else "false"
+    if kind == "auto" and value is None:
+        return "auto"
+    return str(value)
+
+def _read_raw(path):
+    raw = {}
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith("#") and "=" in line:
+                key, val = line.split("=", 1)
+                raw[key.strip()] = val.strip()
+    return raw
+
+def _render(raw):
+    # Schema keys in order with their comments, then any unknown keys
+    out = [HEADER]
+    for key, (kind, default, comment) in SCHEMA.items():
+        out.append(f"# {comment}\n{key}={raw.get(key, _format(kind, default))}\n")
+    extra = [f"{key}={val}" for key, val in raw.items() if key not in SCHEMA]
+    if extra:
+        out.append("\n".join(extra) + "\n")
+    return "\n".join(out)
+
+def _write(raw):
+    global _cache
+    os.makedirs(SYSTEM_DIR, exist_ok=True)
+    tmp = CONFIG_PATH + ".tmp"
+    with open(tmp, "w") as f:
+        f.write(_render(raw))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, CONFIG_PATH)
+    _cache = None
+
 def ensure_config():
     """
-    Ensures the config file exists; writes default if not present.
+    Ensures the config file exists, folding in the old ~/.vaultpass/.config.
     """
-    if not os.path.exists(SYSTEM_DIR):
-        os.makedirs(SYSTEM_DIR, exist_ok=True)
-    if not os.path.exists(CONFIG_PATH):
-        with open(CONFIG_PATH, "w") as f:
-            f.write(DEFAULT_CONFIG)
+    exists = os.path.exists(CONFIG_PATH)
+    legacy = os.path.exists(LEGACY_CONFIG_PATH)
+    if exists and not legacy:
+        return
+    raw = _read_raw(CONFIG_PATH) if exists else {}
+    if legacy:
+        for key, val in _read_raw(LEGACY_CONFIG_PATH).items():
+            raw.setdefault(key, val)
+    _write(raw)
+    if legacy:
+        os.remove(LEGACY_CONFIG_PATH)
+
+def _load():
+    global _cache
+    try:
+        st = os.stat(CONFIG_PATH)
+    except FileNotFoundError:
+        st = None
+    if st is not None and _cache is not None and _cache[:2] == (st.st_mtime_ns, st.st_size):
+        return _cache
+    with tracing.phase("config"):
+        ensure_config()
+        st = os.stat(CONFIG_PATH)
+        raw = _read_raw(CONFIG_PATH)
+        typed = {}
+        for key, (kind, default, _) in SCHEMA.items():
+            try:
+                typed[key] = _parse(kind, raw[key]) if key in raw else default
+            except ValueError:
+                typed[key] = default
+    _cache = (st.st_mtime_ns, st.st_size, raw, typed)
+    return _cache
+
+def get(key):
+    """
+    Returns the typed value of a schema setting.
+    """
+    return _load()[3][key]
+
+def get_sections(prefix):
+    """
+    Returns {name: {field: value}} from the free-form prefix.NAME.FIELD=value
+    lines, values as strings.
+    """
+    sections = {}
+    for key, val in _load()[2].items():
+        parts = key.split(".")
+        if len(parts) == 3 and parts[0] == prefix and parts[1] and parts[2]:
+            sections.setdefault(parts[1], {})[parts[2]] = val
+    return sections
 
 def load_config():
     """
-    Loads the config into a dict. Ensures defaults for missing keys.
-    Ignores comments and blank lines.
+    Returns every setting as the string stored in the file (or its default).
     """
-    ensure_config()
-    config = {}
-    with open(CONFIG_PATH) as f:
-        for line in f:
-            line = line.strip()
-            if not line or line.startswith("#"):
-                continue
-            if "=" in line:
-                key, val = line.split("=", 1)
-                config[key.strip()] = val.strip()
-    # Fill in defaults if missing
-    for line in DEFAULT_CONFIG.splitlines():
-        if "=" in line:
-            key, val = line.split("=", 1)
-            if key.strip() not in config:
-                config[key.strip()] = val.strip()
+    _, _, raw, typed = _load()
+    config = {key: _format(kind, typed[key]) for key, (kind, _, _) in SCHEMA.items()}
+    config.update((key, val) for key, val in raw.items() if key not in SCHEMA)
     return config
 
 def save_config(config):
     """
-    Saves the config dict to file, preserving comments & order.
+    Saves a dict of string settings, preserving comments & order.
     """
-    # Read the template to preserve comments and order
-    lines_out = []
-    existing = {}
-    for line in DEFAULT_CONFIG.splitlines():
-        if "=" in line:
-            key, _ = line.split("=", 1)
-            val = config.get(key.strip(), None)
-            if val is not None:
-                lines_out.append(f"{key.strip()}={val}")
-            else:
-                lines_out.append(line)
-        else:
-            lines_out.append(line)
-    # Add any custom keys (not in default)
-    for k, v in config.items():
-        if f"{k}=" not in DEFAULT_CONFIG:
-            lines_out.append(f"{k}={v}")
-    # Write it out
-    with open(CONFIG_PATH, "w") as f:
-        f.write("\n".join(lines_out) + "\n")
+    _write({key: str(val) for key, val in config.items()})
 
 def get_config_value(key, default=None):
     """
-    Returns the value for a key, or default if not present.
+    Returns the value for a key as a string, or default if not present.
     """
-    config = load_config()
-    return config.get(key, default)
+    return load_config().get(key, default)
 
 def set_config_value(key, value):
     """
-    Updates a single config value and saves to disk.
+    Validates and saves one setting; value may be typed or a string as it
+    would appear in the file. Raises ValueError if the schema rejects it.
     """
-    config = load_config()
-    config[key] = value
-    save_config(config)
+    raw = dict(_load()[2])
+    if key in SCHEMA:
+        kind = SCHEMA[key][0]
+        raw[key] = _format(kind, _parse(kind, value) if isinstance(value, str) else value)
+    else:
+        raw[key] = str(value)
+    _write(raw)
 
 # Example usage
 if __name__ == "__main__":
-    ensure_config()
-    config = load_config()
-    print("Vaultpass config loaded:")
-    for k, v in config.items():
+    for k, v in load_config().items():
         print(f"  {k} = {v}")
-    print("\nTry set_config_value('color', 'false') to disable color.")
\ No newline at end of file
+    print("\nTry set_config_value('color', 'false') to disable color.")
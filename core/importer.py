@@ -0,0 +1,92 @@
+"""
+importer.py -- Streaming parsers for bulk vault imports
+
+- Reads CSV (with header row), NDJSON, or a JSON array of objects
+- Yields one record at a time so memory stays flat on huge files
+- Normalizes common column names (username/email/login, notes/description)
+
+Each record comes out as (number, fields) where fields has the keys
+id, user, pwd and info, or as (number, error message) when invalid.
+"""
+
+import os
+import csv
+import json
+
+FIELD_ALIASES = {
+    "id": "id", "name": "id", "title": "id",
+    "user": "user", "username": "user", "email": "user", "login": "user",
+    "pwd": "pwd", "password": "pwd", "pass": "pwd",
+    "info": "info", "notes": "info", "description": "info", "url": "info",
+}
+FORMATS = ("csv", "json", "ndjson")
+
+def detect_format(path):
+    ext = os.path.splitext(path)[1].lower().lstrip(".")
+    if ext == "jsonl":
+        return "ndjson"
+    return ext if ext in FORMATS else None
+
+def _normalize(raw):
+    if not isinstance(raw, dict):
+        return "record is not an object"
+    fields = {"id": "", "user": "", "pwd": "", "info": ""}
+    for key, val in raw.items():
+        target = FIELD_ALIASES.get(str(key).strip().lower())
+        if target and val is not None and not fields[target]:
+            fields[target] = str(val)
+    if not fields["id"].strip():
+        return "missing id"
+    if not fields["pwd"]:
+        return "missing password"
+    return fields
+
+def _iter_csv(f):
+    yield from csv.DictReader(f)
+
+def _iter_ndjson(f):
+    for line in f:
+        if line.strip():
+            try:
+                yield json.loads(line)
+            except ValueError as e:
+                yield f"invalid JSON ({e.msg})"
+
+def _iter_json_array(f, chunk_size=65536):
+    decoder = json.JSONDecoder()
+    buf, started = "", False
+    for chunk in iter(lambda: f.read(chunk_size), ""):
+        buf += chunk
+        while True:
+            buf = buf.lstrip()
+            if not buf:
+                break
+            if not started:
+                if buf[0] != "[":
+                    raise ValueError("expected a JSON array of entries")
+                buf, started = buf[1:], True
+            elif buf[0] == ",":
+                buf = buf[1:]
+            elif buf[0] == "]":
+                return
+            else:
+                try:
+                    obj, end = decoder.raw_decode(buf)
+                except ValueError:
+                    break  # record continues in the next chunk
+                yield obj
+                buf = buf[end:]
+    if buf.strip() or not started:
+        raise ValueError("truncated JSON array")
+
+def iter_records(path, fmt=None):
+    """
+    Yields (record number, fields dict or error string) for every record in path.
+    """
+    fmt = fmt or detect_format(path)
+    if fmt not in FORMATS:
+        raise ValueError(f"unknown import format for {path} (use --format csv|json|ndjson)")
+    readers = {"csv": _iter_csv, "json": _iter_json_array, "ndjson": _iter_ndjson}
+    with open(path, newline="" if fmt == "csv" else None, encoding="utf-8") as f:
+        for number, raw in enumerate(readers[fmt](f), 1):
+            yield number, (raw if isinstance(raw, str) else _normalize(raw))
@@ -0,0 +1,72 @@
+"""
+oplog.py -- Structured, rotating operation log
+
+- One JSON line per vaultpass command in ~/.vaultpass/system/vaultpass.log:
+  time, action, outcome, duration and counts noted by the vault code
+- Entry IDs, usernames and passwords are never written, only counts
+- The log rotates at LOG_MAX_BYTES, keeping LOG_BACKUPS older files
+  (vaultpass.log.1 is the most recent)
+- `vaultpass --log` prints the latest records
+"""
+
+import os
+import time
+
+HOME = os.path.expanduser("~")
+SYSTEM_DIR = os.path.join(HOME, ".vaultpass", "system")
+LOG_FILE = os.path.join(SYSTEM_DIR, "vaultpass.log")
+LOG_MAX_BYTES = 256 * 1024
+LOG_BACKUPS = 3
+
+# Details noted by the code running the current command
+_details = {}
+
+def note(**fields):
+    """
+    Adds counts or other non-secret details to the current command's record.
+    """
+    _details.update(fields)
+
+def _rotate():
+    for n in range(LOG_BACKUPS - 1, 0, -1):
+        if os.path.exists(f"{LOG_FILE}.{n}"):
+            os.replace(f"{LOG_FILE}.{n}", f"{LOG_FILE}.{n + 1}")
+    os.replace(LOG_FILE, f"{LOG_FILE}.1")
+
+def record(action, status, ms):
+    """
+    Appends one record for a finished command and resets the noted details.
+    """
+    import json
+    entry = {"ts": time.strftime("%Y-%m-%dT%H:%M:%S"), "action": action, "status": status, "ms": round(ms, 1)}
+    entry.update(_details)
+    _details.clear()
+    try:
+        os.makedirs(SYSTEM_DIR, exist_ok=True)
+        if os.path.exists(LOG_FILE) and os.path.getsize(LOG_FILE) >= LOG_MAX_BYTES:
+            _rotate()
+        with open(LOG_FILE, "a") as f:
+            f.write(json.dumps(entry) + "\n")
+    except OSError:
+        pass    # logging must never break a command
+
+def show(limit=50):
+    """
+    Prints the last `limit` records, oldest first.
+    """
+    import json
+    from collections import deque
+    if not os.path.isfile(LOG_FILE):
+        print("[!] No actions logged yet.")
+        return
+    with open(LOG_FILE) as f:
+        tail = deque(f, maxlen=limit)
+    for line in tail:
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            print(line.rstrip())    # free-text lines from older versions
+            continue
+        extra = " ".join(f"{k}={v}" for k, v in entry.items() if k not in ("ts", "action", "status", "ms"))
+        mark = "✓" if entry.get("status") == "ok" else "X"
+        print(f"[{mark}] {entry.get('ts', '')}  {entry.get('action', ''):<14} {entry.get('ms', 0):>8.1f} ms  {extra}".rstrip())
@@ -1,16 +1,289 @@
-import random
+"""
+password_gen.py -- Password and passphrase generation
+
+- A policy is either a character policy (length, character classes with a
+  minimum count each) or a diceware policy (words from the bundled
+  wordlist, joined by a separator)
+- Built-in policies "short" (8 characters) and "long" (16) back -s and -l;
+  config lines policy.NAME.FIELD=value override them or add new ones
+- Every password is drawn uniformly from all the strings its policy
+  allows, so entropy_bits() -- log2 of their number -- is exact
+- Random bytes come from os.urandom in big buffers, with no modulo bias
+"""
+
+import os
+import math
 import string
 
+SYMBOLS = '!@#$%^&*_+-='
+DEFAULT_POLICY = (string.ascii_lowercase, string.ascii_uppercase, string.digits, SYMBOLS)
+BUFFER_SIZE = 64 * 1024
+
+# Character classes a policy's charset and min fields can name
+CLASSES = {"lower": string.ascii_lowercase, "upper": string.ascii_uppercase,
+           "digits": string.digits, "symbols": SYMBOLS}
+LABELS = {"lower": ("lowercase", "lowercase"), "upper": ("uppercase", "uppercase"),
+          "digits": ("digit", "digits"), "symbols": ("symbol", "symbols")}
+AMBIGUOUS = "0O1lI|"
+FIELDS = ("mode", "length", "charset", "min", "exclude", "exclude_ambiguous", "words", "separator")
+BUILTIN_POLICIES = {"short": {"length": "8"}, "long": {"length": "16"}}
+MAX_LENGTH = 255
+MAX_WORDS = 64
+# Below this share of acceptable draws, character policies pick each
+# class's count exactly instead of redrawing whole passwords
+REJECTION_MIN = 1 / 32
+
+def _uniform_chars(charset, size=BUFFER_SIZE):
+    """Yield large strings of characters drawn uniformly from an ASCII charset.
+
+    Random bytes come from os.urandom in big buffers; bytes above the largest
+    multiple of len(charset) are dropped (bytes.translate does the mapping and
+    rejection in C), so there is no modulo bias.
+    """
+    m = len(charset)
+    if not 0 < m <= 256 or not charset.isascii():
+        raise ValueError("charset must hold 1-256 ASCII characters")
+    limit = 256 - 256 % m
+    table = bytes(ord(charset[b % m]) if b < limit else 0 for b in range(256))
+    reject = bytes(range(limit, 256))
+    while True:
+        yield os.urandom(size).translate(table, reject).decode("ascii")
+
+def _drawer(charset, size=BUFFER_SIZE):
+    """Return draw(k) giving k uniform characters from charset."""
+    stream = _uniform_chars(charset, size)
+    state = {"buf": "", "pos": 0}
+    def draw(k):
+        buf, pos = state["buf"], state["pos"]
+        if pos + k > len(buf):
+            buf, pos = buf[pos:], 0
+            while len(buf) < k:
+                buf += next(stream)
+            state["buf"] = buf
+        state["pos"] = pos + k
+        return buf[pos:pos + k]
+    return draw
+
+def _uniform_below(n, size=BUFFER_SIZE):
+    """Yield uniform integers in [0, n) for n <= 65536, two random bytes each."""
+    limit = 65536 - 65536 % n
+    while True:
+        for value in memoryview(os.urandom(size)).cast("H"):
+            if value < limit:
+                yield value % n
+
+def _randbelow(n):
+    """Return a uniform integer in [0, n) for any n."""
+    bits = n.bit_length()
+    while True:
+        value = int.from_bytes(os.urandom((bits + 7) // 8), "big") >> (-bits % 8)
+        if value < n:
+            return value
+
+def _class_of(char):
+    for name, chars in CLASSES.items():
+        if char in chars and name != "symbols":
+            return name
+    return "symbols"
+
+class CharPolicy:
+    """Passwords of `length` characters drawn uniformly from every string
+    over the classes (disjoint ASCII strings) that holds at least each
+    class's minimum count of its characters."""
+
+    def __init__(self, name, length, classes):
+        self.name = name
+        self.length = length
+        self.classes = [(chars, minimum) for chars, minimum in classes if chars or minimum]
+        alphabet = "".join(chars for chars, _ in self.classes)
+        if not alphabet or not alphabet.isascii() or len(set(alphabet)) != len(alphabet):
+            raise ValueError("character classes must be non-empty, disjoint and ASCII")
+        if any(not chars for chars, _ in self.classes):
+            raise ValueError("a class with a minimum count has no characters left")
+        need = sum(minimum for _, minimum in self.classes)
+        if length < need:
+            raise ValueError(f"length must be at least {need} to meet every class minimum")
+        if length > MAX_LENGTH:
+            raise ValueError(f"length must be at most {MAX_LENGTH}")
+        self.alphabet = alphabet
+        # ways[k][r]: strings of r characters over classes k.. meeting their minimums
+        ways = [[0] * (length + 1) for _ in range(len(self.classes) + 1)]
+        ways[-1][0] = 1
+        for k in range(len(self.classes) - 1, -1, -1):
+            size, minimum = len(self.classes[k][0]), self.classes[k][1]
+            for r in range(length + 1):
+                ways[k][r] = sum(math.comb(r, c) * size ** c * ways[k + 1][r - c]
+                                 for c in range(minimum, r + 1))
+        self._ways = ways
+
+    def space(self):
+        """Return the exact number of passwords the policy can produce."""
+        return self._ways[0][self.length]
+
+    def entropy_bits(self):
+        return math.log2(self.space())
+
+    def describe(self):
+        names = [f"{minimum} {LABELS[_class_of(chars[0])][minimum > 1]}" for chars, minimum in self.classes if minimum]
+        rule = f" (at least {', '.join(names)})" if names else ""
+        return f"{self.length} characters from {len(self.alphabet)}{rule}"
+
+    def generate(self, n):
+        """Yield n passwords."""
+        size = max(256, min(BUFFER_SIZE, 2 * n * self.length))
+        if self.space() * int(1 / REJECTION_MIN) >= len(self.alphabet) ** self.length:
+            yield from self._by_rejection(n, size)
+        else:
+            yield from self._by_counts(n, size)
+
+    def _by_rejection(self, n, size):
+        # Uniform draws over the whole alphabet, kept when they meet the
+        # minimums: uniform over exactly the allowed strings
+        draw = _drawer(self.alphabet, size)
+        marks = str.maketrans({char: chr(k) for k, (chars, _) in enumerate(self.classes) for char in chars})
+        required = [(chr(k), minimum) for k, (_, minimum) in enumerate(self.classes) if minimum]
+        for _ in range(n):
+            while True:
+                password = draw(self.length)
+                kinds = password.translate(marks)
+                if all(kinds.count(mark) >= minimum for mark, minimum in required):
+                    yield password
+                    break
+
+    def _by_counts(self, n, size):
+        # Picks how many characters each class gets, weighted by the number
+        # of strings with those counts, then a uniform arrangement of them
+        import random
+        shuffle = random.SystemRandom().shuffle
+        draws = [_drawer(chars, max(256, min(BUFFER_SIZE, size))) for chars, _ in self.classes]
+        for _ in range(n):
+            labels, left = [], self.length
+            for k, (chars, minimum) in enumerate(self.classes):
+                pick = _randbelow(self._ways[k][left])
+                for count in range(minimum, left + 1):
+                    weight = math.comb(left, count) * len(chars) ** count * self._ways[k + 1][left - count]
+                    if pick < weight:
+                        break
+                    pick -= weight
+                labels += [k] * count
+                left -= count
+            shuffle(labels)
+            picked = [iter(draw(labels.count(k))) for k, draw in enumerate(draws)]
+            yield "".join(next(picked[k]) for k in labels)
+
+class DicewarePolicy:
+    """Passphrases of `words` words drawn uniformly from the bundled
+    wordlist and joined by `separator`."""
+
+    def __init__(self, name, words, separator="-"):
+        import wordlist
+        if not 1 <= words <= MAX_WORDS:
+            raise ValueError(f"words must be between 1 and {MAX_WORDS}")
+        self.name = name
+        self.words = words
+        self.separator = separator
+        self._list = wordlist.Wordlist()
+        # Distinct word choices must give distinct passphrases, or the
+        # entropy below would overstate them
+        if words > 1 and all(self._list.uses(char) for char in separator):
+            raise ValueError(f"separator '{separator}' must hold a character no word uses")
+
+    def space(self):
+        """Return the exact number of passphrases the policy can produce."""
+        return len(self._list) ** self.words
+
+    def entropy_bits(self):
+        return self.words * math.log2(len(self._list))
+
+    def describe(self):
+        return f"{self.words} words from {len(self._list)}, separated by '{self.separator}'"
+
+    def generate(self, n):
+        """Yield n passphrases."""
+        below = _uniform_below(len(self._list), max(256, min(BUFFER_SIZE, 4 * n * self.words)))
+        words = self._list
+        for _ in range(n):
+            yield self.separator.join(words[next(below)] for _ in range(self.words))
+
+def _field_int(name, fields, key):
+    try:
+        return int(fields[key])
+    except ValueError:
+        raise ValueError(f"policy '{name}': {key} must be a number, got '{fields[key]}'") from None
+
+def policy_from_fields(name, fields):
+    """Build a policy from its config fields (strings). Raises ValueError
+    if a field is unknown or invalid."""
+    unknown = [key for key in fields if key not in FIELDS]
+    if unknown:
+        raise ValueError(f"policy '{name}': unknown field '{unknown[0]}'")
+    mode = fields.get("mode", "chars")
+    if mode == "diceware":
+        separator = fields.get("separator", "-")
+        separator = " " if separator == "space" else separator
+        words = _field_int(name, dict({"words": "6"}, **fields), "words")
+        try:
+            return DicewarePolicy(name, words, separator)
+        except ValueError as e:
+            raise ValueError(f"policy '{name}': {e}") from None
+    if mode != "chars":
+        raise ValueError(f"policy '{name}': mode must be chars or diceware, got '{mode}'")
+    exclude = set(fields.get("exclude", ""))
+    if fields.get("exclude_ambiguous", "false").lower() in ("true", "on", "yes", "1"):
+        exclude.update(AMBIGUOUS)
+    chosen = {}
+    for token in fields.get("charset", ",".join(CLASSES)).split(","):
+        token = token.strip()
+        for char in CLASSES.get(token, token):
+            if not char.isascii() or not char.isprintable() or char.isspace():
+                raise ValueError(f"policy '{name}': charset may only hold printable ASCII characters")
+            if char not in exclude:
+                chosen.setdefault(_class_of(char), {})[char] = None
+    if "min" in fields:
+        minimums = {}
+        for token in filter(None, (part.strip() for part in fields["min"].split(","))):
+            class_name, _, count = token.partition(":")
+            if class_name not in CLASSES or not count.isdigit():
+                raise ValueError(f"policy '{name}': min takes class:count pairs "
+                                 f"({', '.join(CLASSES)}), got '{token}'")
+            minimums[class_name] = int(count)
+    else:
+        minimums = dict.fromkeys(chosen, 1)
+    classes = [("".join(chosen.get(class_name, ())), minimums.get(class_name, 0)) for class_name in CLASSES]
+    try:
+        return CharPolicy(name, _field_int(name, dict({"length": "16"}, **fields), "length"), classes)
+    except ValueError as e:
+        raise ValueError(f"policy '{name}': {e}") from None
+
+def policy_names():
+    """Return the built-in policy names, then those defined in config."""
+    import config
+    return list(dict.fromkeys(list(BUILTIN_POLICIES) + list(config.get_sections("policy"))))
+
+def load_policy(name, length=None):
+    """Return the named policy: built-in, defined in config, or built-in
+    with fields overridden in config. length, if given, replaces its
+    length (words, for a diceware policy). Raises ValueError for unknown
+    names and invalid fields."""
+    import config
+    custom = config.get_sections("policy").get(name)
+    if custom is None and name not in BUILTIN_POLICIES:
+        raise ValueError(f"unknown policy '{name}' (see 'vaultpass policies')")
+    fields = dict(BUILTIN_POLICIES.get(name, {}), **(custom or {}))
+    if length is not None:
+        fields["words" if fields.get("mode") == "diceware" else "length"] = str(length)
+    return policy_from_fields(name, fields)
+
+def generate_passwords(n, length, policy=DEFAULT_POLICY):
+    """Yield n passwords of the given length, each containing at least one
+    character from every class in policy (a sequence of disjoint ASCII
+    strings), drawn uniformly from all such passwords.
+    """
+    yield from CharPolicy("custom", length, [(chars, 1) for chars in policy]).generate(n)
+
 def generate_password(length):
     """Generate a strong password with at least 1 lowercase, 1 uppercase, 1 digit, and 1 special char."""
-    chars = string.ascii_letters + string.digits + '!@#$%^&*_+-='
-    while True:
-        password = ''.join(random.SystemRandom().choice(chars) for _ in range(length))
-        if (any(c.islower() for c in password) and
-            any(c.isupper() for c in password) and
-            any(c.isdigit() for c in password) and
-            any(c in '!@#$%^&*_+-=' for c in password)):
-            return password
+    return next(generate_passwords(1, length))
 
 if __name__ == '__main__':
     import sys
@@ -18,4 +291,4 @@ if __name__ == '__main__':
     if mode == "long":
         print(generate_password(16))
     else:
-        print(generate_password(8))
\ No newline at end of file
+        print(generate_password(8))
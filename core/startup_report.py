@@ -0,0 +1,48 @@
+"""
+startup_report.py -- Where does vaultpass spend its start-up time?
+
+`vaultpass --startup-report [COMMAND ...]` re-runs the launcher with
+`python -X importtime` for the given command (default: -h), then prints
+the wall time and the slowest imports by cumulative time.
+"""
+
+import sys
+import time
+import subprocess
+
+TOP = 15
+
+def parse_importtime(stderr):
+    """
+    Returns [(cumulative_us, self_us, module)] from -X importtime output,
+    plus the remaining stderr lines.
+    """
+    rows, other = [], []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            other.append(line)
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue  # column header
+        rows.append((int(fields[1]), int(fields[0]), fields[2].rstrip()))
+    return rows, other
+
+def main(launcher, args):
+    args = args or ["-h"]
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", launcher] + args,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True
+    )
+    wall_ms = (time.perf_counter() - start) * 1000
+    rows, other = parse_importtime(proc.stderr)
+    top_level = sum(cum for cum, _, name in rows if not name.startswith(" " * 2))
+    print(f"[*] vaultpass {' '.join(args)}: {wall_ms:.1f} ms wall, {top_level / 1000:.1f} ms importing {len(rows)} modules")
+    print(f"    {'cumulative':>10} {'self':>8}  module")
+    for cum, own, name in sorted(rows, reverse=True)[:TOP]:
+        print(f"    {cum / 1000:>8.1f}ms {own / 1000:>6.1f}ms {name}")
+    for line in other:
+        print(line, file=sys.stderr)
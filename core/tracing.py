@@ -0,0 +1,105 @@
+"""
+tracing.py -- Per-phase timings for VAULTPASS_TRACE=1 / --profile
+
+- phase(name) times a block: config, unlock, kdf, read, decrypt, parse,
+  index, encrypt, write, ...; nested phases are reported as parent/child
+- Each phase is aggregated over the run (count, total ms, self ms without
+  its child phases) and written as one JSON line per phase when the
+  process exits, so hot loops cost a counter update, not a line each
+- timed_iter() charges the work done inside a generator to a phase
+- Output goes to stderr, or is appended to $VAULTPASS_TRACE_FILE
+
+Disabled (the default), phase() hands back one shared no-op context
+manager and timed_iter() returns its argument, so instrumented code pays
+next to nothing.
+"""
+
+import os
+import sys
+import time
+import contextlib
+
+ENABLED = os.environ.get("VAULTPASS_TRACE", "") not in ("", "0")
+
+_NULL = contextlib.nullcontext()
+_stack = []      # [name, start, child seconds] of the open phases
+_totals = {}     # path -> [count, seconds, self seconds]
+_started = time.perf_counter()
+
+class _Phase:
+    __slots__ = ("name",)
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        path = f"{_stack[-1][0]}/{self.name}" if _stack else self.name
+        _stack.append([path, time.perf_counter(), 0.0])
+
+    def __exit__(self, *exc):
+        path, start, child = _stack.pop()
+        elapsed = time.perf_counter() - start
+        if _stack:
+            _stack[-1][2] += elapsed
+        total = _totals.setdefault(path, [0, 0.0, 0.0])
+        total[0] += 1
+        total[1] += elapsed
+        total[2] += elapsed - child
+        return False
+
+def phase(name):
+    """
+    Returns a context manager that times its block as `name`.
+    """
+    return _Phase(name) if ENABLED else _NULL
+
+def timed_iter(name, iterable):
+    """
+    Yields from iterable, charging the time spent producing each item to `name`.
+    """
+    if not ENABLED:
+        return iterable
+    def wrapped():
+        it = iter(iterable)
+        while True:
+            with _Phase(name):
+                try:
+                    item = next(it)
+                except StopIteration:
+                    return
+            yield item
+    return wrapped()
+
+def enable():
+    """
+    Turns tracing on for the rest of this process (the --profile flag).
+    """
+    global ENABLED, _started
+    if not ENABLED:
+        ENABLED = True
+        _started = time.perf_counter()
+        import atexit
+        atexit.register(report)
+
+def report(command=None):
+    """
+    Writes one JSON line per phase, plus a total for the run.
+    """
+    import json
+    ts = time.strftime("%Y-%m-%dT%H:%M:%S")
+    command = command or (sys.argv[1] if len(sys.argv) > 1 else "")
+    lines = [json.dumps({"ts": ts, "pid": os.getpid(), "cmd": command, "phase": path, "count": count,
+                         "ms": round(seconds * 1000, 3), "self_ms": round(own * 1000, 3)})
+             for path, (count, seconds, own) in _totals.items()]
+    lines.append(json.dumps({"ts": ts, "pid": os.getpid(), "cmd": command, "phase": "total",
+                             "ms": round((time.perf_counter() - _started) * 1000, 3)}))
+    target = os.environ.get("VAULTPASS_TRACE_FILE")
+    if target:
+        with open(target, "a") as f:
+            f.write("\n".join(lines) + "\n")
+    else:
+        sys.stderr.write("\n".join(lines) + "\n")
+
+if ENABLED:
+    import atexit
+    atexit.register(report)
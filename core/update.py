@@ -1,9 +1,6 @@
 import os
 import sys
-import subprocess
 import time
-import shutil
-import requests
 
 CORE_DIR = os.path.dirname(os.path.abspath(__file__))
 if CORE_DIR not in sys.path:
@@ -11,10 +8,21 @@ if CORE_DIR not in sys.path:
 
 import cli
 
+# Update checks never block a command: when a check is due, a detached
+# `update.py --background-check` process fetches the remote version and
+# writes the result to update_cache; the next run reads the cache and
+# prints a one-line notice. `vaultpass -u` still checks in the foreground.
+# The launcher calls this on every run, so subprocess/shutil are imported
+# on use and the cache is plain key=value lines (no json/re import).
+
+CACHE_NAME = "update_cache"
+FETCH_TIMEOUT = 5
+
 def parse_ver(verstr):
     return tuple(map(int, verstr.strip().lstrip("vV").split(".")))
 
 def get_local_commit(repo_path):
+    import subprocess
     try:
         return subprocess.check_output(
             ["git", "rev-parse", "HEAD"], cwd=repo_path, text=True, stderr=subprocess.DEVNULL
@@ -23,9 +31,11 @@ def get_local_commit(repo_path):
         return ""
 
 def get_remote_commit(repo_path):
+    import subprocess
     try:
         subprocess.run(
-            ["git", "fetch", "origin", "main"], cwd=repo_path, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+            ["git", "fetch", "origin", "main"], cwd=repo_path, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            timeout=30
         )
         return subprocess.check_output(
             ["git", "rev-parse", "origin/main"], cwd=repo_path, text=True, stderr=subprocess.DEVNULL
@@ -34,6 +44,7 @@ def get_remote_commit(repo_path):
         return ""
 
 def get_remote_msg(repo_path):
+    import subprocess
     try:
         return subprocess.check_output(
             ["git", "log", "-1", "--pretty=%B", "origin/main"],
@@ -42,41 +53,143 @@ def get_remote_msg(repo_path):
     except Exception:
         return "(minor update)"
 
-def check_for_updates(current_version, version_file, changelog_file, install_dir, core_dir, bin_path, last_update_file, remote_version_url):
-    now = int(time.time())
-    need_update = False
-
-    if os.path.exists(last_update_file):
-        last = int(os.path.getmtime(last_update_file))
-        diff_days = (now - last) // 86400
-        if diff_days >= 3:
-            need_update = True
-    else:
-        need_update = True
-
-    if not need_update:
-        return
-
-    print("[*] Checking for Vaultpass updates...")
+def fetch_remote_version(remote_version_url, timeout=FETCH_TIMEOUT):
+    # urllib rather than requests: the background checker must not depend
+    # on a third-party package being importable
+    from urllib.request import urlopen
+    with urlopen(remote_version_url, timeout=timeout) as r:
+        return r.read().decode().strip()
 
-    local_version = current_version
+def _cache_path(last_update_file):
+    return os.path.join(os.path.dirname(last_update_file), CACHE_NAME)
 
+def read_cache(last_update_file):
+    cache = {}
     try:
-        r = requests.get(remote_version_url, timeout=5)
-        r.raise_for_status()
-        remote_version = r.text.strip()
-    except Exception:
+        with open(_cache_path(last_update_file)) as f:
+            for line in f:
+                if "=" in line:
+                    k, v = line.rstrip("\n").split("=", 1)
+                    cache[k] = v
+    except OSError:
+        pass
+    return cache
+
+def _write_cache(last_update_file, result):
+    path = _cache_path(last_update_file)
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        for k, v in result.items():
+            f.write(f"{k}={str(v).replace(chr(10), ' ')}\n")
+    os.replace(tmp, path)
+
+def run_check(remote_version_url, install_dir, last_update_file):
+    """
+    Fetches the remote version and commit, caches the result and returns it.
+    """
+    result = {"checked": int(time.time()), "remote_version": "", "local_commit": "", "remote_commit": "", "error": ""}
+    try:
+        result["remote_version"] = fetch_remote_version(remote_version_url)
+        parse_ver(result["remote_version"])
+    except Exception as e:
+        result["error"] = f"could not fetch remote version ({e.__class__.__name__})"
+    else:
+        result["local_commit"] = get_local_commit(install_dir)
+        result["remote_commit"] = get_remote_commit(install_dir)
+    _write_cache(last_update_file, result)
+    return result
+
+def check_due(last_update_file, update_days):
+    # .last_update_check's mtime marks the last *attempt*, so a slow or
+    # failing check isn't respawned by every command in the meantime
+    if not os.path.exists(last_update_file):
+        return True
+    return time.time() - os.path.getmtime(last_update_file) >= update_days * 86400
+
+def check_in_background(remote_version_url, install_dir, last_update_file, update_days):
+    """
+    Spawns a detached checker if one is due; returns immediately either way.
+    """
+    if not check_due(last_update_file, update_days):
+        return False
+    import subprocess
+    os.makedirs(os.path.dirname(last_update_file), exist_ok=True)
+    with open(last_update_file, "a"):
+        os.utime(last_update_file)
+    subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), "--background-check",
+         remote_version_url, install_dir, last_update_file],
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True
+    )
+    return True
+
+def _updates_in(result, current_version):
+    """
+    Returns ("version", remote) / ("commit", None) / (None, None) for a
+    cached or fresh check result.
+    """
+    if not result or result.get("error") or not result.get("remote_version"):
+        return None, None
+    try:
+        if parse_ver(current_version) < parse_ver(result["remote_version"]):
+            return "version", result["remote_version"]
+    except ValueError:
+        return None, None
+    local, remote = result.get("local_commit"), result.get("remote_commit")
+    if local and remote and local != remote:
+        return "commit", None
+    return None, None
+
+def notify_from_cache(current_version, last_update_file):
+    """
+    Prints a one-line notice if the last background check found an update.
+    """
+    # stderr, so scripts piping `vaultpass -f` output aren't affected
+    kind, remote_version = _updates_in(read_cache(last_update_file), current_version)
+    if kind == "version":
+        print(f"[!] Vaultpass v{remote_version} is available. Run 'vaultpass -u' to update.", file=sys.stderr)
+    elif kind == "commit":
+        print("[!] A minor Vaultpass update is available. Run 'vaultpass -u' to update.", file=sys.stderr)
+
+def _pull_update(install_dir, core_dir, bin_path, last_update_file):
+    import shutil
+    import subprocess
+    print("[*] Updating Vaultpass…")
+    rc = subprocess.run(
+        ["git", "pull", "origin", "main"],
+        cwd=install_dir,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+    if rc.returncode != 0:
+        print("[X] Failed to update Vaultpass.")
+        return False
+    if os.path.islink(bin_path):
+        os.remove(bin_path)  # older install.sh linked the removed bash launcher
+    shutil.copy2(os.path.join(core_dir, "vaultpass.py"), bin_path)
+    os.chmod(bin_path, 0o755)
+    if os.path.exists(_cache_path(last_update_file)):
+        os.remove(_cache_path(last_update_file))  # stale once we've updated
+    return True
+
+def check_for_updates(current_version, version_file, changelog_file, install_dir, core_dir, bin_path, last_update_file, remote_version_url):
+    """
+    Foreground check for `vaultpass -u`: always hits the network and offers
+    to update.
+    """
+    print("[*] Checking for Vaultpass updates...")
+    with open(last_update_file, "a"):
+        os.utime(last_update_file)
+    result = run_check(remote_version_url, install_dir, last_update_file)
+    if result["error"]:
         print("[X] Could not fetch remote version info.")
-        open(last_update_file, "a").close()
         return
 
-    local_commit = get_local_commit(install_dir)
-    remote_commit = get_remote_commit(install_dir)
-
-    version_update = parse_ver(local_version) < parse_ver(remote_version)
-    commit_update = (local_commit and remote_commit and local_commit != remote_commit)
-
-    if version_update:
+    kind, remote_version = _updates_in(result, current_version)
+    if kind == "version":
         print(f"[!] New version: v{remote_version}")
         lines = []
         try:
@@ -93,47 +206,21 @@ def check_for_updates(current_version, version_file, changelog_file, install_dir
             cli.print_changelog_box(remote_version, lines)
         print("\n[*] Full changelog: https://github.com/looneytkp/vaultpass\n")
         update = input("[?] Update? (Y/n): ").strip().lower()
-        if update in ("y", ""):
-            print("[*] Updating Vaultpass…")
-            rc = subprocess.run(
-                ["git", "pull", "origin", "main"],
-                cwd=install_dir,
-                stdout=subprocess.DEVNULL,
-                stderr=subprocess.DEVNULL
-            )
-            if rc.returncode == 0:
-                with open(version_file, "w") as f:
-                    f.write(remote_version)
-                shutil.copy2(os.path.join(core_dir, "vaultpass.py"), bin_path)
-                os.chmod(bin_path, 0o755)
-                print(f"[✓] Vaultpass updated to v{remote_version}.")
-            else:
-                print("[X] Failed to update Vaultpass.")
-        open(last_update_file, "a").close()
-        return
+        if update in ("y", "") and _pull_update(install_dir, core_dir, bin_path, last_update_file):
+            with open(version_file, "w") as f:
+                f.write(remote_version)
+            print(f"[✓] Vaultpass updated to v{remote_version}.")
 
-    elif commit_update:
+    elif kind == "commit":
         remote_msg = get_remote_msg(install_dir)
         print(f"[!] New version: {remote_msg}")
         update = input("[?] Update? (Y/n): ").strip().lower()
-        if update in ("y", ""):
-            print("[*] Updating Vaultpass…")
-            rc = subprocess.run(
-                ["git", "pull", "origin", "main"],
-                cwd=install_dir,
-                stdout=subprocess.DEVNULL,
-                stderr=subprocess.DEVNULL
-            )
-            if rc.returncode == 0:
-                shutil.copy2(os.path.join(core_dir, "vaultpass.py"), bin_path)
-                os.chmod(bin_path, 0o755)
-                print("[✓] Vaultpass minor update applied.")
-            else:
-                print("[X] Failed to update Vaultpass.")
-        open(last_update_file, "a").close()
-        return
+        if update in ("y", "") and _pull_update(install_dir, core_dir, bin_path, last_update_file):
+            print("[✓] Vaultpass minor update applied.")
 
     else:
-        #print("[✓] Vaultpass is up to date.")
-        open(last_update_file, "a").close()
-        return
\ No newline at end of file
+        print("[✓] Vaultpass is up to date.")
+
+if __name__ == "__main__":
+    if len(sys.argv) == 5 and sys.argv[1] == "--background-check":
+        run_check(sys.argv[2], sys.argv[3], sys.argv[4])
@@ -1,246 +1,805 @@
 import os
 import sys
 import time
-import shutil
-import getpass
 import hashlib
+import agent
+import config
+import oplog
+import tracing
+import vault_index
+import vault_crypto
+import vault_entry
+import vault_ids
+import vault_journal
+import vault_lock
+import vault_order
+import vault_search
 from banner_utils import show_banner
 
 HOME = os.path.expanduser("~")
 INSTALL_DIR = os.path.join(HOME, ".vaultpass")
-CONFIG_FILE = os.path.join(INSTALL_DIR, ".config")
 SYSTEM_DIR = os.path.join(INSTALL_DIR, "system")
 BACKUP_DIR = os.path.join(INSTALL_DIR, "backup")
 PASS_FILE = os.path.join(SYSTEM_DIR, "passwords.gpg")
 HINT_FILE = os.path.join(SYSTEM_DIR, "passphrase_hint.txt")
 HASH_FILE = os.path.join(SYSTEM_DIR, "passphrase_hash.txt")
 
-DEFAULT_CONFIG = "encryption=on\npassphrase_set=no\ntheme=light\n"
-
-def load_config():
-    config = {}
-    if not os.path.exists(CONFIG_FILE):
-        with open(CONFIG_FILE, "w") as f:
-            f.write(DEFAULT_CONFIG)
-    with open(CONFIG_FILE) as f:
-        for line in f:
-            if '=' in line:
-                k, v = line.strip().split('=', 1)
-                config[k] = v
-    # Heal missing keys
-    for line in DEFAULT_CONFIG.strip().splitlines():
-        key = line.split("=")[0]
-        if key not in config:
-            config[key] = line.split("=")[1]
-    return config
-
-def save_config(config):
-    with open(CONFIG_FILE, "w") as f:
-        for k, v in config.items():
-            f.write(f"{k}={v}\n")
+COMPACT_MIN_RECORDS = 64
+LIST_FIELDS = ("id", "user", "password", "info", "created", "modified")
+LIST_SORTS = ("id", "created", "modified")
+LIST_PAGE = 4096
+
+def _getpass(prompt):
+    import getpass  # only needed when we actually prompt
+    return getpass.getpass(prompt)
 
 def hash_passphrase(passphrase):
     return hashlib.sha256(passphrase.encode()).hexdigest()
 
-def sanitize(s):
-    return s.replace("|", "_").replace("\n", " ").strip()
+# Key unlocked in this process; None until require_passphrase_setup() runs,
+# False when the vault is unencrypted.
+_session_key = None
 
 def require_passphrase_setup():
-    from cli import show_banner  # local import to avoid circular
+    """
+    Unlocks the vault once per process: reuses the key from this process or
+    from a running agent before falling back to the passphrase prompt.
+    """
+    global _session_key
+    if _session_key is None:
+        with tracing.phase("unlock"):
+            _session_key = _unlock()
+        vault_crypto.use_key(_session_key or None)
+        # Converts pre-journal vaults and drops a write torn by a crash
+        with tracing.phase("recover"):
+            _recover()
+        if _session_key:
+            _encrypt_plain_vault()
+    return bool(_session_key)
+
+def _recover():
+    # Checked under the shared lock so concurrent readers don't queue up;
+    # only a vault that needs repair waits for the exclusive one
+    with vault_lock.shared():
+        needed = vault_journal.needs_recovery(PASS_FILE)
+    if needed:
+        with vault_lock.exclusive():
+            vault_journal.recover(PASS_FILE)
+
+def _is_plain_vault():
+    return os.path.isfile(PASS_FILE) and os.path.getsize(PASS_FILE) and not vault_crypto.is_encrypted(PASS_FILE)
+
+def _encrypt_plain_vault():
+    # Vaults written before in-process encryption are still plaintext
+    if not _is_plain_vault():
+        return
+    with vault_lock.exclusive():
+        if _is_plain_vault():    # another process may have got here first
+            print("[*] Encrypting existing vault...")
+            vault_crypto.rewrite(PASS_FILE, vault_crypto.iter_chunks(PASS_FILE))
+            vault_index.rebuild()
+            vault_ids.refresh()    # its plaintext IDs get sealed
 
-    config = load_config()
-    enc_state = config.get('encryption', 'off')
-    passphrase_state = config.get('passphrase_set', 'no')
+def _kdf_target_ms():
+    return config.get("kdf_target_ms")
 
-    if enc_state == "off":
+def _new_key_header(passphrase, params=None, data_key=None):
+    # Fresh salt + calibrated scrypt cost. The passphrase wraps the data key:
+    # a new random one, or the vault's current key when only rewrapping.
+    header = vault_crypto.new_header(params or vault_crypto.calibrate(_kdf_target_ms()))
+    key = data_key or os.urandom(32)
+    return vault_crypto.wrap_key(header, passphrase, key), key
+
+def _upgrade_legacy_passphrase(passphrase):
+    """
+    Moves a vault protected by the old unsalted SHA-256 hash (and, if
+    present, a PBKDF2 key header) onto a calibrated scrypt header. A vault
+    already encrypted keeps its key, now wrapped by the passphrase.
+    """
+    print("[*] Upgrading passphrase protection (one-time)...")
+    old_header = vault_crypto.load_header()
+    old_key = vault_crypto.derive_key(passphrase, old_header) if old_header else None
+    header, key = _new_key_header(passphrase, data_key=old_key)
+    with vault_lock.exclusive():
+        vault_crypto.save_header(header)
+    if os.path.exists(HASH_FILE):
+        os.remove(HASH_FILE)
+    return key
+
+def _wrap_current_key(passphrase, header, key):
+    # Vaults from before envelope keys are encrypted with the passphrase-derived
+    # key itself. It becomes the data key, wrapped under a fresh salt, so
+    # nothing is re-encrypted now and later passphrase changes are O(1).
+    with vault_lock.exclusive():
+        if "wrapped" not in vault_crypto.load_header():
+            vault_crypto.save_header(_new_key_header(passphrase, header["kdf"], data_key=key)[0])
+
+def _settle_staged(passphrase, header):
+    """
+    Finishes or rolls back a header change that a crash interrupted. The
+    staged header is installed if passphrase opens it and it wraps the
+    current key (the change went through as far as the user could tell),
+    and dropped if passphrase opens the current header instead.
+    """
+    if vault_crypto.staged_header() is None:
+        return header
+    with vault_lock.exclusive():
+        staged = vault_crypto.staged_header()
+        if staged is not None:
+            key = vault_crypto.open_header(passphrase, staged)
+            if key is not None and vault_crypto.key_matches(key, header):
+                vault_crypto.settle_staged(True)
+            elif vault_crypto.open_header(passphrase, header) is not None:
+                vault_crypto.settle_staged(False)
+        return vault_crypto.load_header()
+
+def _open_vault_key(passphrase, header):
+    """
+    Returns the vault key that passphrase unlocks, exiting if it is wrong.
+    Settles an interrupted header change on the way and wraps the key of a
+    vault from before envelope keys.
+    """
+    header = _settle_staged(passphrase, header)
+    key = vault_crypto.open_header(passphrase, header)
+    if key is None:
+        print("[X] Incorrect passphrase.")
+        sys.exit(1)
+    if header.get("pending"):
+        header = _settle_pending(passphrase, header)
+        key = vault_crypto.open_header(passphrase, header)
+    if "wrapped" not in header:
+        _wrap_current_key(passphrase, header, key)
+    return key
+
+def _settle_pending(passphrase, header):
+    """
+    Finishes or rolls back a re-encryption to a new key that an older
+    version was interrupted in. Only call this once the passphrase is
+    known to be right.
+    """
+    pending = header and header.get("pending")
+    if not pending:
+        return header
+    with vault_lock.exclusive():
+        header = vault_crypto.load_header()    # re-read: another process may have settled it
+        pending = header.get("pending")
+        if not pending:
+            return header
+        if vault_crypto.can_decrypt(PASS_FILE, vault_crypto.derive_key(passphrase, pending)):
+            header = pending
+        else:
+            header = {k: v for k, v in header.items() if k != "pending"}
+        vault_crypto.save_header(header)
+    return header
+
+def _has_passphrase():
+    header = vault_crypto.load_header()
+    return os.path.isfile(HASH_FILE) or bool(header and header["kdf"]["name"] == "scrypt")
+
+def _unlock():
+    from cli import show_banner  # local import to avoid circular
+
+    if not config.get("encryption"):
         print("[!] No encryption enabled. Proceeding without passphrase.")
         return False
 
     # If encryption is ON, but passphrase isn't set, prompt!
-    if passphrase_state == "no" or not os.path.isfile(HASH_FILE):
+    if not config.get("passphrase_set") or not _has_passphrase():
         show_banner()
         print("[!] You must set a master passphrase.")
         print("  - This passphrase protects all your saved passwords.")
         print("  - If you forget it, your passwords cannot be recovered.")
-        passphrase = getpass.getpass("[*] Enter a passphrase [Leave blank for NO Encryption]: ")
+        passphrase = _getpass("[*] Enter a passphrase [Leave blank for NO Encryption]: ")
         if passphrase == "":
             print("Passphrase not set, passwords won't be encrypted")
-            config['encryption'] = "off"
-            config['passphrase_set'] = "no"
-            save_config(config)
+            config.set_config_value("encryption", False)
+            config.set_config_value("passphrase_set", False)
             if os.path.exists(HINT_FILE): os.remove(HINT_FILE)
             if os.path.exists(HASH_FILE): os.remove(HASH_FILE)
             return False  # Proceed unencrypted
-        confirm = getpass.getpass("[*] Confirm passphrase: ")
+        confirm = _getpass("[*] Confirm passphrase: ")
         if passphrase != confirm:
             print("[X] Passphrases do not match.")
             sys.exit(1)
-        # Save passphrase hash and update config
-        with open(HASH_FILE, "w") as f:
-            f.write(hash_passphrase(passphrase))
+        # Save key header (salt, scrypt cost, wrapped data key) and update config
+        header, key = _new_key_header(passphrase)
+        with vault_lock.exclusive():
+            vault_crypto.save_header(header)
+        if os.path.exists(HASH_FILE):
+            os.remove(HASH_FILE)
         hint = input("[*] Enter a passphrase hint (optional): ").strip()
         with open(HINT_FILE, "w") as f:
             f.write(hint)
-        config['encryption'] = "on"
-        config['passphrase_set'] = "yes"
-        save_config(config)
+        config.set_config_value("encryption", True)
+        config.set_config_value("passphrase_set", True)
         print("[*] Passphrase and hint saved.")
-        return True
+        agent.put_key(key.hex())
+        return key
 
     # Existing passphrase
+    header = vault_crypto.load_header()
+    cached = agent.get_key()
+    if cached and vault_crypto.key_matches(bytes.fromhex(cached), header):
+        return bytes.fromhex(cached)
     hint = ""
     if os.path.isfile(HINT_FILE):
         with open(HINT_FILE) as f:
             hint = f.read().strip()
         if hint:
             print("💡 Hint:", hint)
-    with open(HASH_FILE) as f:
-        saved_hash = f.read().strip()
-    passphrase = getpass.getpass("[*] Enter your master passphrase: ")
-    if hash_passphrase(passphrase) == saved_hash:
-        return True
+    passphrase = _getpass("[*] Enter your master passphrase: ")
+    if os.path.isfile(HASH_FILE):
+        with open(HASH_FILE) as f:
+            saved_hash = f.read().strip()
+        if hash_passphrase(passphrase) != saved_hash:
+            print("[X] Incorrect passphrase.")
+            sys.exit(1)
+        header = _settle_pending(passphrase, header)
+        if header and header["kdf"]["name"] == "scrypt":
+            os.remove(HASH_FILE)
+            key = _open_vault_key(passphrase, header)
+        else:
+            key = _upgrade_legacy_passphrase(passphrase)
     else:
-        print("[X] Incorrect passphrase.")
+        key = _open_vault_key(passphrase, header)
+    agent.put_key(key.hex())
+    return key
+
+def change_passphrase():
+    """
+    Sets a new master passphrase. Only the data key wrapped in the header
+    is rewritten, so this takes the same time whatever the vault holds.
+    """
+    global _session_key
+    if not config.get("encryption") or not _has_passphrase():
+        print("[!] Vault is not encrypted; there is no passphrase to change.")
+        return
+    if os.path.isfile(HASH_FILE):
+        require_passphrase_setup()  # upgrades the legacy hash first
+    key = _open_vault_key(_getpass("[*] Enter your current master passphrase: "), vault_crypto.load_header())
+    passphrase = _getpass("[*] Enter a new passphrase: ")
+    if not passphrase:
+        print("[X] The new passphrase can't be empty.")
+        sys.exit(1)
+    if passphrase != _getpass("[*] Confirm new passphrase: "):
+        print("[X] Passphrases do not match.")
         sys.exit(1)
+    hint = input("[*] Enter a new passphrase hint (optional, Enter keeps the current one): ").strip()
+    with vault_lock.exclusive():
+        # Same data key and KDF cost, fresh salt
+        header, _ = _new_key_header(passphrase, vault_crypto.load_header()["kdf"], data_key=key)
+        vault_crypto.save_header(header)
+    if hint:
+        with open(HINT_FILE, "w") as f:
+            f.write(hint)
+    vault_crypto.use_key(key)
+    _session_key = key
+    agent.put_key(key.hex())
+    print("[✓] Passphrase changed.")
 
-def _read_pass_lines():
-    if not os.path.isfile(PASS_FILE):
-        return []
-    with open(PASS_FILE) as f:
-        return f.readlines()
-
-def _write_pass_lines(lines):
-    with open(PASS_FILE, "w") as f:
-        f.writelines(lines)
-
-def handle_duplicate_id(save_id):
-    # Check if ID exists and prompt for action
-    lines = _read_pass_lines()
-    id_found = any(line.startswith(f"{save_id}:") for line in lines)
-    if not id_found:
-        return None
-    while True:
-        resp = input(f"[!] ID '{save_id}' already exists. [O]verwrite, [A]ppend, [C]ancel? (o/a/c): ").strip().lower()
-        if resp == "o":
-            # Overwrite: remove old entry
-            _write_pass_lines([line for line in lines if not line.startswith(f"{save_id}:")])
-            return save_id
-        elif resp == "a":
-            # Append: find next available suffix
-            count = 2
-            existing_ids = [line.split(":")[0] for line in lines]
-            new_id = f"{save_id}_{count}"
-            while new_id in existing_ids:
-                count += 1
+def recalibrate_kdf(target_ms=None):
+    """
+    Benchmarks this device, then rewraps the vault key with scrypt cost
+    parameters that hit target_ms per unlock.
+    """
+    global _session_key
+    target_ms = target_ms or _kdf_target_ms() or vault_crypto.default_target_ms()
+    print(f"[*] Calibrating scrypt for ~{target_ms} ms per unlock...")
+    params = vault_crypto.calibrate(target_ms)
+    print(f"[*] Chosen: N=2^{params['n'].bit_length() - 1}, r={params['r']}, p={params['p']} ({params['ms']} ms, "
+          f"{128 * params['r'] * params['n'] // (1 << 20)} MiB)")
+    if not config.get("encryption") or not _has_passphrase():
+        print("[!] Vault is not encrypted; nothing to recalibrate.")
+        return
+    if os.path.isfile(HASH_FILE):
+        require_passphrase_setup()  # upgrades the legacy hash first
+    passphrase = _getpass("[*] Enter your master passphrase to apply: ")
+    key = _open_vault_key(passphrase, vault_crypto.load_header())
+    new_header, _ = _new_key_header(passphrase, params, data_key=key)
+    with vault_lock.exclusive():
+        vault_crypto.save_header(new_header)
+    vault_crypto.use_key(key)
+    _session_key = key
+    agent.put_key(key.hex())
+    print("[✓] Passphrase cost parameters updated.")
+
+def plan_ids(save_ids):
+    """
+    Resolves duplicate IDs for a batch of new entries with one index pass,
+    prompting per clash. Nothing is written yet; returns the final IDs and
+    the set of existing IDs the batch will overwrite.
+    """
+    require_passphrase_setup()
+    with vault_lock.shared():
+        existing = {id for id, entries in vault_index.find_many(save_ids).items() if entries}
+    planned, replaced = [], set()
+    for save_id in save_ids:
+        if save_id not in existing and save_id not in planned:
+            planned.append(save_id)
+            continue
+        while True:
+            resp = input(f"[!] ID '{save_id}' already exists. [O]verwrite, [A]ppend, [C]ancel? (o/a/c): ").strip().lower()
+            if resp == "o":
+                # Overwrite: old entry is dropped when the batch is written
+                if save_id in planned:
+                    planned.remove(save_id)
+                planned.append(save_id)
+                if save_id in existing:
+                    replaced.add(save_id)
+                break
+            elif resp == "a":
+                # Append: find next available suffix
+                count = 2
                 new_id = f"{save_id}_{count}"
-            print(f"[*] Saving as {new_id}")
-            return new_id
-        elif resp == "c":
-            print("[!] Cancelled.")
-            sys.exit(0)
-        else:
-            print("[!] Invalid option.")
+                while new_id in planned or _exists(new_id):
+                    count += 1
+                    new_id = f"{save_id}_{count}"
+                print(f"[*] Saving as {new_id}")
+                planned.append(new_id)
+                break
+            elif resp == "c":
+                print("[!] Cancelled.")
+                sys.exit(0)
+            else:
+                print("[!] Invalid option.")
+    return planned, replaced
+
+def _exists(entry_id):
+    with vault_lock.shared():
+        return vault_index.contains(entry_id)
+
+def _format_time(ts):
+    return time.strftime("%Y-%m-%d %H:%M", time.localtime(ts)) if ts else "-"
 
-def list_entries():
+def list_entries(limit=None, offset=0, sort="modified", fields=None, fmt="text", show_passwords=False):
+    """
+    Streams the vault entries, `limit` at a time from `offset`, ordered by
+    ID, creation or last modification, as text or NDJSON. Passwords are
+    left out unless show_passwords is set.
+    """
     require_passphrase_setup()
     if not os.path.isfile(PASS_FILE):
         print("[!] No vault found.")
         return
-    with open(PASS_FILE) as f:
-        for line in f:
-            print("[✓]", line.strip())
+    if fields is None:
+        fields = ["id", "user", "password", "info"] if show_passwords else ["id", "user", "info"]
+    unknown = [field for field in fields if field not in LIST_FIELDS]
+    if unknown:
+        print(f"[!] Unknown field(s): {', '.join(unknown)}. Choose from {', '.join(LIST_FIELDS)}.")
+        return
+    if "password" in fields and not show_passwords:
+        print("[!] Passwords are hidden; add --show-passwords to list them.")
+        return
+    import json
+    out = []
+    rows = 0
+    try:
+        with vault_lock.shared():
+            for entry in vault_order.iter_sorted(sort, offset, limit):
+                rows += 1
+                row = {"id": entry.id, "user": entry.user, "password": entry.password, "info": entry.info,
+                       "created": entry.created or None, "modified": entry.modified or None}
+                if fmt == "ndjson":
+                    out.append(json.dumps({field: row[field] for field in fields}, ensure_ascii=False))
+                else:
+                    row["created"], row["modified"] = _format_time(entry.created), _format_time(entry.modified)
+                    out.append("[✓] " + " | ".join(vault_entry.escape(row[field]) for field in fields))
+                if len(out) >= LIST_PAGE:
+                    sys.stdout.write("\n".join(out) + "\n")
+                    out = []
+        if out:
+            sys.stdout.write("\n".join(out) + "\n")
+        sys.stdout.flush()
+    except BrokenPipeError:
+        # The reader went away (e.g. piped into head); stop quietly
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+    oplog.note(rows=rows)
 
 def add_entry(id, user="", pwd="", info=""):
     require_passphrase_setup()
     os.makedirs(SYSTEM_DIR, exist_ok=True)
-    id = sanitize(id)
-    user = sanitize(user)
-    info = sanitize(info)
-    if info:
-        line = f"{id}:|{user}|{pwd}|{info}\n"
-    else:
-        line = f"{id}:|{user}|{pwd}\n"
-    with open(PASS_FILE, "a") as f:
-        f.write(line)
-    print(f"[✓] Saved password for {id}.")
+    entry = vault_entry.Entry(id.strip(), user, pwd, info)
+    try:
+        vault_entry.check(entry)
+    except ValueError as e:
+        print(f"[X] Not saved: {e}.")
+        return
+    with vault_lock.exclusive():
+        commit_batch([entry], ())
+    oplog.note(saved=1)
+    print(f"[✓] Saved password for {vault_entry.escape(entry.id)}.")
+
+def add_entries(entries, replaced=()):
+    """
+    Saves a batch of (id, user, pwd, info) entries with one vault write,
+    dropping the IDs in `replaced` first. Fields are stored as given; only
+    whitespace around an ID is trimmed.
+    """
+    require_passphrase_setup()
+    os.makedirs(SYSTEM_DIR, exist_ok=True)
+    new = [vault_entry.Entry(id.strip(), user, pwd, info) for id, user, pwd, info in entries]
+    try:
+        for entry in new:
+            vault_entry.check(entry)
+    except ValueError as e:
+        print(f"[X] Nothing saved: {e}.")
+        return
+    with vault_lock.exclusive():
+        commit_batch(new, replaced)
+    oplog.note(saved=len(new), replaced=len(replaced))
+    print(f"[✓] Saved {len(new)} password(s): {', '.join(vault_entry.escape(e.id) for e in new)}.")
+
+def _next_free_id(save_id, taken):
+    count = 2
+    new_id = f"{save_id}_{count}"
+    while new_id in taken:
+        count += 1
+        new_id = f"{save_id}_{count}"
+    return new_id
+
+def import_entries(path, fmt=None, on_duplicate="skip"):
+    """
+    Bulk-imports a CSV/JSON/NDJSON file. Records are validated and spooled
+    to a temp file while streaming, then committed with one durable write.
+    on_duplicate: skip, overwrite or rename (ID_2, ID_3, ...).
+    """
+    import importer
+    require_passphrase_setup()
+    os.makedirs(SYSTEM_DIR, exist_ok=True)
+    # Held from the duplicate check to the commit, so the IDs it saw stay true
+    with vault_lock.exclusive():
+        taken = {entry.id for _, entry in vault_index.iter_live()}
+        replaced = set()
+        spool_path = PASS_FILE + ".import"
+        counts = {"added": 0, "skipped": 0, "invalid": 0}
+
+        def accepted():
+            for number, rec in importer.iter_records(path, fmt):
+                if isinstance(rec, str):
+                    print(f"[!] Record {number}: {rec}, skipped.")
+                    counts["invalid"] += 1
+                    continue
+                new_id = rec["id"].strip()
+                if new_id in taken and on_duplicate == "skip":
+                    counts["skipped"] += 1
+                    continue
+                if new_id in taken and on_duplicate == "rename":
+                    new_id = _next_free_id(new_id, taken)
+                entry = vault_entry.Entry(new_id, rec["user"], rec["pwd"], rec["info"])
+                try:
+                    vault_entry.check(entry)
+                except ValueError as e:
+                    print(f"[!] Record {number}: {e}, skipped.")
+                    counts["invalid"] += 1
+                    continue
+                if new_id in taken:
+                    replaced.add(new_id)    # overwrite
+                taken.add(new_id)
+                counts["added"] += 1
+                yield vault_journal.encode_entry(entry)
+
+        try:
+            # The spool is written through vault_crypto, so it is encrypted too
+            vault_crypto.rewrite(spool_path, accepted())
+            if counts["added"]:
+                spooled = (vault_journal.decode(raw)[1] for raw in vault_crypto.iter_lines(spool_path))
+                commit_batch(spooled, replaced)
+        except (OSError, ValueError) as e:
+            print(f"[X] Import failed: {e}")
+            return
+        finally:
+            if os.path.exists(spool_path):
+                os.remove(spool_path)
+    oplog.note(**counts)
+    print(f"[✓] Imported {counts['added']} entries ({counts['skipped']} duplicates skipped, {counts['invalid']} invalid).")
+
+def commit_batch(new_entries, replaced):
+    """
+    Appends one journal batch: deletes for the replaced IDs, then the new
+    entries. Nothing already in the vault is rewritten. The fuzzy index
+    follows along if it was current; otherwise it rebuilds on next use.
+    The completion ID index, if kept, follows along too.
+    Call with the vault locked exclusively.
+    """
+    track = vault_search.is_fresh()
+    start = vault_crypto.plain_size(PASS_FILE)
+    added, removed = vault_index.append_entries(new_entries, replaced)
+    if track:
+        with tracing.phase("search_update"):
+            vault_search.update(added, removed)
+    with tracing.phase("ids_update"):
+        vault_ids.update(start, [entry_id for _, entry_id in added], [entry_id for _, entry_id in removed])
+    _maybe_compact()
+
+def _maybe_compact():
+    # Dead records are edited/deleted entries plus the delete records
+    # themselves; past the configured share the vault is rewritten
+    live, total = vault_index.stats()
+    if total >= COMPACT_MIN_RECORDS and total - live > total * config.get("compact_ratio"):
+        compact_vault()
+
+def compact_vault():
+    """
+    Rewrites the vault with only its live entries, dropping dead records.
+    """
+    with vault_lock.exclusive(), tracing.phase("compact"):
+        vault_journal.compact(PASS_FILE, vault_index.live_offsets())
+        vault_index.rebuild()
+        vault_ids.refresh()
+    oplog.note(compacted=True)
 
 def edit_entry(id, new_user):
     require_passphrase_setup()
     if not os.path.isfile(PASS_FILE):
         print("[!] No vault found.")
         return
-    with open(PASS_FILE) as f:
-        lines = f.readlines()
-    new_lines, found = [], False
-    for line in lines:
-        if line.startswith(f"{id}:"):
-            parts = line.strip().split("|")
-            parts[1] = new_user
-            new_line = "|".join(parts) + "\n"
-            new_lines.append(new_line)
-            found = True
-        else:
-            new_lines.append(line)
-    if found:
-        _write_pass_lines(new_lines)
+    # Read and rewrite under one lock, so a concurrent write can't slip between
+    with vault_lock.exclusive():
+        entries = vault_index.find(id)
+        for entry in entries:
+            entry.user = new_user
+        if entries:
+            commit_batch(entries, [id])
+    oplog.note(updated=len(entries))
+    if entries:
         print(f"[✓] Username/email updated for {id}.")
     else:
         print("[X] ID not found.")
 
 def delete_entry(id):
+    delete_entries([id])
+
+def delete_entries(ids):
+    """
+    Deletes several IDs with one index pass and a single journal append.
+    """
     require_passphrase_setup()
     if not os.path.isfile(PASS_FILE):
         print("[!] No vault found.")
         return
-    with open(PASS_FILE) as f:
-        lines = f.readlines()
-    new_lines, found = [], False
-    for line in lines:
-        if line.startswith(f"{id}:"):
-            found = True
-            continue
-        new_lines.append(line)
+    found = remove_entries(ids)
+    missing = [id for id in dict.fromkeys(ids) if id not in found]
+    oplog.note(deleted=len(found), missing=len(missing))
     if found:
-        _write_pass_lines(new_lines)
-        print(f"[✓] Deleted {id}.")
-    else:
-        print("[X] ID not found.")
+        print(f"[✓] Deleted {', '.join(found)}.")
+    if missing:
+        print(f"[X] ID not found: {', '.join(missing)}.")
+
+def find_entries(ids):
+    """
+    Returns {id: [Entry]} for several IDs, read in one pass over the vault.
+    """
+    require_passphrase_setup()
+    with vault_lock.shared():
+        return vault_index.find_many(ids)
+
+def save_entries(entries, replace=True):
+    """
+    Saves Entries in one journal batch, replacing whatever is stored under
+    their IDs unless replace is False. Entries are stamped in place; returns
+    the IDs that were replaced.
+    """
+    require_passphrase_setup()
+    os.makedirs(SYSTEM_DIR, exist_ok=True)
+    with vault_lock.exclusive():
+        ids = list(dict.fromkeys(entry.id for entry in entries))
+        replaced = [id for id, old in vault_index.find_many(ids).items() if old] if replace else []
+        commit_batch(entries, replaced)
+    return replaced
+
+def remove_entries(ids):
+    """
+    Deletes several IDs in one journal batch; returns the ones that existed.
+    """
+    require_passphrase_setup()
+    with vault_lock.exclusive():
+        found = [id for id, entries in vault_index.find_many(ids).items() if entries]
+        if found:
+            commit_batch([], found)
+    return found
 
 def search_entry(id):
+    search_entries([id])
+
+def search_entries(ids):
+    """
+    Prints the entries for several IDs, opening the index and vault once.
+    """
+    require_passphrase_setup()
+    if not os.path.isfile(PASS_FILE):
+        print("[!] No vault found.")
+        return
+    matches = find_entries(ids)
+    found = sum(1 for entries in matches.values() if entries)
+    oplog.note(found=found, missing=len(matches) - found)
+    for id, entries in matches.items():
+        for entry in entries:
+            print("[✓]", entry.to_line())
+        if not entries:
+            print(f"[X] ID {id} not found.")
+
+def fuzzy_search(query, limit=10):
+    """
+    Prints the entries whose ID, username or info best match query.
+    """
     require_passphrase_setup()
     if not os.path.isfile(PASS_FILE):
         print("[!] No vault found.")
         return
-    found = False
-    with open(PASS_FILE) as f:
-        for line in f:
-            if line.startswith(f"{id}:"):
-                print("[✓]", line.strip())
-                found = True
-    if not found:
-        print(f"[X] ID {id} not found.")
+    with vault_lock.shared():
+        if not vault_search.is_fresh():
+            print("[*] Indexing vault for fuzzy search...")
+            with tracing.phase("search_rebuild"):
+                vault_search.ensure_fresh()
+        with tracing.phase("search"):
+            results = vault_search.search(query, limit)
+    oplog.note(results=len(results))
+    for score, entry in results:
+        print(f"[✓] {entry.to_line()}  ({score:.0%})")
+    if not results:
+        print(f"[X] Nothing matches '{query}'.")
 
 def backup_vault():
+    """
+    Takes a deduplicated snapshot of the vault, its key header and the
+    hint, then prunes snapshots past the configured retention and their
+    unused chunks.
+    """
+    import vault_backup
     require_passphrase_setup()
-    os.makedirs(BACKUP_DIR, exist_ok=True)
     if not os.path.isfile(PASS_FILE):
         print("[!] No vault to backup.")
         return
-    timestamp = time.strftime("%Y%m%d_%H%M%S")
-    backup_file = os.path.join(BACKUP_DIR, f"passwords_{timestamp}.gpg")
-    shutil.copy2(PASS_FILE, backup_file)
-    if os.path.isfile(HINT_FILE):
-        shutil.copy2(HINT_FILE, os.path.join(BACKUP_DIR, "passphrase_hint.txt"))
-    print(f"[✓] Backup saved to {BACKUP_DIR}")
+    with vault_lock.shared(), vault_lock.exclusive(vault_lock.BACKUP_LOCK):
+        # The header holds the wrapped data key: without it the vault copy can't be opened
+        files = {"passwords.gpg": PASS_FILE, "vault_header.json": vault_crypto.HEADER_FILE,
+                 "passphrase_hint.txt": HINT_FILE}
+        snap, stats = vault_backup.snapshot(files, config.get("backup_compression"))
+        print(f"[✓] Backup saved as {snap} ({stats['chunks']} new chunk(s), {stats['bytes']} bytes written).")
+        dropped = vault_backup.prune(config.get("backup_keep_daily"), config.get("backup_keep_weekly"))
+        removed = vault_backup.collect() if dropped else 0
+    oplog.note(new_chunks=stats["chunks"], bytes_written=stats["bytes"])
+    if dropped:
+        oplog.note(pruned=len(dropped))
+        print(f"[*] Pruned {len(dropped)} old snapshot(s) and {removed} unused chunk(s).")
+
+def _format_size(n):
+    for unit in ("B", "KB", "MB"):
+        if n < 1024:
+            return f"{n:.0f} {unit}" if unit == "B" else f"{n:.1f} {unit}"
+        n /= 1024
+    return f"{n:.1f} GB"
+
+def verify_backups():
+    """
+    Checks every backup snapshot in parallel and reports damaged ones
+    along with the compression ratio of each.
+    """
+    import vault_backup
+    with vault_lock.shared(vault_lock.BACKUP_LOCK):
+        results = sorted(vault_backup.verify())
+    bad = sum(1 for result in results if result[1])
+    oplog.note(snapshots=len(results), damaged=bad)
+    for snap, error, raw, stored in results:
+        if error:
+            print(f"[X] {snap}: {error}")
+        else:
+            ratio = raw / stored if stored else 1.0
+            print(f"[✓] {snap}: {_format_size(raw)} -> {_format_size(stored)} stored ({ratio:.1f}x)")
+    if os.path.isdir(BACKUP_DIR):
+        for name in sorted(os.listdir(BACKUP_DIR)):
+            if name.endswith(".gpg"):
+                print(f"[!] {name}: full copy from before snapshots, no checksum to verify")
+    if not results:
+        print("[!] No backup snapshots found.")
+    elif bad:
+        print(f"[X] {bad} of {len(results)} snapshot(s) are damaged.")
+    else:
+        print(f"[✓] All {len(results)} snapshot(s) verified.")
+    return bad == 0
+
+def list_backups():
+    """
+    Prints the snapshots (and pre-snapshot backup copies) that can be restored.
+    """
+    import vault_backup
+    with vault_lock.shared(vault_lock.BACKUP_LOCK):
+        names = vault_backup.list_snapshots()
+    if os.path.isdir(BACKUP_DIR):
+        names += sorted(name for name in os.listdir(BACKUP_DIR) if name.endswith(".gpg"))
+    if not names:
+        print("[!] No backups found.")
+    for name in names:
+        print(f"[*] {name}")
+
+def _current_key_opens(path):
+    if not _session_key:
+        return False
+    try:
+        vault_crypto.read_at(path, 0, 1)
+    except ValueError:
+        return False
+    return True
+
+def _restore_snapshot(snap):
+    """
+    Puts a snapshot's vault in place together with the key header it needs.
+    A vault under the current data key keeps today's header and hint, so
+    today's passphrase still opens it. One under another data key brings
+    its own header and hint back, once the passphrase it was made with is
+    given. A snapshot without a header (taken before headers were backed
+    up) must open with the current key. Returns False, leaving the vault
+    untouched, if the restore is refused.
+    """
+    import json
+    import vault_backup
+    global _session_key
+    staged = PASS_FILE + ".restore"
+    staged_header = staged + ".header"
+    key = None    # data key of the restored vault when it isn't the current one
+    try:
+        if not vault_backup.restore_file(snap, "passwords.gpg", staged):
+            print("[X] Backup holds no vault.")
+            return False
+        header = None
+        if vault_backup.restore_file(snap, "vault_header.json", staged_header):
+            with open(staged_header) as f:
+                header = json.load(f)
+        if vault_crypto.is_encrypted(staged):
+            if header is None:
+                if not _current_key_opens(staged):
+                    print("[X] Backup is encrypted under another key and holds no key header; vault left unchanged.")
+                    return False
+            elif not (_session_key and vault_crypto.key_matches(_session_key, header)):
+                print("[!] This backup was made under another vault key.")
+                key = vault_crypto.open_header(_getpass("[*] Enter the passphrase it was made with: "), header)
+                if key is None:
+                    print("[X] Incorrect passphrase; vault left unchanged.")
+                    return False
+        if key:
+            vault_crypto.save_header(header)
+        if key or not os.path.isfile(HINT_FILE):
+            vault_backup.restore_file(snap, "passphrase_hint.txt", HINT_FILE)
+        os.replace(staged, PASS_FILE)
+    finally:
+        for path in (staged, staged_header):
+            if os.path.exists(path):
+                os.remove(path)
+    if key:
+        _session_key = key
+        vault_crypto.use_key(key)
+        agent.put_key(key.hex())
+        config.set_config_value("encryption", True)
+        config.set_config_value("passphrase_set", True)
+        print("[!] The vault now opens with the passphrase this backup was made with.")
+    return True
 
 def restore_vault(backup_name):
+    import shutil
+    import vault_backup
     require_passphrase_setup()
-    backup_file = os.path.join(BACKUP_DIR, backup_name)
-    if not os.path.isfile(backup_file):
-        print("[X] Backup not found.")
-        return
-    shutil.copy2(backup_file, PASS_FILE)
-    hint_file = os.path.join(BACKUP_DIR, "passphrase_hint.txt")
-    if os.path.isfile(hint_file):
-        shutil.copy2(hint_file, HINT_FILE)
+    snap = backup_name[:-5] if backup_name.endswith(".json") else backup_name
+    legacy_file = os.path.join(BACKUP_DIR, backup_name)
+    with vault_lock.exclusive(), vault_lock.shared(vault_lock.BACKUP_LOCK):
+        if vault_backup.load_manifest(snap) is not None:
+            try:
+                if not _restore_snapshot(snap):
+                    return
+                oplog.note(source="snapshot")
+            except ValueError as e:
+                print(f"[X] {e}; vault left unchanged.")
+                return
+        elif backup_name.endswith(".gpg") and os.path.isfile(legacy_file):
+            # Full copies written before snapshots
+            shutil.copy2(legacy_file, PASS_FILE + ".tmp")
+            os.replace(PASS_FILE + ".tmp", PASS_FILE)
+            hint_file = os.path.join(BACKUP_DIR, "passphrase_hint.txt")
+            if os.path.isfile(hint_file):
+                shutil.copy2(hint_file, HINT_FILE)
+            oplog.note(source="legacy copy")
+        else:
+            print("[X] Backup not found.")
+            return
+        vault_journal.recover(PASS_FILE)  # backups may predate the journal
+        vault_ids.refresh()
     print("[✓] Restored Vaultpass vault from backup.")
\ No newline at end of file
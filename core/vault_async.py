@@ -0,0 +1,107 @@
+"""
+vault_async.py -- asyncio API for services that read secrets at start-up
+
+    from vault_async import AsyncVault
+    async with AsyncVault() as vault:
+        db, api = await asyncio.gather(vault.get("db"), vault.get("api"))
+        found = await vault.get_many(["smtp", "s3"])    # {id: [Entry]}
+
+- Returns vault_entry.Entry objects instead of printing
+- get() calls made in the same event-loop tick are merged into one
+  lookup, so 200 concurrent gets cost one index probe pass and one pass
+  over the vault, like a single get_many()
+- Index, file and crypto work runs on a single worker thread (the vault
+  modules aren't thread-safe), never on the event loop; the first call
+  unlocks the vault there, from a running agent or with the usual prompt
+- put/delete take the same inter-process locks as the CLI
+"""
+
+import asyncio
+import functools
+import vault
+import vault_entry
+
+class AsyncVault:
+    """
+    Asynchronous access to the local vault.
+    """
+
+    def __init__(self, executor=None):
+        if executor is None:
+            from concurrent.futures import ThreadPoolExecutor
+            executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="vaultpass")
+            self._owns_executor = True
+        else:
+            self._owns_executor = False
+        self._executor = executor
+        self._pending = {}     # id -> futures waiting on the next batched lookup
+        self._flush = None
+
+    def _run(self, fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return loop.run_in_executor(self._executor, functools.partial(fn, *args, **kwargs))
+
+    def _enqueue(self, entry_id):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.setdefault(entry_id, []).append(future)
+        if self._flush is None:
+            self._flush = loop.create_task(self._fetch_pending())
+        return future
+
+    async def _fetch_pending(self):
+        await asyncio.sleep(0)    # let the rest of this tick's gets queue up
+        pending, self._pending, self._flush = self._pending, {}, None
+        try:
+            found = await self._run(vault.find_entries, list(pending))
+        except BaseException as e:
+            for futures in pending.values():
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+            if not isinstance(e, Exception):
+                raise
+            return
+        for entry_id, futures in pending.items():
+            for future in futures:
+                if not future.done():
+                    future.set_result(list(found[entry_id]))
+
+    async def get(self, entry_id):
+        """
+        Returns the Entries saved under entry_id (empty if there are none).
+        """
+        return await self._enqueue(entry_id)
+
+    async def get_many(self, entry_ids):
+        """
+        Returns {id: [Entry]} for several IDs, in the order given.
+        """
+        ids = list(dict.fromkeys(entry_ids))
+        results = await asyncio.gather(*(self._enqueue(entry_id) for entry_id in ids))
+        return dict(zip(ids, results))
+
+    async def put(self, entry_id, user="", password="", info="", replace=True):
+        """
+        Saves an entry, replacing any saved under the same ID unless replace
+        is False. Returns the saved Entry with its timestamps.
+        """
+        entry = vault_entry.Entry(entry_id.strip(), user, password, info)
+        await self._run(vault.save_entries, [entry], replace)
+        return entry
+
+    async def delete(self, *entry_ids):
+        """
+        Deletes IDs; returns the ones that existed.
+        """
+        return await self._run(vault.remove_entries, list(entry_ids))
+
+    def close(self):
+        if self._owns_executor:
+            self._executor.shutdown(wait=True)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await asyncio.get_running_loop().run_in_executor(None, self.close)
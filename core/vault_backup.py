@@ -0,0 +1,307 @@
+"""
+vault_backup.py -- Deduplicated snapshot backups of the vault
+
+- A snapshot is a small JSON manifest listing, per backed-up file, the
+  SHA-256 names of the chunks that make it up
+- Chunks live once in backup/chunks/ whatever the number of snapshots, so a
+  backup only writes the chunks that changed since any earlier one
+- Chunk boundaries follow the vault format: an encrypted vault is cut
+  along its own cipher chunks (an append re-seals only the last one), a
+  plaintext journal at record boundaries picked by a hash of the record,
+  so dropping records in a compaction leaves the other chunks intact
+- Chunks are compressed (lzma by default, zlib or none) unless that would
+  not shrink them, as with encrypted chunks; each manifest records the
+  size and SHA-256 of every whole file as well as the chunk names
+- verify() checks every snapshot on a process pool and reports damage and
+  compression ratios
+- prune() keeps the newest snapshot of each of the last N days and M
+  weeks, then collect() deletes chunks no remaining snapshot references
+
+Layout:
+
+    backup/snapshots/passwords_<YYYYmmdd_HHMMSS>.json
+    backup/chunks/<first 2 hex digits>/<sha256 hex of the raw chunk>
+
+A stored chunk is a one-byte codec tag (L lzma, Z zlib, R raw) followed
+by the (compressed) chunk.
+"""
+
+import os
+import json
+import time
+import lzma
+import zlib
+import hashlib
+import vault_crypto
+
+HOME = os.path.expanduser("~")
+BACKUP_DIR = os.path.join(HOME, ".vaultpass", "backup")
+SNAPSHOT_DIR = os.path.join(BACKUP_DIR, "snapshots")
+CHUNK_DIR = os.path.join(BACKUP_DIR, "chunks")
+
+MANIFEST_VERSION = 1
+MIN_CHUNK = 16 * 1024
+MAX_CHUNK = 256 * 1024
+CUT_MASK = 0x1FF    # after MIN_CHUNK, cut after ~1 in 512 records
+CODECS = {
+    "lzma": (b"L", lambda data: lzma.compress(data, preset=6)),
+    "zlib": (b"Z", lambda data: zlib.compress(data, 9)),
+    "none": (b"R", None),
+}
+DECODERS = {b"L": lzma.decompress, b"Z": zlib.decompress, b"R": bytes}
+
+def _cipher_chunks(f):
+    yield f.read(vault_crypto.FILE_HEADER.size)
+    span = vault_crypto.CHUNK_SIZE + vault_crypto.NONCE_SIZE + vault_crypto.TAG_SIZE
+    yield from iter(lambda: f.read(span), b"")
+
+def _record_chunks(f):
+    parts, size = [], 0
+    for line in f:
+        parts.append(line)
+        size += len(line)
+        if size >= MAX_CHUNK or (size >= MIN_CHUNK and zlib.crc32(line) & CUT_MASK == 0):
+            yield b"".join(parts)
+            parts, size = [], 0
+    if parts:
+        yield b"".join(parts)
+
+def iter_chunks(path):
+    """
+    Yields the content of path cut into backup chunks.
+    """
+    with open(path, "rb") as f:
+        encrypted = f.read(len(vault_crypto.MAGIC)) == vault_crypto.MAGIC
+        f.seek(0)
+        yield from (_cipher_chunks(f) if encrypted else _record_chunks(f))
+
+def _chunk_path(digest):
+    return os.path.join(CHUNK_DIR, digest[:2], digest)
+
+def _write_atomic(path, data):
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+def _encode(chunk, codec):
+    tag, compress = CODECS[codec]
+    if compress is not None:
+        packed = compress(chunk)
+        if len(packed) < len(chunk):
+            return tag + packed
+    return b"R" + chunk
+
+def read_chunk(digest):
+    """
+    Returns the raw content of a stored chunk. Raises ValueError if it is
+    missing, truncated or does not match its hash.
+    """
+    try:
+        with open(_chunk_path(digest), "rb") as f:
+            stored = f.read()
+    except FileNotFoundError:
+        raise ValueError(f"backup chunk {digest[:12]} is missing")
+    try:
+        chunk = DECODERS[stored[:1]](stored[1:])
+    except (KeyError, lzma.LZMAError, zlib.error, EOFError):
+        raise ValueError(f"backup chunk {digest[:12]} is truncated or unreadable")
+    if hashlib.sha256(chunk).hexdigest() != digest:
+        raise ValueError(f"backup chunk {digest[:12]} is corrupt")
+    return chunk
+
+def _store(path, codec, stats):
+    # Returns the manifest entry of path, writing the chunks not stored yet
+    digests, whole, size = [], hashlib.sha256(), 0
+    for chunk in iter_chunks(path):
+        digest = hashlib.sha256(chunk).hexdigest()
+        whole.update(chunk)
+        size += len(chunk)
+        target = _chunk_path(digest)
+        if not os.path.exists(target):
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            stored = _encode(chunk, codec)
+            _write_atomic(target, stored)
+            stats["chunks"] += 1
+            stats["bytes"] += len(stored)
+        digests.append(digest)
+    return {"size": size, "sha256": whole.hexdigest(), "chunks": digests}
+
+def snapshot(files, codec="lzma"):
+    """
+    Backs up {name: path} (missing paths are skipped) as a new snapshot,
+    compressing new chunks with codec ("lzma", "zlib" or "none").
+    Returns (snapshot name, {"chunks": new chunks, "bytes": bytes written}).
+    """
+    if codec not in CODECS:
+        raise ValueError(f"unknown backup codec '{codec}'")
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    stats = {"chunks": 0, "bytes": 0}
+    manifest = {"version": MANIFEST_VERSION, "created": time.time(), "files": {}}
+    for name, path in files.items():
+        if os.path.isfile(path):
+            manifest["files"][name] = _store(path, codec, stats)
+    stamp = time.strftime("%Y%m%d_%H%M%S", time.localtime(manifest["created"]))
+    snap, n = f"passwords_{stamp}", 1
+    while os.path.exists(_manifest_path(snap)):
+        n += 1
+        snap = f"passwords_{stamp}_{n}"
+    # Chunks are durable before the manifest that points at them appears
+    _write_atomic(_manifest_path(snap), json.dumps(manifest).encode())
+    return snap, stats
+
+def _manifest_path(snap):
+    return os.path.join(SNAPSHOT_DIR, snap + ".json")
+
+def load_manifest(snap):
+    """
+    Returns the manifest dict of a snapshot, or None if there is none.
+    """
+    try:
+        with open(_manifest_path(snap)) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+def list_snapshots():
+    """
+    Returns the snapshot names, oldest first.
+    """
+    if not os.path.isdir(SNAPSHOT_DIR):
+        return []
+    return sorted((name[:-5] for name in os.listdir(SNAPSHOT_DIR) if name.endswith(".json")), key=_snapshot_key)
+
+def _snapshot_key(snap):
+    # passwords_<date>_<time>[_<n>], n counting snapshots taken within one second
+    parts = snap.split("_")
+    n = parts[3] if len(parts) > 3 else ""
+    return "_".join(parts[:3]), int(n) if n.isdigit() else 1
+
+def restore_file(snap, name, dest):
+    """
+    Rebuilds file `name` of a snapshot at dest, checking every chunk and
+    the whole file against their hashes. Returns False if the snapshot
+    holds no such file. Raises ValueError if anything is missing or
+    damaged; dest is untouched then.
+    """
+    manifest = load_manifest(snap)
+    entry = manifest and manifest["files"].get(name)
+    if not entry:
+        return False
+    tmp = dest + ".tmp"
+    try:
+        with open(tmp, "wb") as out:
+            whole = hashlib.sha256()
+            for digest in entry["chunks"]:
+                chunk = read_chunk(digest)
+                whole.update(chunk)
+                out.write(chunk)
+            if whole.hexdigest() != entry["sha256"]:
+                raise ValueError(f"{name} does not match its checksum")
+            out.flush()
+            os.fsync(out.fileno())
+    except BaseException:
+        os.remove(tmp)
+        raise
+    os.replace(tmp, dest)
+    return True
+
+def verify_snapshot(snap):
+    """
+    Checks every file of a snapshot against its manifest. Returns
+    (snapshot, error or None, raw bytes, stored bytes).
+    """
+    manifest = load_manifest(snap)
+    if manifest is None:
+        return snap, "manifest is missing or unreadable", 0, 0
+    raw = stored = 0
+    seen = set()
+    try:
+        for name, entry in manifest["files"].items():
+            whole, size = hashlib.sha256(), 0
+            for digest in entry["chunks"]:
+                chunk = read_chunk(digest)
+                whole.update(chunk)
+                size += len(chunk)
+                if digest not in seen:
+                    seen.add(digest)
+                    stored += os.path.getsize(_chunk_path(digest))
+            if size != entry["size"]:
+                return snap, f"{name} is truncated ({size} of {entry['size']} bytes)", raw, stored
+            if whole.hexdigest() != entry["sha256"]:
+                return snap, f"{name} does not match its checksum", raw, stored
+            raw += size
+    except ValueError as e:
+        return snap, str(e), raw, stored
+    except (KeyError, TypeError):
+        return snap, "manifest is malformed", raw, stored
+    return snap, None, raw, stored
+
+def verify(snaps=None, workers=None):
+    """
+    Verifies snapshots (default: all) on a pool of worker processes, one
+    per core by default. Yields verify_snapshot() results as they finish.
+    """
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+    snaps = list_snapshots() if snaps is None else snaps
+    if not snaps:
+        return
+    workers = min(workers or os.cpu_count() or 1, len(snaps))
+    if workers == 1:
+        yield from map(verify_snapshot, snaps)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for future in as_completed([pool.submit(verify_snapshot, snap) for snap in snaps]):
+            yield future.result()
+
+def prune(keep_daily, keep_weekly):
+    """
+    Deletes every snapshot that is not the newest of one of the last
+    keep_daily days or keep_weekly weeks that have snapshots. The newest
+    snapshot is always kept. Returns the deleted snapshot names.
+    """
+    snaps = list_snapshots()
+    keep, days, weeks = set(snaps[-1:]), set(), set()
+    for snap in reversed(snaps):
+        manifest = load_manifest(snap)
+        if manifest is None:
+            keep.add(snap)    # left for the user to inspect, never guessed at
+            continue
+        when = time.localtime(manifest["created"])
+        day, week = time.strftime("%Y%m%d", when), time.strftime("%G%V", when)
+        if day not in days and len(days) < keep_daily:
+            days.add(day)
+            keep.add(snap)
+        if week not in weeks and len(weeks) < keep_weekly:
+            weeks.add(week)
+            keep.add(snap)
+    dropped = [snap for snap in snaps if snap not in keep]
+    for snap in dropped:
+        os.remove(_manifest_path(snap))
+    return dropped
+
+def collect():
+    """
+    Deletes chunks (and leftover temp files) no snapshot references.
+    Returns the number of chunks deleted.
+    """
+    if not os.path.isdir(CHUNK_DIR):
+        return 0
+    live = set()
+    for snap in list_snapshots():
+        manifest = load_manifest(snap)
+        if manifest is None:
+            # An unreadable manifest might still need its chunks; keep them all
+            return 0
+        for entry in manifest["files"].values():
+            live.update(entry["chunks"])
+    removed = 0
+    for sub in os.listdir(CHUNK_DIR):
+        folder = os.path.join(CHUNK_DIR, sub)
+        for name in os.listdir(folder):
+            if name not in live:
+                os.remove(os.path.join(folder, name))
+                removed += not name.endswith(".tmp")
+    return removed
@@ -0,0 +1,128 @@
+"""
+vault_client.py -- Python client for `vaultpass serve`
+
+    from vault_client import VaultClient
+    with VaultClient() as vp:
+        vp.put("github", "me@example.com", "s3cret")
+        entry = vp.get("github")[0]
+        many = vp.get_many(["github", "aws"])
+
+- One connection is opened on first use and reused for every call
+- Each method returns the server's JSON result: entries are dicts with
+  id, user, password, info, created and modified
+- Server-side errors raise VaultServerError with the JSON-RPC code
+- Needs nothing beyond the standard library, so it can be copied into
+  other projects
+"""
+
+import os
+import json
+import socket
+
+SOCKET_PATH = os.path.join(os.path.expanduser("~"), ".vaultpass", "system", "vault.sock")
+
+class VaultServerError(Exception):
+    def __init__(self, code, message):
+        super().__init__(f"{message} (code {code})")
+        self.code = code
+
+class VaultClient:
+    """
+    A connection to a running vault server.
+    """
+
+    def __init__(self, path=SOCKET_PATH, timeout=30.0):
+        self.path = path
+        self.timeout = timeout
+        self._conn = None
+        self._file = None
+        self._next_id = 0
+
+    def _connect(self):
+        self._conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._conn.settimeout(self.timeout)
+        try:
+            self._conn.connect(self.path)
+        except OSError:
+            self.close()
+            raise
+        self._file = self._conn.makefile("rwb")
+
+    def call(self, method, *args, **kwargs):
+        """
+        Sends one request and returns its result. Raises VaultServerError
+        for an error reply and OSError if the server can't be reached.
+        """
+        if self._file is None:
+            self._connect()
+        self._next_id += 1
+        req = {"jsonrpc": "2.0", "method": method, "params": kwargs or list(args), "id": self._next_id}
+        try:
+            self._file.write(json.dumps(req).encode() + b"\n")
+            self._file.flush()
+            line = self._file.readline()
+        except OSError:
+            self.close()
+            raise
+        if not line:
+            self.close()
+            raise ConnectionError("vault server closed the connection")
+        reply = json.loads(line)
+        if "error" in reply:
+            raise VaultServerError(reply["error"]["code"], reply["error"]["message"])
+        return reply["result"]
+
+    def get(self, entry_id):
+        """
+        Returns the entries saved under entry_id (empty if there are none).
+        """
+        return self.call("get", id=entry_id)
+
+    def get_many(self, entry_ids):
+        """
+        Returns {id: [entries]} for several IDs in one round trip.
+        """
+        return self.call("get", ids=list(entry_ids))
+
+    def put(self, entry_id, user="", password="", info="", replace=True):
+        """
+        Saves an entry, replacing any saved under the same ID unless
+        replace is False.
+        """
+        return self.call("put", id=entry_id, user=user, password=password, info=info, replace=replace)
+
+    def delete(self, *entry_ids):
+        """
+        Deletes IDs; returns {"deleted": [...], "missing": [...]}.
+        """
+        return self.call("delete", ids=list(entry_ids))
+
+    def list(self, sort="modified", offset=0, limit=None, passwords=False):
+        return self.call("list", sort=sort, offset=offset, limit=limit, passwords=passwords)
+
+    def search(self, query, limit=10, passwords=False):
+        """
+        Returns [{"score", "entry"}] for the best fuzzy matches of query.
+        """
+        return self.call("search", query=query, limit=limit, passwords=passwords)
+
+    def status(self):
+        return self.call("status")
+
+    def stop(self):
+        return self.call("stop")
+
+    def close(self):
+        for closable in (self._file, self._conn):
+            if closable is not None:
+                try:
+                    closable.close()
+                except OSError:
+                    pass
+        self._file = self._conn = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
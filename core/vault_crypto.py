@@ -0,0 +1,563 @@
+"""
+vault_crypto.py -- In-process chunked authenticated encryption for vault files
+
+- Encrypts a file as fixed-size AES-256-GCM chunks, each with its own nonce
+- Chunk index and a last-chunk flag are authenticated, so reordering,
+  swapping or truncating chunks fails to decrypt
+- Random access: plaintext offset N lives in chunk N // CHUNK_SIZE, so the
+  ID index keeps working on plaintext offsets and a lookup decrypts one chunk;
+  Reader memory-maps plain vaults for lookups that hop between records
+- Appends only re-encrypt the last chunk, staged in a redo file first so a
+  crash can't leave a half-written chunk; rewrites stream through a temp file
+- Plaintext never touches the disk and memory stays at a few chunks
+- Envelope keys: the vault is encrypted with a random data key, stored in
+  the header wrapped (AES-GCM) by a key derived from the passphrase.
+  Changing the passphrase or KDF cost rewraps those 32 bytes instead of
+  re-encrypting the vault. Headers are replaced atomically via a staged
+  copy, which an interrupted change leaves behind for recovery
+
+File layout: MAGIC | chunk size (u32) | chunks of nonce(12) + ciphertext + tag(16)
+
+The same helpers handle unencrypted vaults: without a key they read and
+write plain bytes.
+"""
+
+import os
+import sys
+import time
+import zlib
+import struct
+import hashlib
+import tracing
+
+HOME = os.path.expanduser("~")
+SYSTEM_DIR = os.path.join(HOME, ".vaultpass", "system")
+HEADER_FILE = os.path.join(SYSTEM_DIR, "vault_header.json")
+
+MAGIC = b"VPENC001"
+FILE_HEADER = struct.Struct("<8sI")
+CHUNK_SIZE = 64 * 1024
+NONCE_SIZE = 12
+TAG_SIZE = 16
+REDO_MAGIC = b"VPREDO01"
+REDO_HEADER = struct.Struct("<8sQI")   # magic, file position, crc32 of the new tail
+COPY_SIZE = 1024 * 1024
+SCRYPT_R = 8
+SCRYPT_MIN_N = 2 ** 14
+SCRYPT_MAX_N = 2 ** 17     # 128 MiB with r=8; phones can't spare more
+TARGET_MS_DESKTOP = 250
+TARGET_MS_TERMUX = 500
+
+# Key for this process, set by vault.require_passphrase_setup(); None means
+# the vault is stored unencrypted.
+_key = None
+_aead = None
+
+def use_key(key):
+    """
+    Sets the key (bytes or hex string) used by every read/write helper.
+    """
+    global _key, _aead
+    if isinstance(key, str):
+        key = bytes.fromhex(key)
+    _key = key or None
+    _aead = None
+
+def _aead_for(key):
+    try:
+        from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+    except ImportError:
+        print("[X] Missing 'cryptography' library. Please install it with 'pip install cryptography'.")
+        sys.exit(1)
+    return AESGCM(key)
+
+def _cipher():
+    global _aead
+    if _aead is None:
+        _aead = _aead_for(_key)
+    return _aead
+
+# ---- Key derivation & header ------------------------------------------------
+
+def load_header():
+    import json
+    if not os.path.isfile(HEADER_FILE):
+        return None
+    with open(HEADER_FILE) as f:
+        return json.load(f)
+
+def save_header(header):
+    """
+    Replaces the header atomically: the new one is written and synced as
+    a staged copy first, then renamed over the old one.
+    """
+    import json
+    staged = HEADER_FILE + ".new"
+    with open(staged, "w") as f:
+        json.dump(header, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(staged, HEADER_FILE)
+    _sync_dir(SYSTEM_DIR)
+
+def _sync_dir(path):
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return    # e.g. Windows, where directories can't be opened
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+def staged_header():
+    """
+    Returns the header a crash left staged by save_header() (complete and
+    readable), or None.
+    """
+    import json
+    try:
+        with open(HEADER_FILE + ".new") as f:
+            header = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return header if isinstance(header, dict) and "kdf" in header else None
+
+def settle_staged(use):
+    """
+    Installs the staged header if use is True, otherwise drops it.
+    """
+    staged = HEADER_FILE + ".new"
+    if use:
+        os.replace(staged, HEADER_FILE)
+        _sync_dir(SYSTEM_DIR)
+    elif os.path.exists(staged):
+        os.remove(staged)
+
+def default_target_ms():
+    return TARGET_MS_TERMUX if "com.termux" in os.environ.get("PREFIX", "") else TARGET_MS_DESKTOP
+
+def _scrypt(passphrase, salt, n, r, p):
+    return hashlib.scrypt(passphrase, salt=salt, n=n, r=r, p=p, maxmem=256 * r * n + (1 << 20), dklen=32)
+
+def calibrate(target_ms=None):
+    """
+    Benchmarks scrypt on this host and returns {n, r, p, ms} whose unlock
+    time lands near target_ms. Memory (n) grows first, then parallelism (p).
+    """
+    target_ms = target_ms or default_target_ms()
+    n, p = SCRYPT_MIN_N, 1
+    salt = os.urandom(16)
+    while True:
+        start = time.perf_counter()
+        _scrypt(b"calibration", salt, n, SCRYPT_R, p)
+        ms = (time.perf_counter() - start) * 1000
+        if ms * 2 > target_ms * 1.4:
+            break
+        if n < SCRYPT_MAX_N:
+            n *= 2
+        else:
+            p += max(1, int(p * (target_ms / ms - 1)))
+            start = time.perf_counter()
+            _scrypt(b"calibration", salt, n, SCRYPT_R, p)
+            ms = (time.perf_counter() - start) * 1000
+            break
+    return {"n": n, "r": SCRYPT_R, "p": p, "ms": round(ms)}
+
+def new_header(params=None):
+    params = params or calibrate()
+    kdf = {"name": "scrypt", "salt": os.urandom(16).hex(), "n": params["n"], "r": params["r"], "p": params["p"]}
+    return {"version": 2, "kdf": kdf}
+
+def _wrap_aad(header):
+    import json
+    # Binds the wrapped key to the KDF settings it was wrapped under
+    return b"vaultpass-data-key" + json.dumps(header["kdf"], sort_keys=True).encode()
+
+def wrap_key(header, passphrase, data_key):
+    """
+    Returns a version 3 copy of header (KDF settings included) holding
+    data_key wrapped by the passphrase.
+    """
+    header = dict(header, version=3)
+    nonce = os.urandom(NONCE_SIZE)
+    wrapped = _aead_for(derive_key(passphrase, header)).encrypt(nonce, data_key, _wrap_aad(header))
+    header["wrapped"] = {"nonce": nonce.hex(), "key": wrapped.hex()}
+    header["check"] = key_check(data_key)
+    return header
+
+def open_header(passphrase, header):
+    """
+    Returns the vault key a header yields for passphrase, or None if the
+    passphrase is wrong. Headers from before envelope keys (no "wrapped")
+    use the derived key itself.
+    """
+    key = derive_key(passphrase, header)
+    if "wrapped" not in header:
+        return key if key_matches(key, header) else None
+    aead = _aead_for(key)
+    from cryptography.exceptions import InvalidTag
+    wrapped = header["wrapped"]
+    try:
+        return aead.decrypt(bytes.fromhex(wrapped["nonce"]), bytes.fromhex(wrapped["key"]), _wrap_aad(header))
+    except InvalidTag:
+        return None
+
+def derive_key(passphrase, header):
+    kdf = header["kdf"]
+    salt = bytes.fromhex(kdf["salt"])
+    with tracing.phase("kdf"):
+        if kdf["name"] == "pbkdf2_sha256":
+            return hashlib.pbkdf2_hmac("sha256", passphrase.encode(), salt, kdf["iterations"])
+        return _scrypt(passphrase.encode(), salt, kdf["n"], kdf["r"], kdf["p"])
+
+def key_check(key):
+    """
+    Returns a tag that proves a key is right without revealing it.
+    """
+    import hmac
+    return hmac.new(key, b"vaultpass-key-check", hashlib.sha256).hexdigest()
+
+def key_matches(key, header):
+    import hmac
+    return bool(header) and hmac.compare_digest(key_check(key), header.get("check", ""))
+
+def subkey(label):
+    """
+    Returns a key for `label` derived from the active vault key, or None
+    when the vault is unencrypted.
+    """
+    if _key is None:
+        return None
+    import hmac
+    return hmac.new(_key, label, hashlib.sha256).digest()
+
+# ---- Chunk primitives -----------------------------------------------------
+
+def _aad(index, last):
+    return FILE_HEADER.pack(MAGIC, CHUNK_SIZE) + struct.pack("<Q?", index, last)
+
+def _seal(index, data, last, aead=None):
+    with tracing.phase("encrypt"):
+        nonce = os.urandom(NONCE_SIZE)
+        return nonce + (aead or _cipher()).encrypt(nonce, data, _aad(index, last))
+
+def _open_chunk(index, blob, last, aead=None):
+    try:
+        with tracing.phase("decrypt"):
+            return (aead or _cipher()).decrypt(blob[:NONCE_SIZE], blob[NONCE_SIZE:], _aad(index, last))
+    except Exception:
+        raise ValueError(f"vault chunk {index} failed authentication (wrong key or corrupt file)")
+
+def _chunk_span():
+    return CHUNK_SIZE + NONCE_SIZE + TAG_SIZE
+
+def is_encrypted(path):
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except FileNotFoundError:
+        return False
+
+def _check_readable(path):
+    if is_encrypted(path) and _key is None:
+        raise ValueError("vault is encrypted but no key is unlocked")
+    return is_encrypted(path)
+
+def _chunk_count(path):
+    body = os.path.getsize(path) - FILE_HEADER.size
+    return (body + _chunk_span() - 1) // _chunk_span()
+
+def plain_size(path):
+    """
+    Returns the plaintext length of a vault file without decrypting it.
+    """
+    if not os.path.isfile(path):
+        return 0
+    if not is_encrypted(path):
+        return os.path.getsize(path)
+    body = os.path.getsize(path) - FILE_HEADER.size
+    full, rem = divmod(body, _chunk_span())
+    return full * CHUNK_SIZE + (rem - NONCE_SIZE - TAG_SIZE if rem else 0)
+
+def _read_chunk(f, index, count, aead=None):
+    with tracing.phase("read"):
+        f.seek(FILE_HEADER.size + index * _chunk_span())
+        blob = f.read(_chunk_span())
+    return _open_chunk(index, blob, index == count - 1, aead)
+
+# ---- Read/write helpers used by the vault -------------------------------------
+
+def iter_chunks(path):
+    """
+    Yields the plaintext of path in blocks of at most CHUNK_SIZE bytes.
+    """
+    if not os.path.isfile(path):
+        return
+    encrypted = _check_readable(path)
+    with open(path, "rb") as f:
+        if not encrypted:
+            yield from tracing.timed_iter("read", iter(lambda: f.read(CHUNK_SIZE), b""))
+            return
+        count = _chunk_count(path)
+        for index in range(count):
+            yield _read_chunk(f, index, count)
+
+def iter_lines(path):
+    """
+    Yields plaintext lines (bytes, newline included) of path.
+    """
+    carry = b""
+    for block in iter_chunks(path):
+        lines = (carry + block).split(b"\n")
+        carry = lines.pop()
+        for line in lines:
+            yield line + b"\n"
+    if carry:
+        yield carry
+
+def read_at(path, offset, length):
+    """
+    Returns `length` plaintext bytes starting at `offset`, decrypting only
+    the chunks that cover them.
+    """
+    encrypted = _check_readable(path)
+    with open(path, "rb") as f:
+        if not encrypted:
+            with tracing.phase("read"):
+                f.seek(offset)
+                return f.read(length)
+        count = _chunk_count(path)
+        first, last = offset // CHUNK_SIZE, (offset + length - 1) // CHUNK_SIZE
+        data = b"".join(_read_chunk(f, i, count) for i in range(first, min(last, count - 1) + 1))
+        start = offset - first * CHUNK_SIZE
+        return data[start:start + length]
+
+def read_many(path, spans):
+    """
+    Yields the plaintext of each (offset, length) span, which must be
+    sorted by offset. Chunks shared by neighbouring spans are decrypted
+    once, so reading many scattered records costs one pass at most.
+    """
+    encrypted = _check_readable(path)
+    with open(path, "rb") as f:
+        if not encrypted:
+            for offset, length in spans:
+                f.seek(offset)
+                yield f.read(length)
+            return
+        count, cache = _chunk_count(path), {}
+        for offset, length in spans:
+            first, last = offset // CHUNK_SIZE, (offset + length - 1) // CHUNK_SIZE
+            wanted = range(first, min(last, count - 1) + 1)
+            cache = {i: cache[i] if i in cache else _read_chunk(f, i, count) for i in wanted}
+            data = b"".join(cache[i] for i in wanted)
+            start = offset - first * CHUNK_SIZE
+            yield data[start:start + length]
+
+class Reader:
+    """
+    Random-access plaintext reads from one vault file, for lookups that
+    touch a few scattered records. A plain vault is memory-mapped, so a
+    read is a slice of the page cache; an encrypted one keeps the last few
+    chunks it decrypted. Use as a context manager.
+    """
+
+    CACHED_CHUNKS = 8
+
+    def __init__(self, path):
+        self._encrypted = _check_readable(path)
+        self._file = open(path, "rb")
+        self._map = None
+        self._chunks = {}
+        if self._encrypted:
+            self._count = _chunk_count(path)
+        elif os.path.getsize(path):
+            import mmap
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def read(self, offset, length):
+        if not self._encrypted:
+            return self._map[offset:offset + length] if self._map is not None else b""
+        first, last = offset // CHUNK_SIZE, (offset + length - 1) // CHUNK_SIZE
+        parts = []
+        for index in range(first, min(last, self._count - 1) + 1):
+            chunk = self._chunks.get(index)
+            if chunk is None:
+                if len(self._chunks) >= self.CACHED_CHUNKS:
+                    del self._chunks[next(iter(self._chunks))]
+                chunk = self._chunks[index] = _read_chunk(self._file, index, self._count)
+            parts.append(chunk)
+        start = offset - first * CHUNK_SIZE
+        return b"".join(parts)[start:start + length]
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+        self._file.close()
+        self._chunks = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def _write_chunks(f, blocks, index=0, pending=b""):
+    # Keeps at least one byte back so the final chunk can carry the last flag
+    parts, size = [pending], len(pending)
+    for block in blocks:
+        parts.append(block)
+        size += len(block)
+        if size > CHUNK_SIZE:
+            pending = b"".join(parts)
+            while len(pending) > CHUNK_SIZE:
+                f.write(_seal(index, pending[:CHUNK_SIZE], False))
+                pending = pending[CHUNK_SIZE:]
+                index += 1
+            parts, size = [pending], len(pending)
+    pending = b"".join(parts)
+    if pending:
+        f.write(_seal(index, pending, True))
+
+class _CrcWriter:
+    # Passes writes through to f, keeping a running crc32 of them
+    def __init__(self, f):
+        self.f, self.crc = f, 0
+
+    def write(self, data):
+        self.crc = zlib.crc32(data, self.crc)
+        self.f.write(data)
+
+def _apply_tail(path, pos, redo):
+    # Copies the body of an open redo file over path from pos, piece by piece
+    with tracing.phase("write"), open(path, "r+b") as f:
+        f.seek(pos)
+        redo.seek(REDO_HEADER.size)
+        while True:
+            piece = redo.read(COPY_SIZE)
+            if not piece:
+                break
+            f.write(piece)
+        f.truncate()
+        f.flush()
+        os.fsync(f.fileno())
+
+def _write_tail(path, pos, write_body):
+    # Overwriting the last chunk in place isn't atomic, so the new tail is
+    # made durable in path.redo first; finish_pending() replays it after a
+    # crash. write_body(f) streams the tail, so it never sits in memory.
+    redo = path + ".redo"
+    with tracing.phase("write"), open(redo, "w+b") as f:
+        f.write(REDO_HEADER.pack(REDO_MAGIC, pos, 0))
+        body = _CrcWriter(f)
+        write_body(body)
+        f.seek(0)
+        f.write(REDO_HEADER.pack(REDO_MAGIC, pos, body.crc))
+        f.flush()
+        os.fsync(f.fileno())
+        _apply_tail(path, pos, f)
+    os.remove(redo)
+
+def has_pending(path):
+    """
+    Returns True if a tail write to path was interrupted before it finished.
+    """
+    return os.path.exists(path + ".redo")
+
+def finish_pending(path):
+    """
+    Completes a tail write that a crash interrupted, or discards a redo
+    file that was itself torn. Returns True if path changed.
+    """
+    redo = path + ".redo"
+    if not os.path.exists(redo):
+        return False
+    applied = False
+    with open(redo, "rb") as f:
+        head = f.read(REDO_HEADER.size)
+        if len(head) == REDO_HEADER.size:
+            magic, pos, crc = REDO_HEADER.unpack(head)
+            body_crc = 0
+            for piece in iter(lambda: f.read(COPY_SIZE), b""):
+                body_crc = zlib.crc32(piece, body_crc)
+            if magic == REDO_MAGIC and body_crc == crc:
+                _apply_tail(path, pos, f)
+                applied = True
+    os.remove(redo)
+    return applied
+
+def append(path, blocks):
+    """
+    Appends plaintext blocks to path and returns the plaintext offset they
+    start at. Encrypted files only re-encrypt their last chunk.
+    """
+    blocks = iter(blocks)
+    plain_existing = os.path.isfile(path) and os.path.getsize(path) > 0 and not is_encrypted(path)
+    if _key is None or plain_existing:
+        with tracing.phase("write"), open(path, "ab") as f:
+            offset = f.tell()
+            for block in blocks:
+                f.write(block)
+            f.flush()
+            os.fsync(f.fileno())
+        return offset
+    if not os.path.isfile(path) or os.path.getsize(path) <= FILE_HEADER.size:
+        with open(path, "wb") as f:
+            f.write(FILE_HEADER.pack(MAGIC, CHUNK_SIZE))
+    offset = plain_size(path)
+    count = _chunk_count(path)
+    with open(path, "rb") as f:
+        tail = _read_chunk(f, count - 1, count) if count else b""
+    index = max(count - 1, 0)
+    _write_tail(path, FILE_HEADER.size + index * _chunk_span(), lambda f: _write_chunks(f, blocks, index, tail))
+    return offset
+
+def truncate(path, size):
+    """
+    Cuts path down to its first `size` plaintext bytes.
+    """
+    if not is_encrypted(path):
+        with open(path, "r+b") as f:
+            f.truncate(size)
+            f.flush()
+            os.fsync(f.fileno())
+        return
+    if size == 0:
+        _write_tail(path, FILE_HEADER.size, lambda f: None)
+        return
+    count = _chunk_count(path)
+    index = (size - 1) // CHUNK_SIZE
+    with open(path, "rb") as f:
+        data = _read_chunk(f, index, count)[:size - index * CHUNK_SIZE]
+    _write_tail(path, FILE_HEADER.size + index * _chunk_span(), lambda f: f.write(_seal(index, data, True)))
+
+def rewrite(path, blocks):
+    """
+    Atomically replaces path with the given plaintext blocks.
+    """
+    tmp = path + ".tmp"
+    with tracing.phase("write"), open(tmp, "wb") as f:
+        if _key is None:
+            for block in blocks:
+                f.write(block)
+        else:
+            f.write(FILE_HEADER.pack(MAGIC, CHUNK_SIZE))
+            _write_chunks(f, blocks)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+def can_decrypt(path, key):
+    """
+    Returns True if key opens the first chunk of path (or path holds no
+    encrypted data at all).
+    """
+    if not is_encrypted(path) or _chunk_count(path) == 0:
+        return True
+    with open(path, "rb") as f:
+        try:
+            _read_chunk(f, 0, _chunk_count(path), _aead_for(key))
+            return True
+        except ValueError:
+            return False
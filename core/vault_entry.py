@@ -0,0 +1,200 @@
+"""
+vault_entry.py -- Typed vault entries and their binary codec
+
+- Entry is a slotted record (id, user, password, info, created, modified)
+  instead of an `id:|user|pwd|info` string re-split wherever it is used
+- pack()/unpack() are the on-disk form: a fixed header holding the times
+  and the byte length of every field, then the fields back to back. Reading
+  an entry is one struct unpack, one decode and four slices, with no
+  separator to split on, so no field can spill into the next; unpack_id()
+  decodes the ID alone for scans that need nothing else
+- Any field survives a round trip: '|', ':', line breaks, even bytes that
+  are not valid UTF-8 (kept as surrogate escapes)
+- to_line()/parse_line() are the lossless text form shown to the user:
+  id:|user|password[|info] with '\\', '|' and control characters escaped
+- from_legacy() reads the unescaped lines written by older versions
+
+Binary layout (little-endian):
+
+    u32 created | u32 modified | u16 id | u16 user | u16 password | u32 info
+    | id bytes | user bytes | password bytes | info bytes
+"""
+
+import struct
+
+HEAD = struct.Struct("<IIHHHI")    # created, modified, then each field's byte length
+FIELD_MAX = 0xFFFF                 # id, user and password; info may be longer
+ENCODING = ("utf-8", "surrogateescape")
+
+_ESCAPES = {"\\": "\\\\", "|": "\\|", "\n": "\\n", "\r": "\\r", "\t": "\\t"}
+_UNESCAPES = {"n": "\n", "r": "\r", "t": "\t"}
+_escape_re = None
+_field_re = None
+
+class Entry:
+    __slots__ = ("id", "user", "password", "info", "created", "modified")
+
+    def __init__(self, id, user="", password="", info="", created=0, modified=0):
+        self.id = id
+        self.user = user
+        self.password = password
+        self.info = info
+        self.created = created
+        self.modified = modified
+
+    def __eq__(self, other):
+        if not isinstance(other, Entry):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def __repr__(self):
+        # Never shows the password, so entries are safe to log or print
+        return f"Entry(id={self.id!r}, user={self.user!r}, info={self.info!r})"
+
+    def to_line(self):
+        """
+        Returns the escaped id:|user|password[|info] text of the entry.
+        """
+        line = f"{escape(self.id)}:|{escape(self.user)}|{escape(self.password)}"
+        return f"{line}|{escape(self.info)}" if self.info else line
+
+def check(entry):
+    """
+    Raises ValueError naming the first of id, user or password that is
+    longer than FIELD_MAX bytes, so callers can refuse an entry before
+    anything is written.
+    """
+    for name, value in (("ID", entry.id), ("username", entry.user), ("password", entry.password)):
+        if len(value.encode(*ENCODING)) > FIELD_MAX:
+            owner = "" if name == "ID" else f" of '{escape(entry.id)}'"
+            raise ValueError(f"{name}{owner} is longer than {FIELD_MAX} bytes")
+
+def pack(entry):
+    """
+    Returns the binary form of an entry. Raises ValueError if the id, user
+    or password is longer than FIELD_MAX bytes.
+    """
+    id = entry.id.encode(*ENCODING)
+    user = entry.user.encode(*ENCODING)
+    password = entry.password.encode(*ENCODING)
+    info = entry.info.encode(*ENCODING)
+    if max(len(id), len(user), len(password)) > FIELD_MAX:
+        raise ValueError(f"entry '{entry.id}' has a field longer than {FIELD_MAX} bytes")
+    return b"".join((HEAD.pack(entry.created, entry.modified, len(id), len(user), len(password), len(info)),
+                     id, user, password, info))
+
+def unpack(buf):
+    """
+    Returns the Entry packed in buf. Raises ValueError if buf is not one
+    whole packed entry.
+    """
+    try:
+        created, modified, n_id, n_user, n_password, n_info = HEAD.unpack_from(buf)
+    except struct.error:
+        raise ValueError("entry header is truncated") from None
+    a = HEAD.size
+    b = a + n_id
+    c = b + n_user
+    d = c + n_password
+    if d + n_info != len(buf):
+        raise ValueError("entry length does not match its header")
+    text = buf.decode(*ENCODING)
+    if len(text) == len(buf):
+        return Entry(text[a:b], text[b:c], text[c:d], text[d:], created, modified)
+    # Multi-byte characters: byte offsets no longer index the decoded text
+    return Entry(buf[a:b].decode(*ENCODING), buf[b:c].decode(*ENCODING), buf[c:d].decode(*ENCODING),
+                 buf[d:].decode(*ENCODING), created, modified)
+
+def unpack_id(buf):
+    """
+    Returns only the ID of a packed entry, without decoding the other fields.
+    """
+    try:
+        n_id = HEAD.unpack_from(buf)[2]
+    except struct.error:
+        raise ValueError("entry header is truncated") from None
+    return buf[HEAD.size:HEAD.size + n_id].decode(*ENCODING)
+
+def escape(text):
+    """
+    Escapes '\\', '|', line breaks and other unprintable characters so text
+    fits on one line of the id:|user|password|info form. Bytes that were
+    not valid UTF-8 come out as \\xHH.
+    """
+    if text.isprintable() and "\\" not in text and "|" not in text:
+        return text
+    out = []
+    for ch in text:
+        code = ord(ch)
+        if ch in _ESCAPES:
+            out.append(_ESCAPES[ch])
+        elif 0xDC80 <= code <= 0xDCFF:
+            out.append(f"\\x{code - 0xDC00:02x}")    # an undecodable byte
+        elif ch.isprintable():
+            out.append(ch)
+        elif code < 0x80:
+            out.append(f"\\x{code:02x}")
+        elif code <= 0xFFFF:
+            out.append(f"\\u{code:04x}")
+        else:
+            out.append(f"\\U{code:08x}")
+    return "".join(out)
+
+def _unescape_one(match):
+    seq = match.group(1)
+    if len(seq) == 1:
+        return _UNESCAPES.get(seq, seq)
+    code = int(seq[1:], 16)
+    if seq[0] == "x" and code >= 0x80:
+        return chr(0xDC00 + code)
+    return chr(code)
+
+def unescape(text):
+    """
+    Reverses escape().
+    """
+    global _escape_re
+    if "\\" not in text:
+        return text
+    if _escape_re is None:
+        import re
+        _escape_re = re.compile(r"\\(x[0-9a-f]{2}|u[0-9a-f]{4}|U[0-9a-f]{8}|.)", re.S)
+    return _escape_re.sub(_unescape_one, text)
+
+def parse_line(line):
+    """
+    Returns the Entry for an escaped id:|user|password[|info] line, the
+    inverse of Entry.to_line(). Raises ValueError if the line has no ':|'.
+    """
+    global _field_re
+    if _field_re is None:
+        import re
+        _field_re = re.compile(r"(?:\\.|[^\\|])*", re.S)
+    fields, pos = [], 0
+    while True:
+        match = _field_re.match(line, pos)
+        fields.append(match.group())
+        if match.end() < len(line) and line[match.end()] != "|":
+            raise ValueError("line ends in a lone '\\'")
+        pos = match.end() + 1
+        if pos > len(line):
+            break
+    if len(fields) < 2 or not fields[0].endswith(":") or len(fields) > 4:
+        raise ValueError("expected id:|user|password[|info]")
+    fields[0] = fields[0][:-1]
+    return Entry(*(unescape(field) for field in fields + [""] * (4 - len(fields))))
+
+def from_legacy(line):
+    """
+    Returns the Entry for an unescaped line written by an older version.
+    User and info never held '|' there, so any extra '|' belongs to the
+    password.
+    """
+    line = line.rstrip("\n")
+    entry_id, sep, rest = line.partition(":|")
+    if not sep:
+        entry_id, _, rest = line.partition(":")
+    parts = rest.split("|")
+    if len(parts) >= 3:
+        return Entry(entry_id, parts[0], "|".join(parts[1:-1]), parts[-1])
+    return Entry(entry_id, parts[0], parts[1] if len(parts) > 1 else "")
@@ -0,0 +1,340 @@
+"""
+vault_ids.py -- Compact ID-only index behind shell completion
+
+- passwords.ids holds every live entry ID once, sorted, in blocks of about
+  BLOCK_BYTES, plus a directory of each block's first ID: a prefix lookup
+  reads the directory and the one or two blocks the prefix falls in
+- Every journal batch appends the IDs it deleted and added to
+  passwords.idd, so writes never rescan the vault; once the log outgrows
+  LOG_MAX it is merged back into a fresh passwords.ids
+- Kept only once `vaultpass completion` created it. A writer that finds it
+  out of step with the vault (restore, compaction, older versions)
+  rebuilds it; completion itself only ever reads
+- With an encrypted vault the directory, the blocks and the log records
+  are sealed with AES-GCM under a key derived from the vault key, so the
+  files hold no plaintext IDs; completion opens them with the key of a
+  running agent
+
+Layout: a 68-byte header, the sealed blocks (u16 length + ID, repeated),
+then the sealed directory: block count, then arrays of block positions,
+block sizes and first-ID end offsets, then the first IDs themselves. The
+header records the vault inode, the plaintext length covered and a keyed
+digest of the bytes just before it, like vault_order. Log records are a
+u32 size and a sealed (generation, vault length, ops) payload.
+"""
+
+import os
+import sys
+import heapq
+import struct
+import hashlib
+from array import array
+from bisect import bisect_right
+import vault_crypto
+import vault_entry
+import vault_journal
+import vault_lock
+
+HOME = os.path.expanduser("~")
+SYSTEM_DIR = os.path.join(HOME, ".vaultpass", "system")
+PASS_FILE = os.path.join(SYSTEM_DIR, "passwords.gpg")
+IDS_FILE = os.path.join(SYSTEM_DIR, "passwords.ids")
+LOG_FILE = os.path.join(SYSTEM_DIR, "passwords.idd")
+
+MAGIC = b"VPIDS001"
+HEADER = struct.Struct("<8s8sQQQ16sQI")  # magic, generation, vault inode, plaintext end, IDs, tail digest,
+                                         # directory position, directory size
+LOG_HEAD = struct.Struct("<8sQ")         # generation, vault plaintext length after the batch
+OP = struct.Struct("<cH")                # op, ID length
+ID_LEN = struct.Struct("<H")
+ADD = b"+"
+DEL = b"-"
+BLOCK_BYTES = 16 * 1024
+LOG_MAX = 64 * 1024
+TAIL_CHECK = 32
+NONCE_SIZE = 12
+COMPLETE_MAX = 1000
+
+# ---- Sealing ----------------------------------------------------------------
+
+def _aead():
+    key = vault_crypto.subkey(b"vaultpass-ids")
+    if key is None:
+        return None
+    from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+    return AESGCM(key)
+
+def _seal(aead, data, aad):
+    if aead is None:
+        return data
+    nonce = os.urandom(NONCE_SIZE)
+    return nonce + aead.encrypt(nonce, data, aad)
+
+def _unseal(aead, blob, aad):
+    # Raises ValueError if blob was sealed under another key or altered
+    if aead is None:
+        return blob
+    from cryptography.exceptions import InvalidTag
+    try:
+        return aead.decrypt(blob[:NONCE_SIZE], blob[NONCE_SIZE:], aad)
+    except InvalidTag:
+        raise ValueError("ID index is sealed under another key") from None
+
+def _tail_digest(end):
+    keep = min(TAIL_CHECK, end)
+    tail = vault_crypto.read_at(PASS_FILE, end - keep, keep) if keep else b""
+    return hashlib.blake2b(tail, key=vault_crypto.subkey(b"vaultpass-ids") or b"", digest_size=16).digest()
+
+# ---- Reading ----------------------------------------------------------------
+
+def _read_header(f):
+    raw = f.read(HEADER.size)
+    if len(raw) != HEADER.size:
+        return None
+    header = HEADER.unpack(raw)
+    return header if header[0] == MAGIC else None
+
+class _Firsts:
+    # The directory's first IDs, decoded only as bisect touches them
+    def __init__(self, names, ends):
+        self.names, self.ends = names, ends
+
+    def __len__(self):
+        return len(self.ends)
+
+    def __getitem__(self, index):
+        start = self.ends[index - 1] if index else 0
+        return self.names[start:self.ends[index]].decode(*vault_entry.ENCODING)
+
+def _read_directory(f, aead, header):
+    """
+    Returns (first ID of each block, [(position, size) of each block]).
+    """
+    generation, dir_pos, dir_size = header[1], header[6], header[7]
+    f.seek(dir_pos)
+    raw = _unseal(aead, f.read(dir_size), generation + b"directory")
+    count = struct.unpack_from("<I", raw)[0]
+    positions = array("Q", raw[4:4 + 8 * count])
+    sizes = array("I", raw[4 + 8 * count:4 + 12 * count])
+    ends = array("I", raw[4 + 12 * count:4 + 16 * count])
+    if sys.byteorder == "big":
+        for column in (positions, sizes, ends):
+            column.byteswap()
+    return _Firsts(raw[4 + 16 * count:], ends), list(zip(positions, sizes))
+
+def _read_block(f, aead, generation, index, span):
+    f.seek(span[0])
+    raw = _unseal(aead, f.read(span[1]), generation + struct.pack("<Q", index))
+    ids, pos = [], 0
+    while pos < len(raw):
+        n = ID_LEN.unpack_from(raw, pos)[0]
+        ids.append(raw[pos + 2:pos + 2 + n].decode(*vault_entry.ENCODING))
+        pos += 2 + n
+    return ids
+
+def _iter_all(f, aead, header):
+    firsts, spans = _read_directory(f, aead, header)
+    for index, span in enumerate(spans):
+        yield from _read_block(f, aead, header[1], index, span)
+
+def _read_log(aead, generation):
+    """
+    Returns ([(op, ID)] in order, vault length after the last batch or None,
+    bytes of whole records). A torn last record or records left over from
+    an older index end the log.
+    """
+    try:
+        with open(LOG_FILE, "rb") as f:
+            data = f.read()
+    except FileNotFoundError:
+        return [], None, 0
+    ops, end, pos = [], None, 0
+    while pos + 4 <= len(data):
+        size = struct.unpack_from("<I", data, pos)[0]
+        blob = data[pos + 4:pos + 4 + size]
+        if len(blob) != size:
+            break
+        try:
+            raw = _unseal(aead, blob, b"vaultpass-ids-log")
+            record_generation, batch_end = LOG_HEAD.unpack_from(raw)
+            if record_generation != generation:
+                break
+            batch, at = [], LOG_HEAD.size
+            while at < len(raw):
+                op, n = OP.unpack_from(raw, at)
+                batch.append((op, raw[at + OP.size:at + OP.size + n].decode(*vault_entry.ENCODING)))
+                at += OP.size + n
+        except (ValueError, struct.error):
+            break
+        ops.extend(batch)
+        end = batch_end
+        pos += 4 + size
+    return ops, end, pos
+
+def complete(prefix, limit=COMPLETE_MAX):
+    """
+    Returns up to limit live IDs starting with prefix, sorted. Reads the
+    directory, the blocks the prefix falls in and the log, never the vault.
+    Returns [] if no index is kept or the current key doesn't open it.
+    """
+    aead = _aead()
+    try:
+        with open(IDS_FILE, "rb") as f:
+            header = _read_header(f)
+            if header is None:
+                return []
+            firsts, spans = _read_directory(f, aead, header)
+            state = {}
+            for op, entry_id in _read_log(aead, header[1])[0]:
+                if entry_id.startswith(prefix):
+                    state[entry_id] = op == ADD
+            found = []
+            for index in range(max(bisect_right(firsts, prefix) - 1, 0), len(firsts)):
+                if firsts[index] > prefix and not firsts[index].startswith(prefix):
+                    break
+                for entry_id in _read_block(f, aead, header[1], index, spans[index]):
+                    if entry_id.startswith(prefix):
+                        if state.get(entry_id, True):
+                            found.append(entry_id)
+                    elif entry_id > prefix:
+                        break
+                if len(found) >= limit:
+                    break
+    except (FileNotFoundError, ValueError, struct.error):
+        return []
+    added = [entry_id for entry_id, live in state.items() if live]
+    return sorted(set(found[:limit]).union(added))[:limit]
+
+# ---- Writing ----------------------------------------------------------------
+
+def _write(ids, end):
+    # ids: sorted and unique. The log belongs to the index it was written
+    # against, so it goes once the new index is in place.
+    aead = _aead()
+    generation = os.urandom(8)
+    positions, sizes, ends, firsts = array("Q"), array("I"), array("I"), []
+    count = 0
+    tmp = IDS_FILE + ".tmp"
+    with open(tmp, "wb") as f:
+        f.seek(HEADER.size)
+        block, size = [], 0
+
+        def flush():
+            blob = _seal(aead, b"".join(ID_LEN.pack(len(raw)) + raw for raw in block),
+                         generation + struct.pack("<Q", len(positions)))
+            positions.append(f.tell())
+            sizes.append(len(blob))
+            ends.append((ends[-1] if ends else 0) + len(block[0]))
+            firsts.append(block[0])
+            f.write(blob)
+
+        for entry_id in ids:
+            raw = entry_id.encode(*vault_entry.ENCODING)
+            block.append(raw)
+            size += ID_LEN.size + len(raw)
+            count += 1
+            if size >= BLOCK_BYTES:
+                flush()
+                block, size = [], 0
+        if block:
+            flush()
+        if sys.byteorder == "big":
+            for column in (positions, sizes, ends):
+                column.byteswap()
+        directory = [struct.pack("<I", len(positions)), positions.tobytes(), sizes.tobytes(), ends.tobytes()]
+        dir_blob = _seal(aead, b"".join(directory + firsts), generation + b"directory")
+        dir_pos = f.tell()
+        f.write(dir_blob)
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, generation, os.stat(PASS_FILE).st_ino, end, count,
+                            _tail_digest(end), dir_pos, len(dir_blob)))
+    os.replace(tmp, IDS_FILE)
+    if os.path.exists(LOG_FILE):
+        os.remove(LOG_FILE)
+
+def rebuild():
+    """
+    Replays the vault's IDs once and rewrites the index from scratch.
+    Call with the vault locked.
+    """
+    live = {}
+    if os.path.isfile(PASS_FILE):
+        for _, _, op, payload in vault_journal.iter_records(PASS_FILE, ids_only=True):
+            if op == vault_journal.DEL:
+                live.pop(payload, None)
+            else:
+                live[payload] = None
+    else:
+        os.makedirs(SYSTEM_DIR, exist_ok=True)
+        open(PASS_FILE, "a").close()
+    with vault_lock.exclusive(vault_lock.INDEX_LOCK):
+        _write(sorted(live), vault_crypto.plain_size(PASS_FILE))
+
+def is_kept():
+    return os.path.isfile(IDS_FILE)
+
+def refresh():
+    """
+    Rebuilds the index if one is kept, after the vault was rewritten.
+    """
+    if is_kept():
+        rebuild()
+
+def _covered(header, aead):
+    # (log ops, whole log bytes) if the index is in step with the vault up
+    # to some length, with that length; None if it no longer describes it
+    if header is None or header[2] != os.stat(PASS_FILE).st_ino:
+        return None
+    size = vault_crypto.plain_size(PASS_FILE)
+    if header[3] > size or _tail_digest(header[3]) != header[5]:
+        return None
+    ops, end, valid = _read_log(aead, header[1])
+    return ops, valid, header[3] if end is None else end
+
+def _merge(f, aead, header, ops):
+    # The indexed IDs with the log applied, sorted and unique
+    state = {}
+    for op, entry_id in ops:
+        state[entry_id] = op == ADD
+    kept = (entry_id for entry_id in _iter_all(f, aead, header) if state.get(entry_id, True))
+    added = sorted(entry_id for entry_id, live in state.items() if live)
+    last = None
+    for entry_id in heapq.merge(kept, added):
+        if entry_id != last:
+            yield entry_id
+            last = entry_id
+
+def update(start, added, deleted):
+    """
+    Records one journal batch -- the IDs it deleted, then the IDs it added
+    -- that took the vault from plaintext length start to its current
+    length. Costs O(batch) until the log needs merging. Does nothing
+    unless an index is kept. Call with the vault locked exclusively.
+    """
+    if not is_kept():
+        return
+    aead = _aead()
+    with open(IDS_FILE, "rb") as f:
+        header = _read_header(f)
+        try:
+            covered = _covered(header, aead)
+        except ValueError:
+            covered = None
+        if covered is None or covered[2] != start:
+            f.close()
+            rebuild()
+            return
+        ops, valid, _ = covered
+        batch = [(DEL, entry_id) for entry_id in deleted] + [(ADD, entry_id) for entry_id in added]
+        end = vault_crypto.plain_size(PASS_FILE)
+        body = b"".join(OP.pack(op, len(raw)) + raw
+                        for op, raw in ((op, entry_id.encode(*vault_entry.ENCODING)) for op, entry_id in batch))
+        if valid + 4 + LOG_HEAD.size + len(body) > LOG_MAX:
+            with vault_lock.exclusive(vault_lock.INDEX_LOCK):
+                _write(_merge(f, aead, header, ops + batch), end)
+            return
+    record = _seal(aead, LOG_HEAD.pack(header[1], end) + body, b"vaultpass-ids-log")
+    with open(LOG_FILE, "r+b" if os.path.exists(LOG_FILE) else "wb") as log:
+        log.truncate(valid)    # drops a record torn by a crash
+        log.seek(valid)
+        log.write(struct.pack("<I", len(record)) + record)
@@ -0,0 +1,337 @@
+"""
+vault_index.py -- Persistent ID index for the password vault
+
+- Keeps an on-disk hash table next to passwords.gpg (passwords.idx)
+- Maps every entry ID to the offset/length of its record(s)
+- Lookups probe a handful of fixed-size slots instead of scanning the vault;
+  the table is memory-mapped, so a probe is a slice, not a seek and read
+- Rebuilds itself from the vault whenever the vault changed behind its back,
+  one process at a time under vault_lock.INDEX_LOCK
+
+Offsets are plaintext offsets of vault_journal put records; vault_crypto
+maps them onto encrypted chunks. Only live records are indexed: a delete
+record tombstones the slots of the entries it drops.
+
+Index layout: a 56-byte header followed by `capacity` 20-byte slots.
+Each slot holds a 64-bit ID hash, the record offset and the record length.
+The header also counts every put/delete record in the journal, so callers
+can tell how much of the vault is dead. ID hashes are keyed by a subkey of
+the vault key, and the header carries a tag of that subkey: an index
+hashed under another key is stale and rebuilt.
+"""
+
+import os
+import mmap
+import array
+import struct
+import hashlib
+import tracing
+import vault_crypto
+import vault_entry
+import vault_journal
+import vault_lock
+
+HOME = os.path.expanduser("~")
+SYSTEM_DIR = os.path.join(HOME, ".vaultpass", "system")
+PASS_FILE = os.path.join(SYSTEM_DIR, "passwords.gpg")
+INDEX_FILE = os.path.join(SYSTEM_DIR, "passwords.idx")
+
+MAGIC = b"VPIDX003"
+HEADER = struct.Struct("<8sQQQQQ8s")  # magic, capacity, live count, records, vault size, vault mtime_ns, key tag
+SLOT = struct.Struct("<QQI")        # id hash, offset, length
+EMPTY = 0
+TOMBSTONE = 1
+MIN_CAPACITY = 1024
+
+def _hasher():
+    # Keyed by the vault key, so the index file can't be used to test
+    # guessed IDs offline
+    base = hashlib.blake2b(key=vault_crypto.subkey(b"vaultpass-index") or b"", digest_size=8)
+    def h(entry_id):
+        digest = base.copy()
+        digest.update(entry_id.encode(*vault_entry.ENCODING))
+        # Top bit set so a real hash never collides with EMPTY/TOMBSTONE
+        return int.from_bytes(digest.digest(), "little") | (1 << 63)
+    return h
+
+def _key_tag():
+    key = vault_crypto.subkey(b"vaultpass-index") or b""
+    return hashlib.blake2b(b"vaultpass-index-tag", key=key, digest_size=8).digest()
+
+def _vault_stamp():
+    st = os.stat(PASS_FILE)
+    return st.st_size, st.st_mtime_ns
+
+def _build_table(records, capacity):
+    table = bytearray(capacity * SLOT.size)
+    mask = capacity - 1
+    for h, offset, length in records:
+        slot = h & mask
+        while struct.unpack_from("<Q", table, slot * SLOT.size)[0] not in (EMPTY, TOMBSTONE):
+            slot = (slot + 1) & mask
+        SLOT.pack_into(table, slot * SLOT.size, h, offset, length)
+    return table
+
+def _capacity_for(count):
+    capacity = MIN_CAPACITY
+    while capacity < count * 2:
+        capacity *= 2
+    return capacity
+
+def _write_index(records, total):
+    capacity = _capacity_for(len(records))
+    size, mtime_ns = _vault_stamp()
+    tmp = INDEX_FILE + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(HEADER.pack(MAGIC, capacity, len(records), total, size, mtime_ns, _key_tag()))
+        f.write(_build_table(records, capacity))
+    os.replace(tmp, INDEX_FILE)
+
+def _scan_vault():
+    # Replays the journal: a delete drops every earlier entry of its ID
+    live, total = {}, 0
+    for offset, length, op, payload in vault_journal.iter_records(PASS_FILE, ids_only=True):
+        total += 1
+        if op == vault_journal.DEL:
+            live.pop(payload, None)
+        else:
+            live.setdefault(payload, []).append((offset, length))
+    h = _hasher()
+    records = [(h(entry_id), offset, length)
+               for entry_id, spans in live.items() for offset, length in spans]
+    return records, total
+
+def rebuild():
+    """
+    Scans the vault once and rewrites the index from scratch.
+    """
+    if not os.path.isfile(PASS_FILE):
+        if os.path.exists(INDEX_FILE):
+            os.remove(INDEX_FILE)
+        return
+    _write_index(*_scan_vault())
+
+def _mapped(f, write=False):
+    return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_WRITE if write else mmap.ACCESS_READ)
+
+def _read_header(buf):
+    if len(buf) < HEADER.size:
+        return None
+    magic, capacity, count, total, size, mtime_ns, tag = HEADER.unpack_from(buf)
+    if magic != MAGIC:
+        return None
+    return capacity, count, total, size, mtime_ns, tag
+
+def _is_fresh():
+    try:
+        with open(INDEX_FILE, "rb") as f:
+            header = _read_header(f.read(HEADER.size))
+    except FileNotFoundError:
+        return False
+    return header is not None and (header[3], header[4]) == _vault_stamp() and header[5] == _key_tag()
+
+def _ensure_fresh():
+    """
+    Rebuilds the index if it is missing, corrupt, older than the vault or
+    hashed under another key.
+    Readers that find it stale together rebuild it once, not once each.
+    """
+    if _is_fresh():
+        return
+    with vault_lock.exclusive(vault_lock.INDEX_LOCK):
+        if not _is_fresh():
+            with tracing.phase("index_rebuild"):
+                rebuild()
+
+def _probe(table, capacity, h):
+    """
+    Yields (slot number, offset, length) for every slot of the mapped
+    index holding hash h.
+    """
+    mask = capacity - 1
+    slot = h & mask
+    for _ in range(capacity):
+        slot_hash, offset, length = SLOT.unpack_from(table, HEADER.size + slot * SLOT.size)
+        if slot_hash == EMPTY:
+            return
+        if slot_hash == h:
+            yield slot, offset, length
+        slot = (slot + 1) & mask
+
+def find(entry_id):
+    """
+    Returns the Entries stored under entry_id.
+    """
+    return find_many([entry_id])[entry_id]
+
+def find_many(entry_ids):
+    """
+    Looks up several IDs with a single open of the index and one pass over
+    the vault, in offset order, so each encrypted chunk is decrypted once.
+    Returns {id: [Entry]} in the order the IDs were given.
+    """
+    result = {entry_id: [] for entry_id in entry_ids}
+    if not result or not os.path.isfile(PASS_FILE):
+        return result
+    _ensure_fresh()
+    with tracing.phase("index"), open(INDEX_FILE, "rb") as f, _mapped(f) as table:
+        capacity, h = _read_header(table)[0], _hasher()
+        spans = {(offset, length) for entry_id in result
+                 for _, offset, length in _probe(table, capacity, h(entry_id))}
+    for _, entry in read_entries(spans):
+        # 64-bit hashes can collide; the record itself is authoritative
+        if entry.id in result:
+            result[entry.id].append(entry)
+    return result
+
+def contains(entry_id):
+    return bool(find(entry_id))
+
+def _read_entry(offset, length):
+    record = vault_journal.decode(vault_crypto.read_at(PASS_FILE, offset, length))
+    if record is None or record[0] != vault_journal.PUT:
+        return None
+    return record[1]
+
+def stats():
+    """
+    Returns (live entries, put/delete records in the journal).
+    """
+    if not os.path.isfile(PASS_FILE):
+        return 0, 0
+    _ensure_fresh()
+    with open(INDEX_FILE, "rb") as f:
+        _, count, total, _, _, _ = _read_header(f.read(HEADER.size))
+    return count, total
+
+def live_offsets():
+    """
+    Returns the set of journal offsets holding live entries.
+    """
+    if not os.path.isfile(PASS_FILE):
+        return set()
+    _ensure_fresh()
+    with open(INDEX_FILE, "rb") as f, _mapped(f) as table:
+        capacity = _read_header(table)[0]
+        slots = SLOT.iter_unpack(table[HEADER.size:HEADER.size + capacity * SLOT.size])
+        return {offset for slot_hash, offset, _ in slots if slot_hash not in (EMPTY, TOMBSTONE)}
+
+def iter_live(lengths=False):
+    """
+    Yields (offset, Entry) for every live vault entry, in journal order --
+    which is also the order they were last modified in. With lengths=True
+    each tuple also carries the record length.
+    """
+    if not os.path.isfile(PASS_FILE):
+        return
+    # Only a vault with deletes needs the live set from the index
+    live, total = stats()
+    offsets = live_offsets() if live != total else None
+    for offset, length, op, payload in vault_journal.iter_records(PASS_FILE):
+        if offsets is None or offset in offsets:
+            yield (offset, payload, length) if lengths else (offset, payload)
+
+def read_entries(spans):
+    """
+    Yields (offset, Entry) for each (offset, length) record span, in
+    offset order, decrypting each vault chunk only once.
+    """
+    spans = sorted(spans)
+    for (offset, _), raw in zip(spans, vault_crypto.read_many(PASS_FILE, spans)):
+        record = vault_journal.decode(raw)
+        if record is not None and record[0] == vault_journal.PUT:
+            yield offset, record[1]
+
+def _created_times(table, capacity, entry_ids):
+    # Creation times that survive an edit or overwrite of these IDs
+    created, h = {}, _hasher()
+    for entry_id in entry_ids:
+        for _, offset, length in _probe(table, capacity, h(entry_id)):
+            entry = _read_entry(offset, length)
+            if entry is not None and entry.id == entry_id and entry.created:
+                created[entry_id] = min(created.get(entry_id, entry.created), entry.created)
+    return created
+
+def append_entry(entry):
+    """
+    Appends an Entry and records its position in the index.
+    """
+    append_entries([entry])
+
+def append_entries(entries, deleted=()):
+    """
+    Appends one journal batch -- deletes for the IDs in `deleted`, then the
+    given Entries -- with a single durable write, and updates the index to
+    match. Costs O(batch) whatever the vault size.
+    Returns ([(offset, ID)] added, [(offset, ID)] dropped) so derived
+    indexes can follow along; they re-read the records they need, so a
+    big batch is never held in memory whole.
+    """
+    os.makedirs(SYSTEM_DIR, exist_ok=True)
+    if not os.path.isfile(PASS_FILE):
+        open(PASS_FILE, "a").close()
+    _ensure_fresh()
+    deleted = list(deleted)
+    created = {}
+    if deleted:
+        with open(INDEX_FILE, "rb") as f, _mapped(f) as table:
+            created = _created_times(table, _read_header(table)[0], deleted)
+    start = vault_crypto.plain_size(PASS_FILE)
+    new, added = array.array("Q"), []
+    h = _hasher()
+
+    def blocks():
+        offset = start
+        if start == 0:
+            yield vault_journal.MAGIC
+            offset += len(vault_journal.MAGIC)
+        for record in vault_journal.batch(entries, deleted, created):
+            op, entry = vault_journal.decode(record)
+            if op == vault_journal.PUT:
+                new.extend((h(entry.id), offset, len(record)))
+                added.append((offset, entry.id))
+            offset += len(record)
+            yield record
+
+    vault_crypto.append(PASS_FILE, blocks())
+    return added, _apply(new, deleted)
+
+def _remove(table, capacity, entry_ids):
+    removed = []
+    h = _hasher()
+    for entry_id in entry_ids:
+        for slot, offset, length in list(_probe(table, capacity, h(entry_id))):
+            entry = _read_entry(offset, length)
+            if entry is not None and entry.id == entry_id:
+                SLOT.pack_into(table, HEADER.size + slot * SLOT.size, TOMBSTONE, 0, 0)
+                removed.append((offset, entry_id))
+    return removed
+
+def _apply(new_records, deleted):
+    # new_records is a flat array of (hash, offset, length) triples. Runs
+    # after the journal write; the vault stamp goes into the header last,
+    # so a crash in between just means a rebuild on the next lookup
+    added = len(new_records) // 3
+    new_records = zip(*[iter(new_records)] * 3)
+    with tracing.phase("index"), open(INDEX_FILE, "r+b") as f, _mapped(f, write=True) as table:
+        capacity, count, total, _, _, tag = _read_header(table)
+        removed = _remove(table, capacity, deleted)
+        count -= len(removed)
+        total += len(deleted) + added
+        grow = (count + added) * 2 > capacity
+        if grow:
+            slots = SLOT.iter_unpack(table[HEADER.size:HEADER.size + capacity * SLOT.size])
+            records = [slot for slot in slots if slot[0] not in (EMPTY, TOMBSTONE)]
+        else:
+            mask = capacity - 1
+            for h, offset, length in new_records:
+                slot = h & mask
+                while struct.unpack_from("<Q", table, HEADER.size + slot * SLOT.size)[0] not in (EMPTY, TOMBSTONE):
+                    slot = (slot + 1) & mask
+                SLOT.pack_into(table, HEADER.size + slot * SLOT.size, h, offset, length)
+            size, mtime_ns = _vault_stamp()
+            HEADER.pack_into(table, 0, MAGIC, capacity, count + added, total, size, mtime_ns, tag)
+    if grow:
+        # Rewritten once the old table is unmapped and closed
+        _write_index(records + list(new_records), total)
+    return removed
@@ -0,0 +1,266 @@
+"""
+vault_journal.py -- Append-only record log behind passwords.gpg
+
+- Every mutation is appended as a batch of checksummed records, then fsynced
+- A batch only counts once its commit record is on disk; recover() cuts a
+  torn or uncommitted tail off after a crash
+- Edits and deletes append a delete record instead of rewriting the vault,
+  so they cost O(record); compact() drops dead records once they pile up
+- Vaults written before the journal are converted on first open
+
+Log layout (plaintext; vault_crypto encrypts it like any other vault):
+
+    VPJOURNAL1
+    E <crc32> <packed entry>   put: adds an entry for its ID
+    T <crc32> <created> <modified> <entry line>
+                               put from older versions, as id:|user|pwd|info
+    P <crc32> <entry line>     put without timestamps (older still)
+    D <crc32> <id>             delete: drops every earlier entry for the ID
+    C <crc32> <n>              commit: closes a batch of n records
+
+The crc32 covers the op letter and the payload as stored. A packed entry
+(see vault_entry) is binary and an ID may hold any character, so in E and
+D records ESC bytes are written as ESC '1' and newlines as ESC '2',
+keeping records one per line. Every put decodes to a vault_entry.Entry.
+"""
+
+import time
+import zlib
+import tracing
+import vault_crypto
+import vault_entry
+
+MAGIC = b"VPJOURNAL1\n"
+PUT = b"P"
+TIMED_PUT = b"T"
+ENTRY = b"E"
+DEL = b"D"
+COMMIT = b"C"
+PREFIX = 11    # op, space, 8 hex digits, space
+ESC = b"\x1b"
+
+def encode(op, payload):
+    """
+    Returns one record (bytes, newline included).
+    """
+    body = payload.encode() if isinstance(payload, str) else payload
+    return b"%s %08x %s\n" % (op, zlib.crc32(op + body), body)
+
+def _stuff(data):
+    return data.replace(ESC, ESC + b"1").replace(b"\n", ESC + b"2")
+
+def _unstuff(body):
+    if ESC not in body:
+        return body
+    return body.replace(ESC + b"2", b"\n").replace(ESC + b"1", ESC)
+
+def encode_entry(entry):
+    """
+    Returns the put record of an Entry.
+    """
+    return encode(ENTRY, _stuff(vault_entry.pack(entry)))
+
+def encode_delete(entry_id):
+    """
+    Returns the delete record of an ID.
+    """
+    return encode(DEL, _stuff(entry_id.encode(*vault_entry.ENCODING)))
+
+def decode(raw, ids_only=False):
+    """
+    Returns (op, payload) for a well-formed record, or None if it is torn
+    or fails its checksum. Every put comes back as PUT with an Entry as
+    payload (timestamps are 0 for records that have none), or just its ID
+    with ids_only=True; deletes and commits carry the ID or count as a
+    string.
+    """
+    if len(raw) < PREFIX + 1 or raw[-1:] != b"\n" or raw[1:2] != b" " or raw[10:11] != b" ":
+        return None
+    op, body = raw[:1], raw[PREFIX:-1]
+    try:
+        crc = int(raw[2:10], 16)
+    except ValueError:
+        return None
+    if op not in (ENTRY, PUT, TIMED_PUT, DEL, COMMIT) or zlib.crc32(op + body) != crc:
+        return None
+    if op == ENTRY:
+        try:
+            body = _unstuff(body)
+            return PUT, vault_entry.unpack_id(body) if ids_only else vault_entry.unpack(body)
+        except ValueError:
+            return None
+    if op == DEL:
+        return DEL, _unstuff(body).decode(*vault_entry.ENCODING)
+    created = modified = 0
+    if op == TIMED_PUT:
+        parts = body.split(b" ", 2)
+        if len(parts) != 3 or not parts[0].isdigit() or not parts[1].isdigit():
+            return None
+        op, created, modified, body = PUT, int(parts[0]), int(parts[1]), parts[2]
+    try:
+        payload = body.decode()
+    except UnicodeDecodeError:
+        return None
+    if op == PUT:
+        entry = vault_entry.from_legacy(payload)
+        if ids_only:
+            return PUT, entry.id
+        entry.created, entry.modified = created, modified
+        return PUT, entry
+    return op, payload
+
+def batch(entries, deleted=(), created=None):
+    """
+    Yields the records of one batch: deletes first, then puts, then the
+    commit record. Entries are stamped in place with the current time;
+    `created` maps entry IDs to the creation time they keep (an edit or
+    overwrite of an existing entry).
+    """
+    now = int(time.time())
+    created = created or {}
+    n = 0
+    for entry_id in deleted:
+        n += 1
+        yield encode_delete(entry_id)
+    for entry in entries:
+        n += 1
+        entry.created = created.get(entry.id, now)
+        entry.modified = now
+        yield encode_entry(entry)
+    yield encode(COMMIT, str(n))
+
+def _iter_raw(path, ids_only=False):
+    # Yields (offset, raw record, decoded record) for puts and deletes
+    offset, pending = 0, 0
+    for raw in vault_crypto.iter_lines(path):
+        if offset == 0:
+            if raw != MAGIC:
+                raise ValueError("vault is not in journal format")
+            offset = len(raw)
+            continue
+        record = decode(raw, ids_only)
+        if record is None:
+            raise ValueError(f"vault record at offset {offset} is corrupt")
+        if record[0] == COMMIT:
+            if record[1] != str(pending):
+                raise ValueError(f"vault batch ending at offset {offset} is incomplete")
+            pending = 0
+        else:
+            pending += 1
+            yield offset, raw, record
+        offset += len(raw)
+
+def iter_records(path, ids_only=False):
+    """
+    Yields (offset, length, op, payload) for every put and delete record;
+    with ids_only=True a put's payload is its ID rather than an Entry.
+    Call recover() first: any record that fails its checksum raises.
+    """
+    for offset, raw, (op, payload) in tracing.timed_iter("parse", _iter_raw(path, ids_only)):
+        yield offset, len(raw), op, payload
+
+def read_batches(path, start, end):
+    """
+    Returns the (op, payload) put and delete records between plaintext
+    offsets start and end, which must hold whole committed batches (say,
+    what was appended since a reader last looked). Raises ValueError
+    otherwise.
+    """
+    raw = vault_crypto.read_at(path, start, end - start)
+    if len(raw) != end - start or not raw.endswith(b"\n"):
+        raise ValueError(f"vault span {start}-{end} is not whole records")
+    records, pending = [], 0
+    for line in raw[:-1].split(b"\n"):
+        record = decode(line + b"\n")
+        if record is None:
+            raise ValueError(f"vault record in span {start}-{end} is corrupt")
+        if record[0] == COMMIT:
+            if record[1] != str(pending):
+                raise ValueError(f"vault batch in span {start}-{end} is incomplete")
+            pending = 0
+        else:
+            pending += 1
+            records.append(record)
+    if pending:
+        raise ValueError(f"vault span {start}-{end} ends inside a batch")
+    return records
+
+def _committed_end(path, size):
+    # Walks back from the end to the last commit record, reading a growing
+    # window so one large batch doesn't need the whole vault in memory.
+    window = vault_crypto.CHUNK_SIZE
+    while True:
+        start = max(len(MAGIC), size - window)
+        lines = vault_crypto.read_at(path, start, size - start).split(b"\n")
+        end = size
+        if lines[-1] == b"":
+            lines.pop()
+        else:
+            end -= len(lines.pop())
+        # The first piece may be the tail of a record cut by the window
+        first = 0 if start == len(MAGIC) else 1
+        for raw in reversed(lines[first:]):
+            record = decode(raw + b"\n")
+            if record and record[0] == COMMIT:
+                return end
+            end -= len(raw) + 1
+        if start == len(MAGIC):
+            return len(MAGIC)
+        window *= 2
+
+def _from_legacy(path):
+    yield MAGIC
+    lines = (raw.rstrip(b"\r\n").decode() for raw in vault_crypto.iter_lines(path))
+    yield from batch(vault_entry.from_legacy(line) for line in lines if line.strip())
+
+def needs_recovery(path):
+    """
+    Returns True if recover() would change path. Only reads, so it can run
+    under a shared lock before taking the exclusive one.
+    """
+    if vault_crypto.has_pending(path):
+        return True
+    size = vault_crypto.plain_size(path)
+    if size == 0:
+        return False
+    if size < len(MAGIC) or vault_crypto.read_at(path, 0, len(MAGIC)) != MAGIC:
+        return True
+    return _committed_end(path, size) < size
+
+def recover(path):
+    """
+    Brings path into a clean journal state: finishes an interrupted
+    encrypted write, converts a pre-journal vault and cuts a torn or
+    uncommitted tail. Returns True if the file changed.
+    """
+    changed = vault_crypto.finish_pending(path)
+    size = vault_crypto.plain_size(path)
+    if size == 0:
+        return changed
+    head = vault_crypto.read_at(path, 0, len(MAGIC))
+    if head != MAGIC:
+        if size < len(MAGIC) and MAGIC.startswith(head):
+            vault_crypto.truncate(path, 0)    # crashed while creating the vault
+        else:
+            vault_crypto.rewrite(path, _from_legacy(path))
+        return True
+    end = _committed_end(path, size)
+    if end < size:
+        vault_crypto.truncate(path, end)
+        return True
+    return changed
+
+def compact(path, live_offsets):
+    """
+    Rewrites path keeping only the put records at live_offsets, as a
+    single committed batch. Records are copied verbatim, timestamps and all.
+    """
+    def records():
+        yield MAGIC
+        n = 0
+        for offset, raw, _ in _iter_raw(path):
+            if offset in live_offsets:
+                n += 1
+                yield raw
+        yield encode(COMMIT, str(n))
+    vault_crypto.rewrite(path, records())
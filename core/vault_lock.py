@@ -0,0 +1,101 @@
+"""
+vault_lock.py -- Reader/writer locks between vaultpass processes
+
+- shared() for reads, exclusive() for writes: flock() on a lock file next
+  to the vault, so readers run side by side while a writer waits for them
+  and then keeps everyone else out until its batch is on disk
+- Waits are bounded by the lock_timeout setting (default 10s); past it
+  LockTimeout names the lock that stayed busy
+- Locks nest within a thread: under exclusive() any further lock on the
+  same file is free, as is shared() under shared(). Asking for exclusive()
+  under shared() raises RuntimeError -- two readers upgrading at once
+  would wait on each other. Threads lock through their own descriptors,
+  so they exclude each other like separate processes
+- One lock file each for the vault, its derived indexes (which a reader
+  may rebuild) and the backup store; take them in that order
+- Where fcntl is missing (Windows) locking is skipped
+"""
+
+import os
+import time
+import threading
+import contextlib
+import tracing
+
+HOME = os.path.expanduser("~")
+SYSTEM_DIR = os.path.join(HOME, ".vaultpass", "system")
+VAULT_LOCK = os.path.join(SYSTEM_DIR, "passwords.lock")
+INDEX_LOCK = os.path.join(SYSTEM_DIR, "index.lock")
+BACKUP_LOCK = os.path.join(SYSTEM_DIR, "backup.lock")
+
+_NAMES = {VAULT_LOCK: "vault", INDEX_LOCK: "vault index", BACKUP_LOCK: "backup store"}
+_local = threading.local()    # .held: lock path -> [mode, depth] for the locks this thread holds
+
+class LockTimeout(TimeoutError):
+    pass
+
+def _timeout():
+    import config
+    return config.get("lock_timeout")
+
+def _acquire(fcntl, fd, op, path, timeout):
+    # Polls with a non-blocking flock so the wait can be bounded
+    deadline = time.monotonic() + timeout
+    delay = 0.001
+    with tracing.phase("lock_wait"):
+        while True:
+            try:
+                fcntl.flock(fd, op | fcntl.LOCK_NB)
+                return
+            except BlockingIOError:
+                if time.monotonic() >= deadline:
+                    name = _NAMES.get(path, os.path.basename(path))
+                    raise LockTimeout(f"the {name} is busy: another vaultpass process held it "
+                                      f"for over {timeout:g}s (lock_timeout)") from None
+                time.sleep(delay)
+                delay = min(delay * 2, 0.05)
+
+@contextlib.contextmanager
+def _locked(path, mode, timeout):
+    if not hasattr(_local, "held"):
+        _local.held = {}
+    held = _local.held.get(path)
+    if held is not None:
+        if mode == "exclusive" and held[0] == "shared":
+            raise RuntimeError(f"exclusive lock on {path} requested while holding it shared")
+        held[1] += 1
+        try:
+            yield
+        finally:
+            held[1] -= 1
+        return
+    try:
+        import fcntl
+    except ImportError:
+        yield
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        op = fcntl.LOCK_EX if mode == "exclusive" else fcntl.LOCK_SH
+        _acquire(fcntl, fd, op, path, _timeout() if timeout is None else timeout)
+        _local.held[path] = [mode, 1]
+        try:
+            yield
+        finally:
+            del _local.held[path]
+            fcntl.flock(fd, fcntl.LOCK_UN)
+    finally:
+        os.close(fd)
+
+def shared(path=VAULT_LOCK, timeout=None):
+    """
+    Returns a context manager holding a shared (read) lock on path.
+    """
+    return _locked(path, "shared", timeout)
+
+def exclusive(path=VAULT_LOCK, timeout=None):
+    """
+    Returns a context manager holding the exclusive (write) lock on path.
+    """
+    return _locked(path, "exclusive", timeout)
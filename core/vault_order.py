@@ -0,0 +1,350 @@
+"""
+vault_order.py -- Sorted offset index for paging through the vault
+
+- passwords.ord lists the live records in journal order, plus two rank
+  arrays that order them by ID and by creation time; it is memory-mapped,
+  so opening it costs the same at any vault size
+- `-L --sort ... --offset N --limit M` binary-searches a rank array for
+  the first row of the page and decodes only the records on it, instead
+  of reading and sorting every entry in the vault
+- Writes never touch it: batches appended since it was built are read
+  back and merged in at lookup time. Once more than TAIL_BYTES were
+  appended or TAIL_DELETES IDs dropped, or after a compaction or restore,
+  the next lookup rebuilds it under vault_lock.INDEX_LOCK
+- With an encrypted vault the rank arrays are masked with a keystream
+  from the vault key, so the file doesn't give away how the IDs sort.
+  Every build draws a fresh nonce for it: two versions of the file never
+  share a keystream
+
+Layout (little-endian): a 56-byte header, then for `count` records their
+u64 offsets, their u32 lengths, u32 record numbers sorted by ID and u32
+record numbers sorted by creation time. The header holds the vault inode,
+the plaintext length covered and a keyed digest of the bytes just before
+it, which tell a later append apart from a rewritten vault, and the
+keystream nonce.
+"""
+
+import os
+import sys
+import struct
+import hashlib
+import itertools
+from array import array
+from bisect import bisect_left
+import tracing
+import vault_crypto
+import vault_index
+import vault_journal
+import vault_lock
+
+HOME = os.path.expanduser("~")
+SYSTEM_DIR = os.path.join(HOME, ".vaultpass", "system")
+PASS_FILE = os.path.join(SYSTEM_DIR, "passwords.gpg")
+ORDER_FILE = os.path.join(SYSTEM_DIR, "passwords.ord")
+
+MAGIC = b"VPORD002"
+HEADER = struct.Struct("<8sQQQ16s8s")  # magic, count, vault inode, plaintext end, tail digest, mask nonce
+TAIL_CHECK = 32                      # plaintext bytes before the end that the digest covers
+TAIL_BYTES = 4 * 1024 * 1024         # appended since the build, merged in before a rebuild
+TAIL_DELETES = 256                   # IDs dropped since the build, each costs a binary search
+SORTS = ("modified", "id", "created")
+RANK_BLOCK = 1024                    # rank array entries read per slice while streaming
+
+_blocks = None    # (key, AES block encryptor) for _keystream
+
+def _order_key():
+    return vault_crypto.subkey(b"vaultpass-order")
+
+def _digest(data, key):
+    return hashlib.blake2b(data, key=key or b"", digest_size=16).digest()
+
+def _keystream(key, nonce, start, length):
+    # Bytes start..start+length of an AES-CTR keystream (block n is AES of
+    # the build's nonce followed by the 64-bit counter n), so any slice of
+    # a rank array can be unmasked on its own. Short slices reuse one block
+    # encryptor per key
+    global _blocks
+    from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+    first, skip = divmod(start, 16)
+    if length > 4096:
+        enc = Cipher(algorithms.AES(key), modes.CTR(nonce + first.to_bytes(8, "big"))).encryptor()
+        return enc.update(bytes(skip + length))[skip:]
+    if _blocks is None or _blocks[0] != key:
+        _blocks = key, Cipher(algorithms.AES(key), modes.ECB()).encryptor()
+    counters = b"".join(nonce + n.to_bytes(8, "big") for n in range(first, (start + length + 15) // 16))
+    return _blocks[1].update(counters)[skip:skip + length]
+
+def _mask(data, key, nonce, start):
+    if key is None or not data:
+        return data
+    stream = _keystream(key, nonce, start, len(data))
+    return (int.from_bytes(data, "little") ^ int.from_bytes(stream, "little")).to_bytes(len(data), "little")
+
+def _le(values):
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values.tobytes()
+
+def _from_le(typecode, raw):
+    values = array(typecode, raw)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+def _sort_value(sort, entry):
+    return 0 if sort == "modified" else entry.id if sort == "id" else entry.created
+
+def _tail_digest(read, end, key):
+    keep = min(TAIL_CHECK, end)
+    return _digest(read(end - keep, keep) if keep else b"", key)
+
+def rebuild():
+    """
+    Scans the live entries once and rewrites the index from scratch.
+    """
+    if not os.path.isfile(PASS_FILE):
+        if os.path.exists(ORDER_FILE):
+            os.remove(ORDER_FILE)
+        return
+    offsets, lengths, created, ids = array("Q"), array("I"), array("I"), []
+    for offset, entry, length in vault_index.iter_live(lengths=True):
+        offsets.append(offset)
+        lengths.append(length)
+        created.append(entry.created)
+        ids.append(entry.id)
+    count = len(ids)
+    # sorted() is stable, so equal keys stay in journal order like the
+    # sorts they replace
+    by_id = array("I", sorted(range(count), key=ids.__getitem__))
+    del ids
+    by_created = array("I", sorted(range(count), key=created.__getitem__))
+    key = _order_key()
+    end = vault_crypto.plain_size(PASS_FILE)
+    digest = _tail_digest(lambda off, n: vault_crypto.read_at(PASS_FILE, off, n), end, key)
+    nonce = os.urandom(8)
+    tmp = ORDER_FILE + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(HEADER.pack(MAGIC, count, os.stat(PASS_FILE).st_ino, end, digest, nonce))
+        f.write(_le(offsets))
+        f.write(_le(lengths))
+        f.write(_mask(_le(by_id), key, nonce, 0))
+        f.write(_mask(_le(by_created), key, nonce, 4 * count))
+    os.replace(tmp, ORDER_FILE)
+
+class _Order:
+    """
+    The live entries in one sort order: the mapped index merged with the
+    records appended since it was built.
+    """
+
+    def __init__(self, mapped, reader, key):
+        self._map, self._reader, self._key = mapped, reader, key
+        _, self.count, _, _, _, self._nonce = HEADER.unpack_from(mapped)
+        self._offsets = HEADER.size
+        self._lengths = self._offsets + 8 * self.count
+        self._ranks = {"id": self._lengths + 4 * self.count, "created": self._lengths + 8 * self.count}
+        self.tail = []          # Entries put since the build, in journal order; None once deleted
+        self.dropped = set()    # IDs deleted since the build: their indexed records are dead
+
+    def catch_up(self, records):
+        live = {}
+        for op, payload in records:
+            if op == vault_journal.DEL:
+                self.dropped.add(payload)
+                for i in live.pop(payload, ()):
+                    self.tail[i] = None
+            else:
+                live.setdefault(payload.id, []).append(len(self.tail))
+                self.tail.append(payload)
+
+    def close(self):
+        self._map.close()
+
+    def ranks(self, sort, start, stop):
+        """
+        Returns the record numbers at positions start..stop of a sort order.
+        """
+        if sort == "modified":
+            return range(start, stop)
+        base = self._ranks[sort]
+        raw = self._map[base + 4 * start:base + 4 * stop]
+        return _from_le("I", _mask(raw, self._key, self._nonce, base + 4 * start - self._ranks["id"]))
+
+    def span(self, rank):
+        offset = struct.unpack_from("<Q", self._map, self._offsets + 8 * rank)[0]
+        return offset, struct.unpack_from("<I", self._map, self._lengths + 4 * rank)[0]
+
+    def entries(self, ranks):
+        """
+        Returns the Entries of several records, decoded in offset order so
+        each encrypted chunk is decrypted once.
+        """
+        found = {rank: self.entry(rank) for rank in sorted(ranks)}
+        return [found[rank] for rank in ranks]
+
+    def entry(self, rank, ids_only=False):
+        record = vault_journal.decode(self._reader.read(*self.span(rank)), ids_only)
+        if record is None or record[0] != vault_journal.PUT:
+            raise ValueError(f"vault record {rank} in the sort index is not an entry")
+        return record[1]
+
+    def key(self, sort, rank):
+        # Equal sort keys fall back to journal order; the tail comes after
+        # every indexed record
+        if sort == "modified":
+            return 0, rank
+        if sort == "id":
+            return self.entry(rank, ids_only=True), rank
+        return self.entry(rank).created, rank
+
+    def tail_keys(self, sort):
+        keys = []
+        for i, entry in enumerate(self.tail):
+            if entry is not None:
+                keys.append((_sort_value(sort, entry), self.count + i))
+        return sorted(keys)
+
+    def bisect(self, sort, key):
+        # First position in the sort order whose key is not below key
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.key(sort, self.ranks(sort, mid, mid + 1)[0]) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def dead_positions(self, sort):
+        """
+        Returns the sorted positions, in one sort order, of the indexed
+        records whose IDs were deleted since the build.
+        """
+        dead = []
+        for entry_id in self.dropped:
+            lo = hi = self.bisect("id", (entry_id, -1))
+            while hi < self.count and self.key("id", self.ranks("id", hi, hi + 1)[0])[0] == entry_id:
+                hi += 1
+            if sort == "id":
+                dead.extend(range(lo, hi))
+                continue
+            for rank in self.ranks("id", lo, hi):
+                if sort == "modified":
+                    dead.append(rank)
+                else:
+                    dead.append(self.bisect("created", (self.entry(rank).created, rank)))
+        return sorted(dead)
+
+def _open(reader, key):
+    """
+    Returns an _Order caught up with the vault, or None if the index is
+    missing, describes another vault file or has fallen too far behind.
+    """
+    import mmap
+    try:
+        with open(ORDER_FILE, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (FileNotFoundError, ValueError):
+        return None
+    size = vault_crypto.plain_size(PASS_FILE)
+    if len(mapped) >= HEADER.size:
+        magic, count, inode, end, digest, _ = HEADER.unpack_from(mapped)
+        if (magic == MAGIC and len(mapped) == HEADER.size + 20 * count
+                and inode == os.stat(PASS_FILE).st_ino
+                and end <= size and size - end <= TAIL_BYTES
+                and _tail_digest(reader.read, end, key) == digest):
+            order = _Order(mapped, reader, key)
+            if size > end:
+                order.catch_up(vault_journal.read_batches(PASS_FILE, end, size))
+            if len(order.dropped) <= TAIL_DELETES:
+                return order
+    mapped.close()
+    return None
+
+def _load(reader):
+    key = _order_key()
+    order = _open(reader, key)
+    if order is None:
+        # Readers that find it stale together rebuild it once, not once each
+        with vault_lock.exclusive(vault_lock.INDEX_LOCK):
+            order = _open(reader, key)
+            if order is None:
+                with tracing.phase("order_rebuild"):
+                    rebuild()
+                order = _open(reader, key)
+    if order is None:
+        raise ValueError("the vault sort index could not be rebuilt")
+    return order
+
+def _start(order, sort, offset, dead, tail_keys):
+    """
+    Returns (position, tail index, row number) of a point in the merged
+    order at or before row `offset`, found by binary search.
+    """
+    def rows_before(p):
+        # Live rows ahead of position p: indexed ones plus tail entries sorting lower
+        if p == order.count:
+            return p - len(dead) + len(tail_keys)
+        key = order.key(sort, order.ranks(sort, p, p + 1)[0])
+        return p - bisect_left(dead, p) + bisect_left(tail_keys, key)
+
+    lo, hi = 0, order.count
+    if rows_before(0) > offset:
+        return 0, 0, 0
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if rows_before(mid) <= offset:
+            lo = mid
+        else:
+            hi = mid - 1
+    if lo == order.count:
+        return lo, len(tail_keys), rows_before(lo)
+    key = order.key(sort, order.ranks(sort, lo, lo + 1)[0])
+    return lo, bisect_left(tail_keys, key), rows_before(lo)
+
+def _merge(order, sort, pos, j, dead, tail_keys, block):
+    # Yields Entries in sort order from position pos of the index and entry
+    # j of the sorted tail, reading indexed records a block at a time
+    dead = set(dead)
+    while pos < order.count:
+        ranks = order.ranks(sort, pos, min(pos + block, order.count))
+        for rank, entry in zip(ranks, order.entries(ranks)):
+            if pos not in dead:
+                if j < len(tail_keys):
+                    key = (_sort_value(sort, entry), rank)
+                    while j < len(tail_keys) and tail_keys[j] < key:
+                        yield order.tail[tail_keys[j][1] - order.count]
+                        j += 1
+                yield entry
+            pos += 1
+        block = min(block * 2, RANK_BLOCK)
+    for _, i in tail_keys[j:]:
+        yield order.tail[i - order.count]
+
+def iter_sorted(sort="modified", offset=0, limit=None):
+    """
+    Yields the live Entries ordered by last modification, ID or creation
+    time, `limit` of them from row `offset`. The caller holds the vault's
+    shared lock; time and memory don't grow with the rows skipped.
+    """
+    if sort not in SORTS:
+        raise ValueError(f"unknown sort {sort!r}")
+    if not os.path.isfile(PASS_FILE) or limit == 0:
+        return
+    if sort == "modified" and offset == 0 and limit is None:
+        # The whole vault in journal order: one pass beats any index
+        yield from (entry for _, entry in vault_index.iter_live())
+        return
+    with vault_crypto.Reader(PASS_FILE) as reader:
+        order = _load(reader)
+        try:
+            with tracing.phase("order"):
+                dead = order.dead_positions(sort)
+                tail_keys = order.tail_keys(sort)
+                pos, j, row = _start(order, sort, offset, dead, tail_keys)
+            skip = offset - row
+            stop = None if limit is None else skip + limit
+            block = RANK_BLOCK if stop is None else max(1, min(stop, RANK_BLOCK))
+            yield from itertools.islice(_merge(order, sort, pos, j, dead, tail_keys, block), skip, stop)
+        finally:
+            order.close()
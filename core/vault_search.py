@@ -0,0 +1,462 @@
+"""
+vault_search.py -- Trigram index for fuzzy search over ID, username and info
+
+- Splits the ID, username and info of every live entry into lowercase words
+  and indexes their padded trigrams, so partial words and typos still match
+- passwords.tri is an open-addressing table mapping trigram -> posting
+  chain; passwords.trp holds the chains as blocks of record offsets
+- Adds, edits and deletes append one block per touched trigram instead of
+  rebuilding; a chain is merged back into one sorted block as it grows
+- Merges and removals leave dead bytes behind in passwords.trp. The table
+  header counts the live ones, and once the dead pass COMPACT_RATIO of
+  them the postings file is rewritten with one block per live chain
+- Trigram hashes are keyed with the vault key when the vault is encrypted,
+  so the index doesn't give away what the entries contain
+- Like vault_index, rebuilds itself when the vault changed behind its back;
+  concurrent readers rebuild under vault_lock.INDEX_LOCK, one at a time
+
+Passwords are never indexed.
+"""
+
+import os
+import struct
+import hashlib
+from array import array
+from bisect import bisect_left
+import vault_crypto
+import vault_index
+import vault_journal
+import vault_lock
+
+HOME = os.path.expanduser("~")
+SYSTEM_DIR = os.path.join(HOME, ".vaultpass", "system")
+PASS_FILE = os.path.join(SYSTEM_DIR, "passwords.gpg")
+TRIGRAM_FILE = os.path.join(SYSTEM_DIR, "passwords.tri")
+POSTINGS_FILE = os.path.join(SYSTEM_DIR, "passwords.trp")
+
+MAGIC = b"VPTRI002"
+POSTINGS_MAGIC = b"VPTRP001"
+HEADER = struct.Struct("<8sQQQQ8sQ") # magic, capacity, trigrams, vault size, vault mtime_ns, key tag,
+                                     # live postings bytes
+SLOT = struct.Struct("<QQII")        # trigram hash, head block, live postings, blocks in chain
+BLOCK = struct.Struct("<QI")         # previous block, entries (u64 record offsets follow)
+EMPTY = 0
+REMOVED = 1 << 63                    # entry flag: the record at this offset left the vault
+MIN_CAPACITY = 4096
+MERGE_AT = 8
+MIN_SCORE = 0.3                      # share of the query's trigrams a result must have
+COMPACT_RATIO = 1.0                  # dead postings bytes per live byte that trigger a rewrite
+COMPACT_MIN_BYTES = 1 << 20
+
+_word_re = None
+
+def _words(text):
+    global _word_re
+    if _word_re is None:
+        import re
+        _word_re = re.compile(r"[^\W_]+")
+    return _word_re.findall(text.lower())
+
+def _word_trigrams(word):
+    padded = f"  {word} "
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+def trigrams(text, cache=None):
+    """
+    Returns the set of padded trigrams of every word in text ("  g", " gi",
+    "git", ... "ab "), so word starts weigh more than word middles. A dict
+    passed as cache memoises per-word trigrams across calls.
+    """
+    grams = set()
+    for word in _words(text):
+        if cache is None:
+            grams.update(_word_trigrams(word))
+            continue
+        word_grams = cache.get(word)
+        if word_grams is None:
+            word_grams = cache[word] = _word_trigrams(word)
+        grams.update(word_grams)
+    return grams
+
+def _fields(entry):
+    # ID, username and info; the password stays out of the index
+    return f"{entry.id} {entry.user} {entry.info}"
+
+def _hasher():
+    key = vault_crypto.subkey(b"vaultpass-search") or b""
+    seen = {}
+    def h(gram):
+        gram_hash = seen.get(gram)
+        if gram_hash is None:
+            digest = hashlib.blake2b(gram.encode(), key=key, digest_size=8).digest()
+            gram_hash = seen[gram] = int.from_bytes(digest, "little") | (1 << 63)
+        return gram_hash
+    return h
+
+def _key_tag():
+    key = vault_crypto.subkey(b"vaultpass-search") or b""
+    return hashlib.blake2b(b"vaultpass-search-tag", key=key, digest_size=8).digest()
+
+def _vault_stamp():
+    st = os.stat(PASS_FILE)
+    return st.st_size, st.st_mtime_ns
+
+def _capacity_for(count):
+    capacity = MIN_CAPACITY
+    while capacity < count * 2:
+        capacity *= 2
+    return capacity
+
+def _read_header(f):
+    raw = f.read(HEADER.size)
+    if len(raw) != HEADER.size:
+        return None
+    magic, capacity, used, size, mtime_ns, tag, live = HEADER.unpack(raw)
+    if magic != MAGIC:
+        return None
+    return capacity, used, size, mtime_ns, tag, live
+
+def _chain_bytes(count):
+    # What a chain of `count` live postings takes once compacted
+    return BLOCK.size + 8 * count if count > 0 else 0
+
+def _write_table(slots, stamp):
+    capacity = _capacity_for(len(slots))
+    table = bytearray(capacity * SLOT.size)
+    mask = capacity - 1
+    for gram_hash, head, count, blocks in slots:
+        slot = gram_hash & mask
+        while struct.unpack_from("<Q", table, slot * SLOT.size)[0] != EMPTY:
+            slot = (slot + 1) & mask
+        SLOT.pack_into(table, slot * SLOT.size, gram_hash, head, count, blocks)
+    live = sum(_chain_bytes(count) for _, _, count, _ in slots)
+    tmp = TRIGRAM_FILE + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(HEADER.pack(MAGIC, capacity, len(slots), stamp[0], stamp[1], _key_tag(), live))
+        f.write(table)
+    os.replace(tmp, TRIGRAM_FILE)
+
+def _write_block(post, prev, entries):
+    post.seek(0, os.SEEK_END)
+    pos = post.tell()
+    post.write(BLOCK.pack(prev, len(entries)))
+    post.write(array("Q", entries).tobytes())
+    return pos
+
+def is_fresh():
+    """
+    Returns True if the index matches the vault and key as they are now.
+    """
+    if not os.path.isfile(PASS_FILE) or not os.path.isfile(POSTINGS_FILE):
+        return False
+    try:
+        with open(TRIGRAM_FILE, "rb") as f:
+            header = _read_header(f)
+    except FileNotFoundError:
+        return False
+    return bool(header) and header[2:4] == _vault_stamp() and header[4] == _key_tag()
+
+def rebuild():
+    """
+    Indexes every live vault entry from scratch.
+    """
+    h = _hasher()
+    postings, cache = {}, {}
+    for offset, entry in vault_index.iter_live():
+        for gram in trigrams(_fields(entry), cache):
+            offsets = postings.get(gram)
+            if offsets is None:
+                offsets = postings[gram] = array("Q")
+            offsets.append(offset)
+    # Drop the table first: a crash mid-rebuild must not pair it with new postings
+    if os.path.exists(TRIGRAM_FILE):
+        os.remove(TRIGRAM_FILE)
+    slots = []
+    tmp = POSTINGS_FILE + ".tmp"
+    with open(tmp, "wb") as post:
+        post.write(POSTINGS_MAGIC)
+        for gram, offsets in postings.items():
+            slots.append((h(gram), _write_block(post, 0, offsets), len(offsets), 1))
+    os.replace(tmp, POSTINGS_FILE)
+    _write_table(slots, _vault_stamp())
+
+def ensure_fresh():
+    """
+    Rebuilds the index unless it is fresh. Of several readers finding it
+    stale at once, the first rebuilds and the rest wait for it.
+    """
+    if is_fresh():
+        return
+    with vault_lock.exclusive(vault_lock.INDEX_LOCK):
+        if not is_fresh():
+            rebuild()
+
+def _find_slot(f, capacity, gram_hash):
+    """
+    Returns (slot number, (head, count, blocks) or None).
+    """
+    mask = capacity - 1
+    slot = gram_hash & mask
+    while True:
+        f.seek(HEADER.size + slot * SLOT.size)
+        slot_hash, head, count, blocks = SLOT.unpack(f.read(SLOT.size))
+        if slot_hash == EMPTY:
+            return slot, None
+        if slot_hash == gram_hash:
+            return slot, (head, count, blocks)
+        slot = (slot + 1) & mask
+
+def _read_chain(post, head):
+    """
+    Returns ([sorted offset arrays], {removed offsets}) for a posting chain.
+    """
+    blocks, removed = [], set()
+    while head:
+        post.seek(head)
+        prev, n = BLOCK.unpack(post.read(BLOCK.size))
+        entries = array("Q")
+        entries.frombytes(post.read(n * 8))
+        # Blocks are sorted, so removals (flag bit set) sit at the end
+        cut = bisect_left(entries, REMOVED)
+        removed.update(e & ~REMOVED for e in entries[cut:])
+        blocks.append(entries[:cut])
+        head = prev
+    return blocks, removed
+
+def update(added, removed):
+    """
+    Folds the (offset, ID) pairs a journal batch added and dropped into
+    the index, re-reading each record from the vault. Only call this if
+    is_fresh() held before the batch.
+    """
+    h = _hasher()
+    changes = {}
+    with vault_crypto.Reader(PASS_FILE) as reader:
+        for pairs, flag in ((added, 0), (removed, REMOVED)):
+            for offset, _ in pairs:
+                entry = _entry_at(offset, reader.read)
+                if entry is None:
+                    continue
+                for gram in trigrams(_fields(entry)):
+                    changes.setdefault(h(gram), []).append(offset | flag)
+    with open(TRIGRAM_FILE, "r+b") as idx:
+        capacity, used, size, mtime_ns, _, _ = _read_header(idx)
+    if (used + len(changes)) * 2 > capacity:
+        # Grow first; the old stamp keeps the table stale until we finish
+        with open(TRIGRAM_FILE, "rb") as idx:
+            idx.seek(HEADER.size)
+            table = idx.read(capacity * SLOT.size)
+        _write_table([s for s in SLOT.iter_unpack(table) if s[0] != EMPTY], (size, mtime_ns))
+    with open(TRIGRAM_FILE, "r+b") as idx, open(POSTINGS_FILE, "r+b") as post:
+        capacity, used, _, _, tag, live_bytes = _read_header(idx)
+        for gram_hash, entries in changes.items():
+            entries.sort()
+            delta = sum(-1 if e & REMOVED else 1 for e in entries)
+            slot, found = _find_slot(idx, capacity, gram_hash)
+            live_bytes -= _chain_bytes(found[1]) if found else 0
+            if found is None:
+                used += 1
+                head, count, blocks = _write_block(post, 0, entries), delta, 1
+            elif found[2] + 1 >= MERGE_AT:
+                chain_blocks, gone = _read_chain(post, found[0])
+                gone.update(e & ~REMOVED for e in entries if e & REMOVED)
+                live = {e for e in entries if not e & REMOVED}
+                for block in chain_blocks:
+                    live.update(block)
+                merged = sorted(live - gone)
+                head, count, blocks = _write_block(post, 0, merged), len(merged), 1
+            else:
+                head = _write_block(post, found[0], entries)
+                count, blocks = found[1] + delta, found[2] + 1
+            live_bytes += _chain_bytes(count)
+            idx.seek(HEADER.size + slot * SLOT.size)
+            idx.write(SLOT.pack(gram_hash, head, max(count, 0), blocks))
+        # Stamp last: a crash before this leaves the index stale, not wrong
+        size, mtime_ns = _vault_stamp()
+        idx.seek(0)
+        idx.write(HEADER.pack(MAGIC, capacity, used, size, mtime_ns, tag, live_bytes))
+        dead_bytes = post.seek(0, os.SEEK_END) - len(POSTINGS_MAGIC) - live_bytes
+    if dead_bytes > max(live_bytes * COMPACT_RATIO, COMPACT_MIN_BYTES):
+        compact()
+
+def compact():
+    """
+    Rewrites passwords.trp with one sorted block per live chain, dropping
+    merged-away blocks, removed postings and trigrams left with no entries.
+    Holds INDEX_LOCK exclusively, so searches never see the swap half-done.
+    """
+    with vault_lock.exclusive(vault_lock.INDEX_LOCK):
+        with open(TRIGRAM_FILE, "rb") as idx:
+            header = _read_header(idx)
+            if header is None:
+                return
+            capacity, _, size, mtime_ns, _, _ = header
+            table = idx.read(capacity * SLOT.size)
+        slots = []
+        tmp = POSTINGS_FILE + ".tmp"
+        with open(POSTINGS_FILE, "rb") as post, open(tmp, "wb") as out:
+            out.write(POSTINGS_MAGIC)
+            for gram_hash, head, _, blocks in SLOT.iter_unpack(table):
+                if gram_hash == EMPTY:
+                    continue
+                if blocks == 1:
+                    # Most chains are one sorted block: copied as they are
+                    # unless it ends in removals
+                    post.seek(head)
+                    header = post.read(BLOCK.size)
+                    n = BLOCK.unpack(header)[1]
+                    body = post.read(8 * n)
+                    if n and struct.unpack_from("<Q", body, len(body) - 8)[0] < REMOVED:
+                        slots.append((gram_hash, out.tell(), n, 1))
+                        out.write(header + body)
+                        continue
+                merged = sorted(_hits(_read_chain(post, head)))
+                if merged:
+                    slots.append((gram_hash, _write_block(out, 0, merged), len(merged), 1))
+        # Same order as rebuild(): no moment pairs the old table with new postings
+        os.remove(TRIGRAM_FILE)
+        os.replace(tmp, POSTINGS_FILE)
+        _write_table(slots, (size, mtime_ns))
+
+def _entry_at(offset, read=None):
+    size = 256
+    while True:
+        raw = read(offset, size) if read else vault_crypto.read_at(PASS_FILE, offset, size)
+        end = raw.find(b"\n")
+        if end != -1 or len(raw) < size:
+            break
+        size *= 4
+    record = vault_journal.decode(raw[:end + 1])
+    return record[1] if record and record[0] == vault_journal.PUT else None
+
+def _contains(chain, offset):
+    blocks, removed = chain
+    if offset in removed:
+        return False
+    for entries in blocks:
+        i = bisect_left(entries, offset)
+        if i < len(entries) and entries[i] == offset:
+            return True
+    return False
+
+def _prober(chain):
+    # Membership test for a chain: binary search while probes are few, a
+    # set once they add up to a sixteenth of the chain (building it costs
+    # about as much as that many searches)
+    blocks, removed = chain
+    state = {"calls": 0, "set": None}
+    limit = sum(len(entries) for entries in blocks) // 16
+    def has(offset):
+        members = state["set"]
+        if members is None:
+            state["calls"] += 1
+            if state["calls"] < limit:
+                return _contains(chain, offset)
+            members = state["set"] = _hits(chain)
+        return offset in members
+    return has
+
+def _near_matches(chains, limit, keep, need, max_candidates=20000):
+    """
+    Returns {offset: matched chains} for entries missing at most m chains,
+    with m raised from 0 until `limit` entries qualify. An entry missing m
+    chains sits in one of the m + 1 rarest, so level m only takes in the
+    entries of chain m; each entry is then probed against the remaining
+    chains and parked at its first miss until the next level, so no chain
+    is probed twice for it. Entries found at level m all miss exactly m
+    chains, so a level stops early at `keep` of them. Returns None once
+    more than max_candidates entries are in play; counting is cheaper then.
+    """
+    probes = [_prober(chain) for _, chain in chains]
+    found, seen, waiting = {}, set(), {}
+    for level, (_, chain) in enumerate(chains):
+        if len(chains) - level < need:
+            break
+        new = _hits(chain) - seen
+        if len(seen) + len(new) > max_candidates:
+            return None
+        seen |= new
+        # Entries new at this level are absent from every rarer chain
+        batch = waiting.pop(level, []) + [(offset, level + 1) for offset in new]
+        for offset, pos in batch:
+            while pos < len(probes) and probes[pos](offset):
+                pos += 1
+            if pos == len(probes):
+                found[offset] = len(chains) - level
+                if len(found) >= keep:
+                    return found
+            else:
+                waiting.setdefault(level + 1, []).append((offset, pos + 1))
+        if len(found) >= limit:
+            break
+    return found
+
+def _hits(chain, among=None):
+    # Live offsets in a chain, optionally only those already in `among`
+    blocks, removed = chain
+    hits = set()
+    for entries in blocks:
+        hits.update(entries if among is None else among.intersection(entries))
+    return hits - removed
+
+def search(query, limit=10):
+    """
+    Returns up to `limit` (score, Entry) pairs, best first. The score is the
+    share of the query's trigrams found in the entry's ID, username and
+    info; entries whose ID or fields contain the query outright rank first.
+    """
+    import math
+    from collections import Counter
+
+    grams = trigrams(query)
+    if not grams or not os.path.isfile(PASS_FILE):
+        return []
+    ensure_fresh()
+    h = _hasher()
+    chains = []
+    # Shared with other searches; a rebuild swaps both files under the exclusive lock
+    with vault_lock.shared(vault_lock.INDEX_LOCK), open(TRIGRAM_FILE, "rb") as idx, open(POSTINGS_FILE, "rb") as post:
+        capacity = _read_header(idx)[0]
+        for gram in grams:
+            found = _find_slot(idx, capacity, h(gram))[1]
+            if found:
+                chains.append((found[1], _read_chain(post, found[0])))
+    chains.sort(key=lambda c: c[0])
+
+    # Walk the rarest chains first: usually enough entries match all or
+    # nearly all of the query's trigrams, and they are the best results.
+    need = max(1, math.ceil(MIN_SCORE * len(grams)))
+    keep = limit * 3
+    near = _near_matches(chains, limit, keep, need - (len(grams) - len(chains)))
+    if near is not None:
+        return _ranked(query, grams, {o: n for o, n in near.items() if n >= need}, limit)
+
+    # Otherwise count chains rarest first. An entry first seen in chain i can
+    # score at most len(chains) - i, so once that can't reach `need`, or
+    # can't beat `keep` entries already matching every chain so far, later
+    # chains only add to the candidates we have.
+    counts, perfect, among = Counter(), None, None
+    for i, (_, chain) in enumerate(chains):
+        left = len(chains) - i
+        if among is None and (left < need or (perfect is not None and len(perfect) >= keep and left <= i)):
+            among = {o for o, n in counts.items() if n + left >= need}
+        hits = _hits(chain, among)
+        counts.update(hits)
+        perfect = hits if perfect is None else perfect & hits
+
+    return _ranked(query, grams, {o: n for o, n in counts.most_common(keep) if n >= need}, limit)
+
+def _ranked(query, grams, counts, limit):
+    best = sorted(((n, o) for o, n in counts.items()), reverse=True)[:limit * 3]
+    query_l = query.lower().strip()
+    results = []
+    for n, offset in best:
+        entry = _entry_at(offset)
+        if entry is None:
+            continue
+        score = n / len(grams)
+        fields = _fields(entry)
+        bonus = 1.0 if query_l in entry.id.lower() else 0.5 if query_l in fields.lower() else 0.0
+        results.append((score + bonus, score, len(fields), entry))
+    results.sort(key=lambda r: (-r[0], r[2]))
+    return [(score, entry) for _, score, _, entry in results[:limit]]
@@ -0,0 +1,322 @@
+"""
+vault_server.py -- Long-running vault server (`vaultpass serve`)
+
+- Listens on a Unix socket (0600) and speaks JSON-RPC 2.0, one request
+  (or batch) per line; connections stay open for any number of requests
+- Like the unlock agent, on Linux it also drops clients running as another
+  user (SO_PEERCRED)
+- Unlocks the vault once at start-up and keeps every live entry in
+  memory, so get/list cost a dict lookup instead of a process start,
+  a config check and a passphrase verification
+- Picks up changes other vaultpass processes make: each request stats
+  the vault, replays only the appended batches when it grew, and reloads
+  it whole after a compaction or restore
+- put/delete go through the same locked journal commit as the CLI;
+  search uses the trigram index
+
+Methods (params by name or position):
+
+    get(id)  get(ids)             entries for one ID, or {id: entries}
+    put(id, user, password, info, replace=True)
+    delete(id)  delete(ids)       {"deleted": [...], "missing": [...]}
+    list(sort, offset, limit, passwords=False)
+    search(query, limit=10, passwords=False)
+    status()  stop()
+
+Entries are {"id", "user", "password", "info", "created", "modified"};
+list and search leave the password out unless passwords is true.
+See vault_client.VaultClient for a Python client.
+"""
+
+import os
+import sys
+import json
+import inspect
+import threading
+import agent
+import vault
+import vault_crypto
+import vault_entry
+import vault_journal
+import vault_lock
+import vault_search
+
+HOME = os.path.expanduser("~")
+SYSTEM_DIR = os.path.join(HOME, ".vaultpass", "system")
+SOCKET_PATH = os.path.join(SYSTEM_DIR, "vault.sock")
+PASS_FILE = vault.PASS_FILE
+TAIL_CHECK = 32    # bytes before the loaded end that must be unchanged to replay only the tail
+
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+VAULT_BUSY = -32001
+
+class RpcError(Exception):
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+
+def _stamp():
+    try:
+        st = os.stat(PASS_FILE)
+    except FileNotFoundError:
+        return None
+    return st.st_ino, st.st_size, st.st_mtime_ns
+
+def _entry_dict(entry, password=True):
+    row = {"id": entry.id, "user": entry.user, "password": entry.password, "info": entry.info,
+           "created": entry.created or None, "modified": entry.modified or None}
+    if not password:
+        del row["password"]
+    return row
+
+def _check_id(entry_id):
+    if not isinstance(entry_id, str) or not entry_id.strip():
+        raise RpcError(INVALID_PARAMS, "id must be a non-empty string")
+    return entry_id.strip()
+
+def _check_ids(id, ids):
+    if (id is None) == (ids is None):
+        raise RpcError(INVALID_PARAMS, "give either id or ids")
+    if ids is not None and not isinstance(ids, list):
+        raise RpcError(INVALID_PARAMS, "ids must be a list")
+    return [_check_id(entry_id) for entry_id in (ids if ids is not None else [id])]
+
+class Store:
+    """
+    The live entries of the vault, kept in step with the file on disk.
+    """
+
+    def __init__(self):
+        self.entries = {}    # id -> [Entry], in journal order
+        self.stamp = None
+        self.end = 0         # plaintext size loaded so far
+        self.tail = b""      # the TAIL_CHECK plaintext bytes before end
+        self.stopping = False
+
+    def refresh(self):
+        """
+        Catches up with the vault if another process changed it.
+        """
+        if _stamp() == self.stamp:
+            return
+        with vault_lock.shared():
+            repair = vault_journal.needs_recovery(PASS_FILE)
+            if not repair:
+                self._load()
+        if repair:
+            # A writer crashed mid-batch; cut its tail off as any command would
+            with vault_lock.exclusive():
+                vault_journal.recover(PASS_FILE)
+                self._load()
+
+    def _load(self):
+        stamp = _stamp()
+        end = vault_crypto.plain_size(PASS_FILE)
+        appended = (self.stamp is not None and stamp is not None and stamp[0] == self.stamp[0]
+                    and end > self.end and self.tail
+                    and vault_crypto.read_at(PASS_FILE, self.end - len(self.tail), len(self.tail)) == self.tail)
+        if appended:
+            records = vault_journal.read_batches(PASS_FILE, self.end, end)
+        else:
+            self.entries = {}
+            records = ((op, payload) for _, _, op, payload in vault_journal.iter_records(PASS_FILE)) if end else ()
+        for op, payload in records:
+            if op == vault_journal.DEL:
+                self.entries.pop(payload, None)
+            else:
+                self.entries.setdefault(payload.id, []).append(payload)
+        self.stamp, self.end = stamp, end
+        keep = min(TAIL_CHECK, end)
+        self.tail = vault_crypto.read_at(PASS_FILE, end - keep, keep) if end else b""
+
+    # ---- RPC methods -------------------------------------------------------
+
+    def get(self, id=None, ids=None):
+        wanted = _check_ids(id, ids)
+        self.refresh()
+        found = {entry_id: [_entry_dict(e) for e in self.entries.get(entry_id, ())] for entry_id in wanted}
+        return found if ids is not None else found[wanted[0]]
+
+    def put(self, id, user="", password="", info="", replace=True):
+        entry_id = _check_id(id)
+        if not all(isinstance(field, str) for field in (user, password, info)):
+            raise RpcError(INVALID_PARAMS, "user, password and info must be strings")
+        entry = vault_entry.Entry(entry_id, user, password, info)
+        with vault_lock.exclusive():
+            self.refresh()
+            replaced = [entry_id] if replace and entry_id in self.entries else []
+            os.makedirs(SYSTEM_DIR, exist_ok=True)
+            vault.commit_batch([entry], replaced)
+            self.refresh()
+        return {"id": entry_id, "created": entry.created, "modified": entry.modified, "replaced": len(replaced)}
+
+    def delete(self, id=None, ids=None):
+        wanted = _check_ids(id, ids)
+        with vault_lock.exclusive():
+            self.refresh()
+            found = [entry_id for entry_id in dict.fromkeys(wanted) if entry_id in self.entries]
+            if found:
+                vault.commit_batch([], found)
+                self.refresh()
+        return {"deleted": found, "missing": [entry_id for entry_id in wanted if entry_id not in found]}
+
+    def list(self, sort="modified", offset=0, limit=None, passwords=False):
+        if sort not in vault.LIST_SORTS:
+            raise RpcError(INVALID_PARAMS, f"sort must be one of {', '.join(vault.LIST_SORTS)}")
+        if not isinstance(offset, int) or offset < 0 or not (limit is None or isinstance(limit, int) and limit >= 0):
+            raise RpcError(INVALID_PARAMS, "offset and limit must be non-negative integers")
+        self.refresh()
+        rows = [entry for entries in self.entries.values() for entry in entries]
+        if sort != "modified":    # journal order already is modification order
+            rows.sort(key=lambda e: e.id if sort == "id" else e.created)
+        end = None if limit is None else offset + limit
+        return [_entry_dict(entry, passwords) for entry in rows[offset:end]]
+
+    def search(self, query, limit=10, passwords=False):
+        if not isinstance(query, str) or not isinstance(limit, int) or limit < 1:
+            raise RpcError(INVALID_PARAMS, "query must be a string and limit a positive integer")
+        self.refresh()
+        if not self.entries:
+            return []
+        with vault_lock.shared():
+            vault_search.ensure_fresh()
+            results = vault_search.search(query, limit)
+        return [{"score": round(score, 3), "entry": _entry_dict(entry, passwords)} for score, entry in results]
+
+    def stop(self):
+        self.stopping = True
+        return True
+
+    def status(self):
+        self.refresh()
+        return {"entries": sum(len(entries) for entries in self.entries.values()), "pid": os.getpid(),
+                "encrypted": vault_crypto.is_encrypted(PASS_FILE) if self.end else None}
+
+METHODS = ("get", "put", "delete", "list", "search", "status", "stop")
+
+def _call(store, req):
+    # Returns the response object for one request, or None for a notification
+    if not isinstance(req, dict) or req.get("jsonrpc") != "2.0" or not isinstance(req.get("method"), str):
+        return {"jsonrpc": "2.0", "id": None, "error": {"code": INVALID_REQUEST, "message": "invalid request"}}
+    req_id = req.get("id")
+    params = req.get("params", [])
+    try:
+        if req["method"] not in METHODS:
+            raise RpcError(METHOD_NOT_FOUND, f"unknown method {req['method']!r}")
+        fn = getattr(store, req["method"])
+        if not isinstance(params, (dict, list)):
+            raise RpcError(INVALID_PARAMS, "params must be an object or array")
+        try:
+            bound = inspect.signature(fn).bind(**params) if isinstance(params, dict) else inspect.signature(fn).bind(*params)
+        except TypeError as e:
+            raise RpcError(INVALID_PARAMS, str(e)) from None
+        reply = {"result": fn(*bound.args, **bound.kwargs)}
+    except RpcError as e:
+        reply = {"error": {"code": e.code, "message": str(e)}}
+    except vault_lock.LockTimeout as e:
+        reply = {"error": {"code": VAULT_BUSY, "message": str(e)}}
+    except ValueError as e:
+        reply = {"error": {"code": INVALID_PARAMS, "message": str(e)}}
+    except Exception as e:
+        reply = {"error": {"code": INTERNAL_ERROR, "message": f"{type(e).__name__}: {e}"}}
+    if "id" not in req:
+        return None
+    return {"jsonrpc": "2.0", "id": req_id, **reply}
+
+def handle_line(store, line):
+    """
+    Returns the encoded response to one line of input, or None if it
+    holds only notifications.
+    """
+    try:
+        req = json.loads(line)
+    except ValueError:
+        reply = {"jsonrpc": "2.0", "id": None, "error": {"code": PARSE_ERROR, "message": "parse error"}}
+    else:
+        if isinstance(req, list) and req:
+            reply = [r for r in (_call(store, one) for one in req) if r is not None] or None
+        else:
+            reply = _call(store, req)
+    return None if reply is None else json.dumps(reply).encode() + b"\n"
+
+def _answering(path):
+    import socket
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+            conn.settimeout(0.5)
+            conn.connect(path)
+        return True
+    except OSError:
+        return False
+
+def serve(path=SOCKET_PATH):
+    """
+    Unlocks the vault and serves it on the Unix socket at path until
+    interrupted or asked to stop.
+    """
+    import signal
+    import socket
+    import socketserver
+
+    if not hasattr(socket, "AF_UNIX"):
+        print("[X] This platform has no Unix sockets.")
+        sys.exit(1)
+    vault.require_passphrase_setup()
+    store = Store()
+    store.refresh()
+    # Requests from every connection run one at a time: the store and the
+    # vault modules aren't thread-safe
+    busy = threading.Lock()
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            for line in self.rfile:
+                if not line.strip():
+                    continue
+                with busy:
+                    reply = handle_line(store, line)
+                if reply is not None:
+                    self.wfile.write(reply)
+                if store.stopping:
+                    # shutdown() waits for serve_forever, so not from its own thread
+                    threading.Thread(target=self.server.shutdown).start()
+                    return
+
+    class Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
+
+        def verify_request(self, request, client_address):
+            try:
+                return agent.peer_is_owner(request)
+            except OSError:
+                return False
+
+    if threading.current_thread() is threading.main_thread():
+        signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if os.path.exists(path):
+        if _answering(path):
+            print(f"[X] A vault server is already listening on {path}.")
+            sys.exit(1)
+        os.remove(path)
+    old_umask = os.umask(0o177)
+    try:
+        server = Server(path, Handler)
+    finally:
+        os.umask(old_umask)
+    os.chmod(path, 0o600)
+    print(f"[✓] Serving {sum(len(e) for e in store.entries.values())} entries on {path} (Ctrl+C to stop).")
+    sys.stdout.flush()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if os.path.exists(path):
+            os.remove(path)
+    print("[✓] Vault server stopped.")
@@ -1,7 +1,6 @@
 #!/usr/bin/env python3
 import os
 import sys
-import subprocess
 
 HOME = os.path.expanduser("~")
 INSTALL_DIR = os.path.join(HOME, ".vaultpass")
@@ -15,24 +14,25 @@ VERSION_FILE = os.path.join(SYSTEM_DIR, "version.txt")
 BACKUP_DIR = os.path.join(INSTALL_DIR, "backup")
 BIN_PATH = os.path.join(HOME, ".local", "bin", "vaultpass")
 LAST_UPDATE_FILE = os.path.join(SYSTEM_DIR, ".last_update_check")
-REMOTE_VERSION_URL = "https://raw.githubusercontent.com/looneytkp/vaultpass/main/version.txt"
+REMOTE_VERSION_URL = os.environ.get(
+    "VAULTPASS_UPDATE_URL", "https://raw.githubusercontent.com/looneytkp/vaultpass/main/version.txt"
+)
 
-# Ensure .config exists and is healed if missing or incomplete
-CONFIG_FILE = os.path.join(INSTALL_DIR, ".config")
-DEFAULT_CONFIG = "encryption=on\npassphrase_set=no\ntheme=light\n"
-if not os.path.exists(CONFIG_FILE):
-    os.makedirs(INSTALL_DIR, exist_ok=True)
-    with open(CONFIG_FILE, "w") as f:
-        f.write(DEFAULT_CONFIG)
-else:
-    # Heal config if missing keys
-    with open(CONFIG_FILE, "r") as f:
-        existing = f.read()
-    for line in DEFAULT_CONFIG.strip().splitlines():
-        key = line.split("=")[0]
-        if key + "=" not in existing:
-            with open(CONFIG_FILE, "a") as f:
-                f.write(line + "\n")
+REQUIRED_CORE_FILES = [
+    "cli.py", "update.py", "changelog.py", "password_gen.py", "config.py", "vault.py",
+    "vault_index.py", "agent.py", "importer.py", "vault_crypto.py", "startup_report.py",
+    "vault_journal.py", "vault_search.py", "vault_backup.py", "tracing.py", "oplog.py",
+    "vault_entry.py", "vault_lock.py", "vault_server.py", "vault_client.py",
+    "vault_async.py", "vault_order.py", "vault_ids.py", "completion.py", "wordlist.py",
+    "diceware.words"
+]
+REQUIRED_SYSTEM_FILES = ["changelog.txt", "version.txt"]
+REQUIRED_INSTALL_FILES = ["setup.py", "uninstall.py"]
+
+# Nothing here runs at import time: the launcher only imports cli, and cli
+# imports the modules a command needs. Config healing lives in
+# config.ensure_config(); the install integrity check below only runs when
+# an import actually fails.
 
 def get_current_version():
     if os.path.exists(VERSION_FILE):
@@ -45,49 +45,63 @@ def ensure_init_py():
     if not os.path.exists(init_path):
         open(init_path, "a").close()
 
-ensure_init_py()
-
-REQUIRED_CORE_FILES = [
-    "cli.py", "update.py", "changelog.py", "password_gen.py", "config.py", "vault.py"
-]
-REQUIRED_SYSTEM_FILES = ["changelog.txt", "version.txt"]
-REQUIRED_INSTALL_FILES = ["setup.py", "uninstall.py"]
-
-missing_core = [f for f in REQUIRED_CORE_FILES if not os.path.isfile(os.path.join(CORE_DIR, f))]
-missing_system = [f for f in REQUIRED_SYSTEM_FILES if not os.path.isfile(os.path.join(SYSTEM_DIR, f))]
-missing_install = [f for f in REQUIRED_INSTALL_FILES if not os.path.isfile(os.path.join(INSTALL_DIR, "install", f))]
+def check_install():
+    missing_core = [f for f in REQUIRED_CORE_FILES if not os.path.isfile(os.path.join(CORE_DIR, f))]
+    missing_system = [f for f in REQUIRED_SYSTEM_FILES if not os.path.isfile(os.path.join(SYSTEM_DIR, f))]
+    missing_install = [f for f in REQUIRED_INSTALL_FILES if not os.path.isfile(os.path.join(INSTALL_DIR, "install", f))]
 
-if missing_core or missing_system or missing_install:
-    missing_msgs = []
-    if missing_core:
-        missing_msgs.append(f"core files: {', '.join(missing_core)}")
-    if missing_system:
-        missing_msgs.append(f"system files: {', '.join(missing_system)}")
-    if missing_install:
-        missing_msgs.append(f"install files: {', '.join(missing_install)}")
-    print(f"[X] Missing required Vaultpass files: {', '.join(missing_msgs)}")
-    setup_path = os.path.join(INSTALL_DIR, "install", "setup.py")
-    if os.path.isfile(setup_path):
-        resp = input("[?] Vaultpass is broken or incomplete. Reinstall now? (Y/n): ").strip().lower()
-        if resp in ("y", ""):
-            print("[*] Reinstalling Vaultpass...")
-            subprocess.run(["python3", setup_path])
+    if missing_core or missing_system or missing_install:
+        missing_msgs = []
+        if missing_core:
+            missing_msgs.append(f"core files: {', '.join(missing_core)}")
+        if missing_system:
+            missing_msgs.append(f"system files: {', '.join(missing_system)}")
+        if missing_install:
+            missing_msgs.append(f"install files: {', '.join(missing_install)}")
+        print(f"[X] Missing required Vaultpass files: {', '.join(missing_msgs)}")
+        setup_path = os.path.join(INSTALL_DIR, "install", "setup.py")
+        if os.path.isfile(setup_path):
+            resp = input("[?] Vaultpass is broken or incomplete. Reinstall now? (Y/n): ").strip().lower()
+            if resp in ("y", ""):
+                print("[*] Reinstalling Vaultpass...")
+                import subprocess
+                subprocess.run(["python3", setup_path])
+            else:
+                print("[X] Aborted. Vaultpass may not work correctly until you reinstall.")
         else:
-            print("[X] Aborted. Vaultpass may not work correctly until you reinstall.")
-    else:
-        print("[X] setup.py is missing. Please reinstall Vaultpass from GitHub.")
-    sys.exit(1)
+            print("[X] setup.py is missing. Please reinstall Vaultpass from GitHub.")
+        sys.exit(1)
+    ensure_init_py()
 
-sys.path.insert(0, CORE_DIR)
-import cli
-import update
-import changelog
-import password_gen
-import config
-import vault
+def background_update_check():
+    # Reads the last background result and, when update_days have passed,
+    # spawns a detached checker; never waits on the network
+    import update
+    import config
+    update.notify_from_cache(get_current_version(), LAST_UPDATE_FILE)
+    update.check_in_background(REMOTE_VERSION_URL, INSTALL_DIR, LAST_UPDATE_FILE, config.get("update_days"))
 
 def main():
-    cli.run_cli()
+    if len(sys.argv) > 1 and sys.argv[1] == "--startup-report":
+        sys.path.insert(0, CORE_DIR)
+        import startup_report
+        startup_report.main(os.path.abspath(__file__), sys.argv[2:])
+        return
+    sys.path.insert(0, CORE_DIR)
+    # Only a leading --profile is the flag; later it may be an ID or a value
+    if sys.argv[1:2] == ["--profile"]:
+        del sys.argv[1]
+        import tracing
+        tracing.enable()
+    try:
+        import cli
+        cli.run_cli()
+        if sys.argv[1:2] not in (["-u"], ["--update"], ["__complete"]):
+            background_update_check()
+    except ImportError as e:
+        print(f"[X] {e}")
+        check_install()
+        raise
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
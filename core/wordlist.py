@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+wordlist.py -- The bundled diceware wordlist, memory-mapped
+
+- core/diceware.words holds the EFF large wordlist (CC BY 3.0 US, eff.org)
+  without its four hyphenated words, so a "-" separator can't make two
+  word choices print the same passphrase: 7772 words
+- The file is a 12-byte header (magic, word count), the u32 end offset of
+  every word, then the words back to back in sorted order. Opening it maps
+  the file and reads the header, so nothing is parsed up front; a word is
+  one slice of the mapping
+- build() writes the format from any word list; run this module with a
+  text file of one word per line to regenerate it
+
+Usage: python3 core/wordlist.py WORDS.txt [DEST]
+"""
+
+import os
+import mmap
+import struct
+
+WORDLIST_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "diceware.words")
+MAGIC = b"VPWORDS1"
+HEADER = struct.Struct("<8sI")    # magic, word count
+END = struct.Struct("<I")         # end of a word, from the start of the words
+
+class Wordlist:
+    """
+    Read-only view of a wordlist file; use as a context manager.
+    """
+
+    def __init__(self, path=WORDLIST_FILE):
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._map) < HEADER.size:
+            raise ValueError(f"{path} is not a vaultpass wordlist")
+        magic, self.count = HEADER.unpack_from(self._map)
+        self._words = HEADER.size + END.size * self.count
+        if magic != MAGIC or self.count == 0 or len(self._map) < self._words:
+            raise ValueError(f"{path} is not a vaultpass wordlist")
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        if not 0 <= index < self.count:
+            raise IndexError("word index out of range")
+        start = END.unpack_from(self._map, HEADER.size + END.size * (index - 1))[0] if index else 0
+        end = END.unpack_from(self._map, HEADER.size + END.size * index)[0]
+        return self._map[self._words + start:self._words + end].decode("utf-8")
+
+    def uses(self, char):
+        """
+        Returns True if any word contains char.
+        """
+        return self._map.find(char.encode("utf-8"), self._words) != -1
+
+    def close(self):
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def build(words, path=WORDLIST_FILE):
+    """
+    Writes words (deduplicated and sorted) in the wordlist format.
+    """
+    words = sorted({word.strip() for word in words if word.strip()})
+    if not words:
+        raise ValueError("no words to write")
+    ends, blob = [], bytearray()
+    for word in words:
+        blob += word.encode("utf-8")
+        ends.append(len(blob))
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(HEADER.pack(MAGIC, len(words)))
+        f.write(b"".join(END.pack(end) for end in ends))
+        f.write(blob)
+    os.replace(tmp, path)
+    return len(words)
+
+if __name__ == "__main__":
+    import re
+    import sys
+    if len(sys.argv) < 2:
+        print(__doc__.strip().splitlines()[-1])
+        sys.exit(1)
+    with open(sys.argv[1]) as f:
+        # EFF lists carry dice rolls before each word; hyphenated words are dropped
+        source = [line.split()[-1] for line in f if line.strip()]
+    kept = [word for word in source if re.fullmatch(r"[a-z]+", word)]
+    count = build(kept, sys.argv[2] if len(sys.argv) > 2 else WORDLIST_FILE)
+    print(f"[✓] Wrote {count} words ({len(source) - len(kept)} dropped).")
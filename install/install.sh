@@ -48,13 +48,28 @@ fi
 # Install python-gnupg
 pip3 install --user python-gnupg &>/dev/null
 
+# vaultpass encrypts the vault with AES-GCM from the 'cryptography' library
+if ! python3 -c "import cryptography" &>/dev/null; then
+    echo "[*] Installing the 'cryptography' library..."
+    if [ -x "$(command -v pkg)" ]; then
+        pkg install -y python-cryptography > /dev/null 2>&1
+    fi
+    python3 -c "import cryptography" &>/dev/null \
+        || python3 -m pip install --user cryptography > /dev/null 2>&1 \
+        || python3 -m pip install cryptography > /dev/null 2>&1
+    if ! python3 -c "import cryptography" &>/dev/null; then
+        echo "[X] Could not install 'cryptography'. Install it with 'pip install cryptography' and re-run the installer."
+        exit 1
+    fi
+fi
+
 # Clone the repo
 git clone "$REPO_URL" "$INSTALL_DIR"
 
-# Make the script executable and link it
-chmod +x "$INSTALL_DIR/core/vaultpass"
+# Install the launcher (a copy, as setup.py and updates do)
 mkdir -p "$HOME/.local/bin"
-ln -sf "$INSTALL_DIR/core/vaultpass" "$HOME/.local/bin/vaultpass"
+cp "$INSTALL_DIR/core/vaultpass.py" "$HOME/.local/bin/vaultpass"
+chmod +x "$HOME/.local/bin/vaultpass"
 
 # Termux / Linux PATH fix
 if ! grep -q 'export PATH="$HOME/.local/bin:$PATH"' "$HOME/.bashrc"; then
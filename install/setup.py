@@ -41,6 +41,21 @@ def ensure_python3():
         print("[X] Python 3 is required. Please install it and re-run this script.")
         sys.exit(1)
 
+def ensure_cryptography():
+    # The vault is encrypted with AES-GCM from the 'cryptography' library
+    import importlib.util
+    if importlib.util.find_spec("cryptography"):
+        return
+    print("[*] Installing the 'cryptography' library...")
+    for cmd in ([sys.executable, "-m", "pip", "install", "--user", "cryptography"],
+                [sys.executable, "-m", "pip", "install", "cryptography"]):
+        rc = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        if rc.returncode == 0:
+            print("[✓] 'cryptography' installed.")
+            return
+    print("[X] Could not install 'cryptography'. Install it with 'pip install cryptography' and re-run this script.")
+    sys.exit(1)
+
 def ensure_init_py(folder):
     path = os.path.join(folder, "__init__.py")
     if not os.path.exists(path):
@@ -108,6 +123,7 @@ def show_changelog():
 
 def main():
     ensure_python3()
+    ensure_cryptography()
     setup_folders()
     clone_or_update_repo()
     ensure_core_inits()
@@ -10,6 +10,21 @@ LAUNCHER="vaultpass"
 LOCAL_BIN="$BIN_DIR/$LAUNCHER"
 INSTALL_SCRIPTS_DIR="$INSTALL_DIR/install"
 
+# vaultpass encrypts the vault with AES-GCM from the 'cryptography' library
+if ! python3 -c "import cryptography" &>/dev/null; then
+  echo "[*] Installing the 'cryptography' library..."
+  if [ -x "$(command -v pkg)" ]; then
+    pkg install -y python-cryptography > /dev/null 2>&1
+  fi
+  python3 -c "import cryptography" &>/dev/null \
+    || python3 -m pip install --user cryptography > /dev/null 2>&1 \
+    || python3 -m pip install cryptography > /dev/null 2>&1
+  if ! python3 -c "import cryptography" &>/dev/null; then
+    echo "[X] Could not install 'cryptography'. Install it with 'pip install cryptography' and re-run the installer."
+    exit 1
+  fi
+fi
+
 # Install or update repo
 if [ -d "$INSTALL_DIR/.git" ]; then
   echo "[*] Updating Vaultpass..."
@@ -23,7 +38,7 @@ fi
 mkdir -p "$CORE_DIR" "$SYSTEM_DIR" "$BACKUP_DIR" "$BIN_DIR" "$INSTALL_SCRIPTS_DIR" > /dev/null 2>&1
 
 # Ensure core scripts are in place
-if [ ! -f "$CORE_DIR/vault.py" ] || [ ! -f "$CORE_DIR/password_gen.py" ] || [ ! -f "$CORE_DIR/vaultpass" ]; then
+if [ ! -f "$CORE_DIR/vault.py" ] || [ ! -f "$CORE_DIR/password_gen.py" ] || [ ! -f "$CORE_DIR/vaultpass.py" ]; then
   echo "[X] Missing core scripts. Please check the repository."
   exit 1
 fi
@@ -36,7 +51,7 @@ elif [ -f "install/uninstall.sh" ]; then
 fi
 
 # Copy launcher to bin and make executable
-cp "$CORE_DIR/vaultpass" "$LOCAL_BIN" > /dev/null 2>&1
+cp "$CORE_DIR/vaultpass.py" "$LOCAL_BIN" > /dev/null 2>&1
 chmod +x "$LOCAL_BIN" > /dev/null 2>&1
 
 # Ensure bin path is in PATH